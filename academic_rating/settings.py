@@ -99,6 +99,16 @@ DATABASES = {
     }
 }
 
+# Shared by all processes: the workers and the management commands keep the org hierarchy, the report periods
+# and the exports in memory or on disk and compare their versions stored here.
+# The table is created by the user_profile migrations, see also `manage.py createcachetable`
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -154,4 +164,13 @@ LOCALE_PATHS = ((BASE_DIR / 'locale'), )
 SESSION_COOKIE_AGE = 60 * 60  # 3600 seconds === 60 minutes
 SESSION_SAVE_EVERY_REQUEST = True
 
+# Recalculate scores of the teacher and the heads when a report is saved with changed scoring fields
+INCREMENTAL_RECALCULATION = True
+
+# Generated CSV exports kept until the data of their report period changes, see service_api.export_cache
+EXPORTS_CACHE_DIR = BASE_DIR / 'exports_cache'
+
+# Exports written by the run_export_worker command, see service_api.export_jobs
+EXPORT_JOBS_DIR = BASE_DIR / 'export_jobs'
+
 from academic_rating.settings_local import *
@@ -0,0 +1,2 @@
+MICROSOFT_AUTH_CLIENT_ID = ''
+MICROSOFT_AUTH_CLIENT_SECRET = ''
@@ -17,6 +17,9 @@ from service_api.views import (
     OrganizationalAndEducationalWorkView,
     ReportPdf,
     pivot_report_by_type,
+    pivot_report_archive,
+    raw_inputs_report,
+    export_job_download,
     TeachersReportView,
     HeadsOfDepartmentsReportView,
     FacultiesReportView,
@@ -58,6 +61,19 @@ urlpatterns = [
         pivot_report_by_type,
         name="pivot_report_by_type",
     ),
+    path("pivot-report/<int:report_period_id>/archive", pivot_report_archive, name="pivot_report_archive"),
+    path(
+        "pivot-report/<int:report_period_id>/faculty/<int:pk>/archive",
+        pivot_report_archive,
+        name="pivot_report_archive",
+    ),
+    path("raw-inputs-report/<int:report_period_id>", raw_inputs_report, name="raw_inputs_report"),
+    path(
+        "raw-inputs-report/<int:report_period_id>/<str:level_type>/<int:pk>",
+        raw_inputs_report,
+        name="raw_inputs_report",
+    ),
+    path("export-jobs/<int:pk>/download", export_job_download, name="export_job_download"),
     path("documents/", DocumentsView.as_view(), name="documents"),
     path("documents/<int:pk>", DocumentsView.as_view(), name="documents"),
     path("feedbacks/", feedbacks, name="feedbacks"),
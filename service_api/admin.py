@@ -2,16 +2,20 @@ import logging
 import traceback
 
 from django.contrib import admin
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 
+from service_api import export_jobs
 from service_api.models import (
     ReportPeriod,
     GenericReportData,
     EducationalAndMethodicalWork,
     ScientificAndInnovativeWork,
-    OrganizationalAndEducationalWork)
+    OrganizationalAndEducationalWork,
+    ExportJob,
+    REPORT_MODELS)
+from user_profile.hierarchy import get_hierarchy
 from user_profile.models import Department, Faculty, Position
 
 logger = logging.getLogger(__name__)
@@ -30,18 +34,17 @@ class BaseReportAdmin(admin.ModelAdmin):
 
     @classmethod
     def get_cumulative(cls, request):
-        try:
-            return request.user.profile.position.cumulative_calculation
-        except:
-            return None
+        profile = get_hierarchy().get_profile(request.user.pk)
+        return profile.cumulative_calculation if profile is not None else None
 
     @classmethod
     def get_cumulative_pk(cls, request):
+        profile = get_hierarchy().get_profile(request.user.pk)
         cumulative = cls.get_cumulative(request)
         if cumulative == Position.BY_DEPARTMENT:
-            return request.user.profile.department.pk
+            return profile.department_id
         elif cumulative == Position.BY_FACULTY:
-            return request.user.profile.department.faculty.pk
+            return profile.faculty_id
 
     def get_ordering(self, request):
         one, two = "user__profile__department__faculty", "user__profile__department"
@@ -50,6 +53,13 @@ class BaseReportAdmin(admin.ModelAdmin):
             two = f"generic_report_data__{two}"
         return "-updated_at", one, two
 
+    def get_list_select_related(self, request):
+        # everything the columns show, so the changelist doesn't query it row by row
+        related = ("user__profile__department__faculty", "user__profile__position", "report_period")
+        if hasattr(self.model, "generic_report_data"):
+            related = tuple(f"generic_report_data__{field}" for field in related)
+        return related
+
     @admin.display(description="Користувач", ordering="user__last_name")
     def user_(self, obj):
         _obj = getattr(obj, "generic_report_data", obj)
@@ -83,19 +93,59 @@ class BaseReportAdmin(admin.ModelAdmin):
         return False
 
 
+def enqueue_export_action(export, description, export_format="csv"):
+    def action(modeladmin, request, queryset):
+        for report_period in queryset:
+            export_jobs.enqueue(request.user, report_period, export, export_format)
+        modeladmin.message_user(request, mark_safe(
+            f"Експорт додано до черги, файл буде доступний на сторінці "
+            f"<a href='{reverse('admin:service_api_exportjob_changelist')}'>{ExportJob._meta.verbose_name_plural}</a>"))
+
+    action.__name__ = f"enqueue_{export}_{export_format}"
+    action.short_description = f"У фоні: {description} ({export_format.upper()})"
+    return action
+
+
 @admin.register(ReportPeriod)
 class ReportPeriodAdmin(admin.ModelAdmin):
     list_display = (
-        "report_period", "is_active", "annual_workload", "download", "download_faculty", "download_department")
+        "report_period", "is_active", "annual_workload", "download", "download_faculty", "download_department",
+        "download_archive", "download_raw_inputs")
     ordering = ("report_period",)
+    actions = [
+        enqueue_export_action(export, description, export_format)
+        for export, description in ExportJob.EXPORT_CHOICES
+        for export_format in ("csv", "xlsx")
+    ]
 
     def has_delete_permission(self, request, obj=None):
         return False
 
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        # the download columns list the faculties and departments in every row, they are loaded once per page
+        faculties = list(Faculty.objects.all())
+        departments = list(Department.objects.all())
+        for obj in changelist.result_list:
+            obj.faculties = faculties
+            obj.departments = departments
+        return changelist
+
+    @staticmethod
+    def get_faculties(obj) -> list:
+        faculties = getattr(obj, "faculties", None)
+        return list(Faculty.objects.all()) if faculties is None else faculties
+
+    @staticmethod
+    def get_departments(obj) -> list:
+        departments = getattr(obj, "departments", None)
+        return list(Department.objects.all()) if departments is None else departments
+
     def save_form(self, request, form, change):
         is_active = form.cleaned_data.get("is_active")
         if is_active is True:
             ReportPeriod.objects.update(is_active=False)
+            ReportPeriod.invalidate_cache()
         return super().save_form(request, form, change)
 
     @admin.display(description="звіт універсітету")
@@ -117,7 +167,7 @@ class ReportPeriodAdmin(admin.ModelAdmin):
                                         'report_period_id': obj.pk,
                                         'level_type': 'faculty',
                                         "pk": f.pk,
-                                    })}'>{f}</option>""" for f in Faculty.objects.all()]
+                                    })}'>{f}</option>""" for f in self.get_faculties(obj)]
         return mark_safe(f"""
             <select onChange="window.location.href=this.value" style="width: 150px;">
                 <option>-</option>
@@ -133,7 +183,7 @@ class ReportPeriodAdmin(admin.ModelAdmin):
                                         'report_period_id': obj.pk,
                                         'level_type': 'department',
                                         "pk": f.pk,
-                                    })}'>{f}</option>""" for f in Department.objects.all()]
+                                    })}'>{f}</option>""" for f in self.get_departments(obj)]
         return mark_safe(f"""
                     <select onChange="window.location.href=this.value" style="width: 150px;">
                         <option>-</option>
@@ -141,6 +191,60 @@ class ReportPeriodAdmin(admin.ModelAdmin):
                     </select>
                 """)
 
+    @admin.display(description="архів звітів факультету та кафедр")
+    def download_archive(self, obj):
+        options = [f"""
+            <option value='{reverse('pivot_report_archive', kwargs={'report_period_id': obj.pk})}'>Всі</option>"""]
+        options += [f"""
+            <option value='{reverse('pivot_report_archive', kwargs={'report_period_id': obj.pk, "pk": f.pk})}'>{f}</option>"""
+                    for f in self.get_faculties(obj)]
+        return mark_safe(f"""
+            <select onChange="window.location.href=this.value" style="width: 150px;">
+                <option>-</option>
+                {"".join(options)}
+            </select>
+        """)
+
+    @admin.display(description="вхідні дані звітів")
+    def download_raw_inputs(self, obj):
+        return mark_safe(f"""
+        <a href="{reverse('raw_inputs_report', kwargs={'report_period_id': obj.pk})}">CSV</a>
+        <a href="{reverse('raw_inputs_report', kwargs={'report_period_id': obj.pk})}?format=xlsx">XLSX</a>
+        """)
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ("export", "report_period", "export_format", "status", "progress", "created_at", "finished_at",
+                    "download")
+    list_filter = ("status", "export")
+    list_select_related = ("report_period",)
+    readonly_fields = [field.name for field in ExportJob._meta.fields]
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if not request.user.is_superuser:
+            qs = qs.filter(user=request.user)
+        return qs
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="прогрес")
+    def progress(self, obj):
+        if not obj.total:
+            return "-"
+        return f"{obj.rows}/{obj.total} ({100 * obj.rows // obj.total}%)"
+
+    @admin.display(description="файл")
+    def download(self, obj):
+        if obj.status != ExportJob.DONE:
+            return "-"
+        return mark_safe(f"<a href='{reverse('export_job_download', kwargs={'pk': obj.pk})}'>{obj.file_name}</a>")
+
 
 @admin.register(GenericReportData)
 class GenericReportDataAdmin(BaseReportAdmin):
@@ -152,27 +256,24 @@ class GenericReportDataAdmin(BaseReportAdmin):
         self.readonly_fields = [i.name for i in self.model._meta.fields if i.name != "is_closed"]
 
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
+        qs = super().get_queryset(request).annotate(
+            **{
+                f"{report_model.__name__.lower()}_done": Exists(
+                    report_model.objects.filter(generic_report_data=OuterRef("pk"))
+                )
+                for report_model in REPORT_MODELS
+            }
+        )
         if not request.user.is_superuser:
-            try:
-                if request.user.profile.position.cumulative_calculation == Position.BY_DEPARTMENT:
-                    qs = qs.filter(
-                        Q(
-                            Q(user__profile__department=request.user.profile.department) |
-                            Q(user__profile__position__isnull=True) |
-                            Q(user__profile__department__isnull=True)
-                        ) & Q(user__is_superuser=False)
-                    )
-                elif request.user.profile.position.cumulative_calculation == Position.BY_FACULTY:
-                    qs = qs.filter(
-                        Q(
-                            Q(user__profile__department__faculty=request.user.profile.department.faculty) |
-                            Q(user__profile__position__isnull=True) |
-                            Q(user__profile__department__isnull=True)
-                        ) & Q(user__is_superuser=False)
-                    )
-            except Exception as e:
-                logging.info(f"ProfileAdmin :: {e}")
+            department_ids = get_hierarchy().get_scope_department_ids(request.user.pk)
+            if department_ids is not None:
+                qs = qs.filter(
+                    Q(
+                        Q(user__profile__department__in=department_ids) |
+                        Q(user__profile__position__isnull=True) |
+                        Q(user__profile__department__isnull=True)
+                    ) & Q(user__is_superuser=False)
+                )
 
         return qs
 
@@ -210,7 +311,6 @@ class GenericReportDataAdmin(BaseReportAdmin):
         return form
 
 
-
 @admin.register(EducationalAndMethodicalWork)
 class EducationalAndMethodicalWorkAdmin(BaseReportAdmin):
     ...
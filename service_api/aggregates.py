@@ -0,0 +1,154 @@
+"""
+Running sums and counts of the teachers results by department and by faculty of every report period.
+
+Heads of departments and decans read the sums of their group from one row instead of aggregating the staff
+over user -> profile -> department -> faculty. Sums of GenericReportData.result follow every saved result,
+sums of TeacherResults.scores_sum are rebuilt by the ranking pipeline, as one changed place moves the scores
+of the whole period. Changes of the org structure are picked up by the next run of the pipeline.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, F, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from service_api.models import DepartmentAggregate, FacultyAggregate, GenericReportData, ReportPeriod, TeacherResults
+from service_api.upsert import bulk_upsert
+from user_profile.models import Profile
+
+# {aggregate model: (group field, group of a generic report)}
+GROUPS = {
+    DepartmentAggregate: ("department", "user__profile__department"),
+    FacultyAggregate: ("faculty", "user__profile__department__faculty"),
+}
+
+
+def rebuild(report_period: ReportPeriod) -> int:
+    """
+    Aggregates of the period from scratch
+    :return: number of groups
+    """
+    generic_reports = GenericReportData.objects.filter(report_period=report_period).order_by()
+    teacher_results = TeacherResults.objects.filter(
+        generic_report_data__report_period=report_period, scores_sum__isnull=False
+    ).order_by()
+
+    count = 0
+    for model, (field, group) in GROUPS.items():
+        aggregates = {}
+        for group_id, results_sum, results_count in (
+            generic_reports.filter(**{f"{group}__isnull": False})
+            .values(group)
+            .annotate(Sum("result"), Count("pk"))
+            .values_list(group, "result__sum", "pk__count")
+        ):
+            aggregates[group_id] = model(
+                report_period=report_period,
+                results_sum=results_sum or 0,
+                results_count=results_count,
+                scores_sum=Decimal(0),
+                scores_count=0,
+                **{f"{field}_id": group_id},
+            )
+        # decimals are summed here, so the sums are exact
+        for group_id, scores_sum in teacher_results.values_list(f"generic_report_data__{group}", "scores_sum"):
+            aggregate = aggregates.get(group_id)
+            if aggregate is not None:
+                aggregate.scores_sum += scores_sum
+                aggregate.scores_count += 1
+
+        bulk_upsert(model, list(aggregates.values()), ["report_period", field])
+        model.objects.filter(report_period=report_period).exclude(**{f"{field}__in": list(aggregates)}).delete()
+        count += len(aggregates)
+    return count
+
+
+def load(report_period_ids) -> dict:
+    """
+    Aggregates of the periods, periods without aggregates are rebuilt first
+    :return: {aggregate model: {(report period pk, group pk): aggregate}}
+    """
+    report_period_ids = set(report_period_ids)
+    loaded = {}
+    for model, (field, _) in GROUPS.items():
+        loaded[model] = {
+            (aggregate.report_period_id, getattr(aggregate, f"{field}_id")): aggregate
+            for aggregate in model.objects.filter(report_period__in=report_period_ids)
+        }
+
+    missing = report_period_ids - {
+        report_period_id for aggregates in loaded.values() for report_period_id, _ in aggregates
+    }
+    if missing:
+        for report_period in ReportPeriod.objects.filter(pk__in=missing):
+            rebuild(report_period)
+        for model, aggregates in load(missing).items():
+            loaded[model].update(aggregates)
+    return loaded
+
+
+def scores_by_group(report_period: ReportPeriod, model) -> dict:
+    """
+    :return: {group pk: (sum of scores, number of scored teachers)}
+    """
+    return {
+        group_id: (aggregate.scores_sum, aggregate.scores_count)
+        for (_, group_id), aggregate in load([report_period.pk])[model].items()
+    }
+
+
+def apply_result_changes(changes: dict):
+    """
+    Adds the changes of saved results to the aggregates of their groups
+    :param changes: {generic report: previous result, None for a new report}
+    """
+    changes = {
+        generic_report: previous
+        for generic_report, previous in changes.items()
+        if generic_report.report_period_id is not None and previous != generic_report.result
+    }
+    if not changes:
+        return
+
+    groups = {
+        user_id: {DepartmentAggregate: department_id, FacultyAggregate: faculty_id}
+        for user_id, department_id, faculty_id in Profile.objects.filter(
+            user__in=[generic_report.user_id for generic_report in changes]
+        ).values_list("user_id", "department_id", "department__faculty_id")
+    }
+
+    deltas = {}
+    for generic_report, previous in changes.items():
+        for model, group_id in groups.get(generic_report.user_id, {}).items():
+            if group_id is None:
+                continue
+            delta = deltas.setdefault((model, generic_report.report_period_id, group_id), [0, 0])
+            delta[0] += generic_report.result - (previous or 0)
+            delta[1] += previous is None
+
+    stale = set()
+    for (model, report_period_id, group_id), (results_delta, count_delta) in deltas.items():
+        if report_period_id in stale:
+            continue
+        updated = model.objects.filter(report_period=report_period_id, **{GROUPS[model][0]: group_id}).update(
+            results_sum=F("results_sum") + results_delta, results_count=F("results_count") + count_delta
+        )
+        if not updated:
+            stale.add(report_period_id)
+
+    # a group without aggregate, the saved results are already included by the rebuild
+    for report_period in ReportPeriod.objects.filter(pk__in=stale):
+        rebuild(report_period)
+
+
+@receiver(post_save, sender=GenericReportData)
+def generic_report_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        apply_result_changes({instance: None})
+
+
+@receiver(post_delete, sender=GenericReportData)
+def generic_report_deleted(sender, instance, **kwargs):
+    # the profile of the deleted report may be gone already, the period is rebuilt on the next load
+    for model in GROUPS:
+        model.objects.filter(report_period=instance.report_period_id).delete()
@@ -5,3 +5,8 @@ class ServiceApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'service_api'
     verbose_name = '3. Звіти та налаштування'
+
+    def ready(self):
+        # connects the receivers maintaining the results aggregates, the versions of the cached exports
+        # and the files of the export jobs
+        from service_api import aggregates, export_cache, export_jobs  # noqa: F401
@@ -0,0 +1,231 @@
+"""
+Benchmark of the ranking pipeline on a throwaway SQLite database filled by the synthetic university generator.
+
+Every dataset size runs in a forked process with its own temporary database, so sizes don't share memory peaks.
+For every stage wall time, peak RSS of the stage and the number of queries are recorded. The peak RSS is reset
+before every stage through /proc/self/clear_refs, where it is not available (macOS) the peak of the Python
+allocations traced by tracemalloc is recorded instead, see the "peak_memory" of the meta.
+"""
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection, connections
+
+from service_api.models import REPORT_MODELS, ReportPeriod
+from service_api.pipeline.stages import BATCH_ENGINE, MODEL_CALC_MAP, PIPELINE, RAW_REPORTS
+from service_api.synthetic import SyntheticUniversity
+
+WALL_TIME = "wall_time"
+PEAK_RSS = "peak_rss_mb"
+QUERIES = "queries"
+ROWS = "rows"
+# Absolute allowance on top of the relative tolerance, short stages of small datasets are noisy
+SLACK = {WALL_TIME: 0.05, PEAK_RSS: 5}
+
+
+PROC_RSS = "rss"
+TRACEMALLOC = "tracemalloc"
+
+
+def reset_peak_rss() -> bool:
+    """
+    Resets the peak RSS of the process to the current RSS
+    :return: False if the platform doesn't support it
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as file:
+            return round(int(re.search(r"VmHWM:\s+(\d+)", file.read()).group(1)) / 1024, 1)
+    except (OSError, AttributeError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def peak_memory() -> str:
+    """How the peak memory of the stages is measured on this platform"""
+    return PROC_RSS if reset_peak_rss() else TRACEMALLOC
+
+
+class PeakMemory:
+    """
+    Peak memory of the code in the block in MB: peak RSS since the block started or peak of tracemalloc
+    """
+
+    def __init__(self):
+        self.peak_mb = 0.0
+        self.traced = False
+
+    def __enter__(self):
+        self.traced = not reset_peak_rss()
+        if self.traced:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.traced:
+            self.peak_mb = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+            tracemalloc.stop()
+        else:
+            self.peak_mb = peak_rss_mb()
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(func, *args, **kwargs) -> dict:
+    counter = QueryCounter()
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            rows = func(*args, **kwargs)
+        wall_time = time.perf_counter() - start
+    return {
+        WALL_TIME: round(wall_time, 4),
+        PEAK_RSS: memory.peak_mb,
+        QUERIES: counter.count,
+        ROWS: rows,
+    }
+
+
+def calc_scalar(report_model) -> tuple[int, float]:
+    """Scalar calculator of one report model over the whole period, reports are loaded beforehand"""
+    calc_model = MODEL_CALC_MAP[report_model.__name__.lower()]
+    reports = list(report_model.objects.select_related("generic_report_data__report_period"))
+    start = time.perf_counter()
+    for report in reports:
+        calc_model(report).get_result()
+    return len(reports), time.perf_counter() - start
+
+
+def run_size(teachers: int, seed: int, engine: str) -> dict:
+    """
+    Generates the university in a new temporary database and measures every stage
+    """
+    results = {}
+    old_name = connection.settings_dict["NAME"]
+    with tempfile.TemporaryDirectory() as directory:
+        connection.settings_dict.setdefault("TEST", {})["NAME"] = os.path.join(directory, "benchmark.sqlite3")
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results["generate"] = measure(
+                lambda: SyntheticUniversity(seed=seed, teachers=teachers).generate()["users"]
+            )
+            report_period = ReportPeriod.objects.get(is_active=True)
+            for stage in PIPELINE.stages:
+                kwargs = {"engine": engine} if stage.name == RAW_REPORTS else {}
+                results[stage.name] = measure(stage.func, report_period, **kwargs)
+
+            for report_model in REPORT_MODELS:
+                # calculation time only, loading of the reports is measured by the queries
+                counter = QueryCounter()
+                with PeakMemory() as memory, connection.execute_wrapper(counter):
+                    rows, wall_time = calc_scalar(report_model)
+                results[f"scalar_{report_model.__name__.lower()}"] = {
+                    WALL_TIME: round(wall_time, 4),
+                    PEAK_RSS: memory.peak_mb,
+                    QUERIES: counter.count,
+                    ROWS: rows,
+                }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+    return results
+
+
+def _run_size_process(queue, teachers: int, seed: int, engine: str):
+    try:
+        queue.put(run_size(teachers, seed, engine))
+    except Exception as e:
+        queue.put(e)
+
+
+def run(sizes: list[int], seed: int = 0, engine: str = BATCH_ENGINE, callback=None) -> dict:
+    """
+    :param callback: callback(size, results of the size)
+    :return: {"meta": {...}, "sizes": {size: {stage: measurements}}}
+    """
+    if connection.vendor != "sqlite":
+        raise ValueError("Benchmarks run on a throwaway SQLite database, the default database must be SQLite")
+
+    results = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": seed,
+            "engine": engine,
+            "debug": settings.DEBUG,
+            "peak_memory": peak_memory(),
+        },
+        "sizes": {},
+    }
+    context = multiprocessing.get_context("fork")
+    for size in sizes:
+        # the forked process must not share the connections of the parent
+        connections.close_all()
+        queue = context.Queue()
+        process = context.Process(target=_run_size_process, args=(queue, size, seed, engine))
+        process.start()
+        size_results = queue.get()
+        process.join()
+        if isinstance(size_results, Exception):
+            raise size_results
+
+        results["sizes"][str(size)] = size_results
+        if callback is not None:
+            callback(size, size_results)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.2) -> list[str]:
+    """
+    Regressions of the results against the baseline. Query count must not grow,
+    wall time and peak RSS may grow by the tolerance plus SLACK. Sizes and stages missing in the baseline are ignored,
+    so is the memory of a baseline measured another way, see peak_memory.
+    :return: descriptions of the regressions
+    """
+    same_memory = results.get("meta", {}).get("peak_memory") == baseline.get("meta", {}).get("peak_memory")
+    metrics = (WALL_TIME, PEAK_RSS) if same_memory else (WALL_TIME,)
+    regressions = []
+    for size, stages in results["sizes"].items():
+        for stage, measurements in stages.items():
+            expected = baseline.get("sizes", {}).get(size, {}).get(stage)
+            if not expected:
+                continue
+
+            if measurements[QUERIES] > expected[QUERIES]:
+                regressions.append(
+                    f"{size} {stage}: {measurements[QUERIES]} queries, baseline {expected[QUERIES]}"
+                )
+            for metric in metrics:
+                limit = expected[metric] * (1 + tolerance) + SLACK[metric]
+                if measurements[metric] > limit:
+                    regressions.append(
+                        f"{size} {stage}: {metric} {measurements[metric]}, baseline {expected[metric]} "
+                        f"(limit {limit:.4f})"
+                    )
+    return regressions
@@ -0,0 +1,46 @@
+"""
+Report bundle: generic report of a teacher for a report period loaded with one query together with everything
+the report pages show. The section reports, the teacher result, the report period and the profile with
+the department, faculty and position are cached on the generic report, so templates don't query them.
+
+Bundles are memoized on the request.
+"""
+from service_api.models import REPORT_MODELS, GenericReportData, ReportPeriod
+
+BUNDLE_RELATED = (
+    "report_period",
+    "user__profile__department__faculty",
+    "user__profile__position",
+    "teacherresults",
+    *(report_model.__name__.lower() for report_model in REPORT_MODELS),
+)
+
+
+def load_report_bundle(user, report_period: ReportPeriod) -> GenericReportData:
+    """
+    :return: generic report with the related objects, None if the teacher has no report for the period
+    """
+    if report_period is None:
+        return None
+    return (
+        GenericReportData.objects.filter(user=user, report_period=report_period)
+        .select_related(*BUNDLE_RELATED)
+        .first()
+    )
+
+
+def get_report_bundle(request, report_period: ReportPeriod) -> GenericReportData:
+    bundles = request.__dict__.setdefault("_report_bundles", {})
+    key = getattr(report_period, "pk", None)
+    if key not in bundles:
+        bundles[key] = load_report_bundle(request.user, report_period)
+    return bundles[key]
+
+
+def get_section_reports(generic_report: GenericReportData) -> dict:
+    """
+    :return: {report model: section report or None} without queries for a loaded bundle
+    """
+    return {
+        report_model: getattr(generic_report, report_model.__name__.lower(), None) for report_model in REPORT_MODELS
+    }
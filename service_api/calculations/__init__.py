@@ -1,3 +1,6 @@
+from service_api.calculations.parsers import get_parsed, parse_numbers, parse_v_k_pairs
+
+
 class BaseCalculation:
     def get_result(self):
         raise NotImplementedError
@@ -8,22 +11,35 @@ class BaseCalculation:
 
     @staticmethod
     def _multiply(k: float, value: str) -> float:
-        return sum(k * float(i.replace(",", ".") or 0) for i in value.split(";"))
+        return sum(k * i for i in parse_numbers(value, strict=False))
 
-    @staticmethod
-    def _multiply_complex(const: float, value: str) -> float:
+    @classmethod
+    def _multiply_complex(cls, const: float, value: str) -> float:
         """V1(K1) V2(K2) ... Vn(Kn)"""
-        r = 0
-        if value == "0":
-            return r
+        return cls._multiply_pairs(const, parse_v_k_pairs(value, strict=False))
 
-        for i in value.split(";"):
-            v, k = i.split("(")
-            r += const * float(v.replace(",", ".")) * float(k.replace(")", "").replace(",", ".") or 0)
+    @staticmethod
+    def _multiply_pairs(const: float, pairs) -> float:
+        """Parsed V(K) pairs, see get_parsed"""
+        r = 0
+        for v, k in pairs:
+            r += const * v * k
         return r
 
+    @classmethod
+    def _divide(cls, k: int, value: str) -> float:
+        return cls._divide_numbers(k, parse_numbers(value, strict=False))
+
     @staticmethod
-    def _divide(k: int, value: str) -> float:
-        return sum(
-            (k / float(i.replace(",", "."))) if float(i.replace(",", ".") or 0) != 0 else 0 for i in value.split(";")
-        )
+    def _divide_numbers(k: int, numbers) -> float:
+        """Parsed numbers, see get_parsed"""
+        return sum((k / i) if i != 0 else 0 for i in numbers)
+
+    def _parsed(self, field: str, parser) -> list:
+        return get_parsed(getattr(self.report, "parsed_values", None), field, getattr(self.report, field), parser)
+
+    def _multiply_complex_field(self, const: float, field: str) -> float:
+        return self._multiply_pairs(const, self._parsed(field, parse_v_k_pairs))
+
+    def _divide_field(self, k: int, field: str) -> float:
+        return self._divide_numbers(k, self._parsed(field, parse_numbers))
@@ -0,0 +1,493 @@
+import multiprocessing
+
+import numpy as np
+from django.db import connections, transaction
+
+from service_api.calculations import BaseCalculation
+from service_api.calculations.parsers import get_parsed, parse_numbers, parse_v_k_pairs
+from service_api.models import (
+    REPORT_MODELS,
+    EducationalAndMethodicalWork,
+    GenericReportData,
+    OrganizationalAndEducationalWork,
+    ReportPeriod,
+    ScientificAndInnovativeWork,
+)
+
+
+class BaseBatchCalculation(BaseCalculation):
+    """
+    Vectorized counterpart of the scalar report calculations.
+
+    Loads input columns of all reports related to ``generic_reports`` with a single ``values_list`` query
+    and calculates ``result`` and ``adjusted_result`` for every row at once. Every section mirrors the
+    order of operations of the scalar calculator, so rounded results are identical.
+    """
+
+    model = None
+    fields: tuple = ()
+    # coefficients of the scoring rules, overridable by the scoring simulation
+    FIELD_RATE: dict = {}
+    COMPLEX_RATE: dict = {}
+    FLAG_RATE: dict = {}
+
+    def __init__(self, report_period: ReportPeriod, generic_reports):
+        self.report_period = report_period
+        self.generic_reports = generic_reports
+        self.columns = {}
+
+    def load(self):
+        names = ("pk", "generic_report_data_id", "generic_report_data__assignment_duration", *self.fields)
+        rows = (
+            self.model.objects.filter(generic_report_data__in=self.generic_reports)
+            .order_by("pk")
+            .values_list(*names)
+        )
+        self.columns = dict(zip(names, zip(*rows))) or {name: () for name in names}
+
+    def __len__(self):
+        return len(self.columns.get("pk", ()))
+
+    def column(self, name: str) -> np.ndarray:
+        return np.asarray(self.columns[name], dtype=np.float64)
+
+    def is_set(self, name: str) -> np.ndarray:
+        return np.asarray(self.columns[name], dtype=bool)
+
+    def flag(self, name: str) -> np.ndarray:
+        return np.where(self.is_set(name), self.FLAG_RATE[name], 0.0)
+
+    def choice(self, name: str, rates: dict) -> np.ndarray:
+        return np.fromiter((rates.get(v) or 0 for v in self.columns[name]), dtype=np.float64, count=len(self))
+
+    def flatten(self, name: str, parser) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Parsed values of a semicolon separated field of all rows, see get_parsed
+        :return: row index of every value, values
+        """
+        rows, values = [], []
+        for row, (parsed_values, raw) in enumerate(zip(self.columns["parsed_values"], self.columns[name])):
+            parsed = get_parsed(parsed_values, name, raw, parser)
+            rows.extend([row] * len(parsed))
+            values.extend(parsed)
+        return np.asarray(rows, dtype=np.intp), np.asarray(values, dtype=np.float64)
+
+    def linear(self, *names: str) -> np.ndarray:
+        """FIELD_RATE[name1] * name1 + FIELD_RATE[name2] * name2 + ..., in the order of the scalar calculation"""
+        return sum((self.FIELD_RATE[name] * self.column(name) for name in names), np.zeros(len(self)))
+
+    def multiply_complex_fields(self, *names: str) -> np.ndarray:
+        """Sum of the V(K) fields scored with COMPLEX_RATE"""
+        return sum((self.multiply_complex(self.COMPLEX_RATE[name], name) for name in names), np.zeros(len(self)))
+
+    def multiply_complex(self, const: float, name: str) -> np.ndarray:
+        rows, pairs = self.flatten(name, parse_v_k_pairs)
+        if not len(rows):
+            return np.zeros(len(self))
+        return np.bincount(rows, weights=const * pairs[:, 0] * pairs[:, 1], minlength=len(self))
+
+    def divide(self, k: int, name: str) -> np.ndarray:
+        rows, numbers = self.flatten(name, parse_numbers)
+        if not len(rows):
+            return np.zeros(len(self))
+        weights = np.divide(k, numbers, out=np.zeros_like(numbers), where=numbers != 0)
+        return np.bincount(rows, weights=weights, minlength=len(self))
+
+    def get_result(self) -> np.ndarray:
+        raise NotImplementedError
+
+    def get_string_result(self) -> np.ndarray:
+        """
+        Score of the semicolon separated fields only, part of ``get_result``
+        """
+        return np.zeros(len(self))
+
+    def get_results(self) -> list[tuple[int, int, float, float]]:
+        """
+        :return: list of (report pk, generic report pk, result, adjusted_result)
+        """
+        if not len(self):
+            return []
+
+        results = np.array([self.apply_rounding(r) for r in self.get_result().tolist()], dtype=np.float64)
+
+        # Same correction as BaseReportModel.raw_calculation
+        duration = self.column("generic_report_data__assignment_duration") / 10
+        adjusted = np.divide(results, duration, out=np.zeros_like(results), where=duration != 0)
+
+        return [
+            (pk, generic_report_id, result, self.apply_rounding(adjusted_result))
+            for pk, generic_report_id, result, adjusted_result in zip(
+                self.columns["pk"], self.columns["generic_report_data_id"], results.tolist(), adjusted.tolist()
+            )
+        ]
+
+
+class EducationalAndMethodicalWorkBatchCalculation(BaseBatchCalculation):
+    model = EducationalAndMethodicalWork
+    fields = (
+        "generic_report_data__students_rating",
+        "one_one", "one_two", "one_three",
+        "two_one", "two_two", "two_three", "two_four",
+        "three_one", "three_two",
+        "four_one",
+        "five_one", "five_two", "five_three", "five_four",
+        "six_one", "six_two", "six_three", "six_four",
+        "seven_one", "seven_two", "seven_three", "seven_four",
+        "seven_five", "seven_six", "seven_seven", "seven_eight",
+        "eight_one", "eight_two",
+        "nine_one",
+        "ten_one", "ten_two", "ten_three",
+        "eleven_one",
+        "twelve_one",
+        "thirteen_one", "thirteen_two",
+        "fourteen_one", "fourteen_two", "fourteen_three", "fourteen_four", "fourteen_five", "fourteen_six",
+        "fifteen_one",
+        "parsed_values",
+    )
+
+    # one_three is rated by the hours above one_one
+    WORKLOAD_RATE = {
+        "one_one": 600,
+        "one_two": 600,
+        "one_three": 250,
+    }
+    # score of a unit of the numeric fields
+    FIELD_RATE = {
+        "two_one": 50, "two_two": 30, "two_three": 25, "two_four": 10,
+        "three_one": 50, "three_two": int(50 * 0.2),
+        "five_one": 100, "five_two": 30, "five_three": 150, "five_four": 50,
+        "eight_one": 1, "eight_two": 0.5,
+        "nine_one": 15,
+        "ten_one": 30, "ten_two": 20, "ten_three": 40,
+        "eleven_one": 4,
+        "twelve_one": 15,
+        "thirteen_one": 100, "thirteen_two": 50,
+        "fourteen_one": 100, "fourteen_two": 50, "fourteen_three": 60,
+        "fourteen_four": 30, "fourteen_five": 30, "fourteen_six": 15,
+    }
+    # constant of the V(K) fields, every pair scores constant * V * K
+    COMPLEX_RATE = {
+        "six_one": 25 / 100, "six_two": 25 * 0.3 / 100, "six_three": 20 / 100, "six_four": 20 * 0.3 / 100,
+        "seven_one": 50 / 100, "seven_two": 50 * 0.3 / 100, "seven_three": 100 / 100, "seven_four": 100 * 0.3 / 100,
+        "seven_five": 40 / 100, "seven_six": 40 * 0.3 / 100, "seven_seven": 80 / 100, "seven_eight": 80 * 0.3 / 100,
+    }
+    LEVELS_RATE = {
+        EducationalAndMethodicalWork.LEVEL_ONE: 60,
+        EducationalAndMethodicalWork.LEVEL_TWO: 40,
+        EducationalAndMethodicalWork.LEVEL_THREE: 20,
+    }
+    TITLES_RATE = {
+        EducationalAndMethodicalWork.NONE: 0,
+        EducationalAndMethodicalWork.HONORED_WORKER_OF_EDUCATION_OF_UKRAINE: 300,
+        EducationalAndMethodicalWork.EXCELLENT_EDUCATION: 150,
+        EducationalAndMethodicalWork.HONORED_PROFESSOR_LECTURER_OF_DNU: 100,
+        EducationalAndMethodicalWork.HONORED_LECTURER_OF_DNU: 70,
+        EducationalAndMethodicalWork.PROFESSOR: 120,
+        EducationalAndMethodicalWork.DOCENT: 60,
+    }
+
+    def get_result(self) -> np.ndarray:
+        c = self.column
+
+        annual_workload = self.report_period.annual_workload
+        if annual_workload:
+            one = (
+                self.WORKLOAD_RATE["one_one"] * (c("one_one") / annual_workload)
+                + self.WORKLOAD_RATE["one_three"] * ((c("one_three") - c("one_one")) / annual_workload)
+                + self.WORKLOAD_RATE["one_two"] * (c("one_two") / annual_workload)
+            )
+        else:
+            one = np.zeros(len(self))
+
+        linear = self.linear
+
+        two = linear("two_one", "two_two", "two_three", "two_four")
+        three = linear("three_one", "three_two")
+        four = self.choice("four_one", self.LEVELS_RATE)
+        five = linear("five_one", "five_two", "five_three", "five_four")
+        six, seven = self.get_six(), self.get_seven()
+        eight = linear("eight_one", "eight_two")
+        nine = linear("nine_one")
+        ten = linear("ten_one", "ten_two", "ten_three")
+        eleven = linear("eleven_one")
+        twelve = linear("twelve_one")
+        thirteen = linear("thirteen_one", "thirteen_two")
+        fourteen = linear(
+            "fourteen_one", "fourteen_two", "fourteen_three", "fourteen_four", "fourteen_five", "fourteen_six"
+        )
+        fifteen = self.choice("fifteen_one", self.TITLES_RATE)
+        students = np.nan_to_num(c("generic_report_data__students_rating"))
+
+        return (
+            one + two + three + four + five + six + seven + eight + nine + ten
+            + eleven + twelve + thirteen + fourteen + fifteen + students
+        )
+
+    def get_six(self) -> np.ndarray:
+        return self.multiply_complex_fields("six_one", "six_two", "six_three", "six_four")
+
+    def get_seven(self) -> np.ndarray:
+        return self.multiply_complex_fields(
+            "seven_one", "seven_two", "seven_three", "seven_four",
+            "seven_five", "seven_six", "seven_seven", "seven_eight",
+        )
+
+    def get_string_result(self) -> np.ndarray:
+        return self.get_six() + self.get_seven()
+
+
+class ScientificAndInnovativeWorkBatchCalculation(BaseBatchCalculation):
+    model = ScientificAndInnovativeWork
+    fields = ("one_one",)
+
+    def get_result(self) -> np.ndarray:
+        return self.column("one_one")
+
+
+class OrganizationalAndEducationalWorkBatchCalculation(BaseBatchCalculation):
+    model = OrganizationalAndEducationalWork
+    fields = (
+        "one_one", "two_one", "three_one",
+        "four_one", "four_two", "four_three", "four_four", "four_five", "four_six",
+        "five_one", "five_two", "six_one", "seven_one", "eight_one", "nine_one", "ten_one",
+        "eleven_one", "eleven_two", "twelve_one",
+        "thirteen_one", "thirteen_two", "thirteen_three", "thirteen_four",
+        "thirteen_five", "thirteen_six", "thirteen_seven", "thirteen_eight",
+        "fourteen_one", "fifteen_one", "sixteen_one", "seventeen_one", "eighteen_one", "nineteen_one",
+        "twenty_zero_one", "twenty_zero_two", "twenty_zero_three",
+        "twenty_one_one", "twenty_one_two", "twenty_one_three",
+        "parsed_values",
+    )
+
+    ONE_RATE = {
+        OrganizationalAndEducationalWork.HEAD: 100,
+        OrganizationalAndEducationalWork.SECRETARY: 100,
+        OrganizationalAndEducationalWork.MEMBER: 50,
+    }
+    UNIVERSITY_POSITIONS = {
+        OrganizationalAndEducationalWork.HEAD: 50,
+        OrganizationalAndEducationalWork.SECRETARY: 50,
+        OrganizationalAndEducationalWork.MEMBER: 25,
+    }
+    FACULTY_POSITIONS = {
+        OrganizationalAndEducationalWork.HEAD: 30,
+        OrganizationalAndEducationalWork.SECRETARY: 30,
+        OrganizationalAndEducationalWork.MEMBER: 15,
+    }
+    NINE_RATE = {
+        OrganizationalAndEducationalWork.HEAD: 80,
+        OrganizationalAndEducationalWork.SECRETARY: 60,
+        OrganizationalAndEducationalWork.MEMBER: 40,
+    }
+    TEN_RATE = {
+        OrganizationalAndEducationalWork.HEAD: 50,
+        OrganizationalAndEducationalWork.SECRETARY: 35,
+        OrganizationalAndEducationalWork.MEMBER: 25,
+    }
+    # score of a raised flag, eleven_*, twenty_zero_* and twenty_one_* score the first raised flag only
+    FLAG_RATE = {
+        "two_one": 100,
+        "three_one": 100,
+        "five_one": 250, "five_two": 150,
+        "eleven_one": 250, "eleven_two": 100,
+        "thirteen_one": 300, "thirteen_two": 250, "thirteen_three": 30,
+        "sixteen_one": 50,
+        "seventeen_one": 50,
+        "twenty_zero_one": 200, "twenty_zero_two": 100, "twenty_zero_three": 75,
+        "twenty_one_one": 150, "twenty_one_two": 100, "twenty_one_three": 30,
+    }
+    # score of a unit of the numeric fields, eight_one is scored per month
+    FIELD_RATE = {
+        "six_one": 10,
+        "seven_one": 10,
+        "eight_one": 50,
+        "twelve_one": 1,
+        "thirteen_four": 10, "thirteen_five": 20, "thirteen_six": 15, "thirteen_seven": 5, "thirteen_eight": 15,
+        "fourteen_one": 50,
+        "fifteen_one": 30,
+        "nineteen_one": 100,
+    }
+    # eighteen_one scores the rate divided by every number
+    DIVIDE_RATE = {"eighteen_one": 50}
+    # thirteen_one...thirteen_four are scored below the limit, the base and thirteen_five...thirteen_eight above it
+    THIRTEEN_LIMIT = 150
+    THIRTEEN_BASE = 150
+
+    @staticmethod
+    def first_of(*options: tuple[np.ndarray, float]) -> np.ndarray:
+        """Score of the first raised flag, mirrors chained ``a if x else b if y else ...`` expressions"""
+        return np.select([flag for flag, _ in options], [value for _, value in options], default=0.0)
+
+    def first_flag(self, *names: str) -> np.ndarray:
+        """FLAG_RATE of the first raised flag"""
+        return self.first_of(*((self.is_set(name), self.FLAG_RATE[name]) for name in names))
+
+    def get_result(self) -> np.ndarray:
+        flag = self.flag
+
+        one = self.choice("one_one", self.ONE_RATE)
+        two = flag("two_one")
+        three = flag("three_one")
+        four = (
+            self.choice("four_one", self.UNIVERSITY_POSITIONS)
+            + self.choice("four_two", self.UNIVERSITY_POSITIONS)
+            + self.choice("four_three", self.FACULTY_POSITIONS)
+            + self.choice("four_four", self.UNIVERSITY_POSITIONS)
+            + self.choice("four_five", self.FACULTY_POSITIONS)
+            + self.choice("four_six", self.FACULTY_POSITIONS)
+        )
+        five = flag("five_one") + flag("five_two")
+        six = self.linear("six_one")
+        seven = self.linear("seven_one")
+        eight = self.linear("eight_one") / 12
+        nine = self.choice("nine_one", self.NINE_RATE)
+        ten = self.choice("ten_one", self.TEN_RATE)
+        eleven = self.first_flag("eleven_one", "eleven_two")
+        twelve = self.linear("twelve_one")
+        thirteen_four = self.linear("thirteen_four")
+        thirteen = np.where(
+            thirteen_four < self.THIRTEEN_LIMIT,
+            flag("thirteen_one") + flag("thirteen_two") + flag("thirteen_three") + thirteen_four,
+            self.THIRTEEN_BASE + self.linear("thirteen_five", "thirteen_six", "thirteen_seven", "thirteen_eight"),
+        )
+        fourteen = self.linear("fourteen_one")
+        fifteen = self.linear("fifteen_one")
+        sixteen = flag("sixteen_one")
+        seventeen = flag("seventeen_one")
+        eighteen = self.get_string_result()
+        nineteen = self.linear("nineteen_one")
+        twenty = self.first_flag("twenty_zero_one", "twenty_zero_two", "twenty_zero_three")
+        twenty_one = self.first_flag("twenty_one_one", "twenty_one_two", "twenty_one_three")
+
+        return (
+            one + two + three + four + five + six + seven + eight + nine + ten + eleven + twelve + thirteen
+            + fourteen + fifteen + sixteen + seventeen + eighteen + nineteen + twenty + twenty_one
+        )
+
+    def get_string_result(self) -> np.ndarray:
+        return self.divide(self.DIVIDE_RATE["eighteen_one"], "eighteen_one")
+
+
+class ReportPeriodBatchCalculation:
+    """
+    Calculates all reports of a report period in one vectorized pass per report model.
+
+    Usage:
+        calc = ReportPeriodBatchCalculation(report_period)
+        calc.calculate()
+        calc.save()
+    """
+
+    BATCH_CALC_MAP = {
+        EducationalAndMethodicalWork: EducationalAndMethodicalWorkBatchCalculation,
+        ScientificAndInnovativeWork: ScientificAndInnovativeWorkBatchCalculation,
+        OrganizationalAndEducationalWork: OrganizationalAndEducationalWorkBatchCalculation,
+    }
+
+    def __init__(self, report_period: ReportPeriod, generic_reports=None):
+        self.report_period = report_period
+        if generic_reports is None:
+            generic_reports = GenericReportData.objects.filter(report_period=report_period)
+        self.generic_reports = generic_reports
+
+        self.report_results = {}
+        self.generic_results = {}
+
+    def get_generic_report_ids(self):
+        return self.generic_reports.values_list("pk", flat=True)
+
+    def get_batch_calculation(self, report_model) -> BaseBatchCalculation:
+        batch_calc = self.BATCH_CALC_MAP[report_model](self.report_period, self.generic_reports)
+        batch_calc.load()
+        return batch_calc
+
+    def calculate(self):
+        self.report_results = {}
+        generic_results = dict.fromkeys(self.get_generic_report_ids(), 0)
+        for report_model in REPORT_MODELS:
+            batch_calc = self.get_batch_calculation(report_model)
+            self.report_results[report_model] = batch_calc.get_results()
+
+            # Same accumulation as GenericReportCalculation.get_result
+            for _, generic_report_id, _, adjusted_result in self.report_results[report_model]:
+                generic_results[generic_report_id] += adjusted_result * report_model.adjust_rate
+
+        self.generic_results = {
+            generic_report_id: BaseCalculation.apply_rounding(result)
+            for generic_report_id, result in generic_results.items()
+        }
+        return self.generic_results
+
+    def save(self, batch_size: int = 1000):
+        for report_model, results in self.report_results.items():
+            report_model.objects.bulk_update(
+                [
+                    report_model(pk=pk, result=result, adjusted_result=adjusted_result)
+                    for pk, _, result, adjusted_result in results
+                ],
+                ["result", "adjusted_result"],
+                batch_size=batch_size,
+            )
+
+        GenericReportData.objects.bulk_update(
+            [GenericReportData(pk=pk, result=result) for pk, result in self.generic_results.items()],
+            ["result"],
+            batch_size=batch_size,
+        )
+
+
+def _calculate_partition(args):
+    report_period, generic_reports = args
+    try:
+        calc_obj = ReportPeriodBatchCalculation(report_period, generic_reports)
+        calc_obj.calculate()
+        return calc_obj.report_results, calc_obj.generic_results
+    finally:
+        connections.close_all()
+
+
+class ParallelReportPeriodBatchCalculation(ReportPeriodBatchCalculation):
+    """
+    Calculates the report period in a pool of processes, one faculty per task.
+    Every process reads its partition through its own database connection, results are merged
+    and written by the parent with one bulk write, see ReportPeriodBatchCalculation.save.
+
+    The workers don't see uncommitted changes, so it must be used outside of a transaction.
+    """
+
+    def __init__(self, report_period: ReportPeriod, generic_reports=None, workers: int = 2):
+        super().__init__(report_period, generic_reports)
+        self.workers = workers
+
+    def get_partitions(self):
+        faculties = (
+            self.generic_reports.order_by()
+            .values_list("user__profile__department__faculty", flat=True)
+            .distinct()
+        )
+        return [self.generic_reports.filter(user__profile__department__faculty=faculty) for faculty in faculties]
+
+    def calculate(self):
+        if transaction.get_connection().in_atomic_block:
+            raise transaction.TransactionManagementError(
+                "Parallel calculation reads committed data only, it can't be used inside a transaction"
+            )
+
+        partitions = self.get_partitions()
+        # forked processes must not share the connections of the parent
+        connections.close_all()
+
+        self.report_results = {report_model: [] for report_model in REPORT_MODELS}
+        self.generic_results = {}
+        with multiprocessing.get_context("fork").Pool(min(self.workers, len(partitions) or 1)) as pool:
+            for report_results, generic_results in pool.imap_unordered(
+                _calculate_partition, [(self.report_period, partition) for partition in partitions]
+            ):
+                for report_model, results in report_results.items():
+                    self.report_results[report_model].extend(results)
+                self.generic_results.update(generic_results)
+
+        for results in self.report_results.values():
+            results.sort()
+        return self.generic_results
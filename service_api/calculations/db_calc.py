@@ -0,0 +1,281 @@
+import operator
+from functools import reduce
+
+from django.db.models import Case, F, FloatField, Func, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, NullIf
+
+from service_api.calculations import BaseCalculation
+
+from service_api.calculations.batch_calc import (
+    EducationalAndMethodicalWorkBatchCalculation,
+    OrganizationalAndEducationalWorkBatchCalculation,
+    ScientificAndInnovativeWorkBatchCalculation,
+)
+from service_api.models import (
+    REPORT_MODELS,
+    EducationalAndMethodicalWork,
+    GenericReportData,
+    OrganizationalAndEducationalWork,
+    ReportPeriod,
+    ScientificAndInnovativeWork,
+)
+
+
+def linear(rates: dict, *fields: str):
+    """rates[field1] * field1 + rates[field2] * field2 + ..."""
+    return reduce(operator.add, (Value(float(rates[field])) * F(field) for field in fields))
+
+
+def choice(field: str, rates: dict):
+    return Case(
+        *[When(**{field: key}, then=Value(float(value))) for key, value in rates.items() if key is not None],
+        default=Value(0.0),
+    )
+
+
+def first_of(rates: dict, *fields: str):
+    """Score of the first raised flag, mirrors chained ``a if x else b if y else ...`` expressions"""
+    return Case(*[When(**{field: True}, then=Value(float(rates[field]))) for field in fields], default=Value(0.0))
+
+
+def generic_report_value(field: str):
+    return Subquery(GenericReportData.objects.filter(pk=OuterRef("generic_report_data_id")).values(field)[:1])
+
+
+class RoundTwo(Func):
+    """ROUND(expression, 2), Round of Django 3.2 has no precision"""
+
+    function = "ROUND"
+    template = "%(function)s(%(expressions)s, 2)"
+    output_field = FloatField()
+
+
+def adjusted(result):
+    """Same correction as BaseReportModel.raw_calculation, 0 if the assignment duration is not set"""
+    duration = NullIf(generic_report_value("assignment_duration"), Value(0.0)) / Value(10.0)
+    return Coalesce(RoundTwo(result / duration), Value(0.0))
+
+
+class BaseDatabaseCalculation:
+    """
+    In-database counterpart of the scalar report calculations.
+
+    The scoring rules are compiled into a single expression and the results of all reports of a period
+    are written with one ``UPDATE ... SET result, adjusted_result``. The semicolon separated string fields
+    can not be expressed in SQL, their score is calculated in Python for the rows matched by ``fallback_q``
+    and added to the expression by pk, these rows are updated in batches of BATCH_SIZE.
+
+    The results are rounded by ROUND of the database: it rounds the ties of the float values like
+    31.82 / 0.8 = 39.774999... away from zero, so the results may differ from round() of the scalar
+    and the batch calculations by 0.01.
+    """
+
+    model = None
+    batch_calc = None
+
+    BATCH_SIZE = 500
+
+    def __init__(self, report_period: ReportPeriod, generic_reports):
+        self.report_period = report_period
+        self.generic_reports = generic_reports
+
+        self.fallback_count = 0
+
+    def get_result_expression(self):
+        raise NotImplementedError
+
+    def get_fallback_q(self) -> Q:
+        return Q(pk__in=[])
+
+    @staticmethod
+    def write(qs, raw_result) -> int:
+        result = RoundTwo(raw_result)
+        return qs.update(result=result, adjusted_result=adjusted(result))
+
+    def update(self) -> int:
+        """
+        :return: number of updated reports
+        """
+        qs = self.model.objects.filter(generic_report_data__in=self.generic_reports)
+        fallback_q = self.get_fallback_q()
+        expression = self.get_result_expression()
+        count = self.write(qs.exclude(fallback_q), expression)
+
+        batch_calc = self.batch_calc(self.report_period, qs.filter(fallback_q).values("generic_report_data"))
+        batch_calc.load()
+        string_results = dict(zip(batch_calc.columns["pk"], batch_calc.get_string_result().tolist()))
+        self.fallback_count = len(string_results)
+        pks = list(string_results)
+        for start in range(0, len(pks), self.BATCH_SIZE):
+            batch = pks[start:start + self.BATCH_SIZE]
+            string_result = Case(
+                *[When(pk=pk, then=Value(string_results[pk])) for pk in batch],
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+            count += self.write(qs.filter(pk__in=batch), expression + string_result)
+        return count
+
+
+class EducationalAndMethodicalWorkDatabaseCalculation(BaseDatabaseCalculation):
+    model = EducationalAndMethodicalWork
+    batch_calc = EducationalAndMethodicalWorkBatchCalculation
+
+    STRING_FIELDS = (
+        "six_one", "six_two", "six_three", "six_four",
+        "seven_one", "seven_two", "seven_three", "seven_four",
+        "seven_five", "seven_six", "seven_seven", "seven_eight",
+    )
+
+    def get_fallback_q(self) -> Q:
+        return reduce(operator.or_, (~Q(**{field: "0"}) for field in self.STRING_FIELDS))
+
+    def get_result_expression(self):
+        workload_rate = self.batch_calc.WORKLOAD_RATE
+        annual_workload = self.report_period.annual_workload
+        if annual_workload:
+            annual_workload = Value(float(annual_workload))
+            one = (
+                Value(float(workload_rate["one_one"])) * (F("one_one") / annual_workload)
+                + Value(float(workload_rate["one_three"])) * ((F("one_three") - F("one_one")) / annual_workload)
+                + Value(float(workload_rate["one_two"])) * (F("one_two") / annual_workload)
+            )
+        else:
+            one = Value(0.0)
+
+        batch_calc = self.batch_calc
+        rates = batch_calc.FIELD_RATE
+        return reduce(
+            operator.add,
+            (
+                one,
+                linear(rates, "two_one", "two_two", "two_three", "two_four"),
+                linear(rates, "three_one", "three_two"),
+                choice("four_one", batch_calc.LEVELS_RATE),
+                linear(rates, "five_one", "five_two", "five_three", "five_four"),
+                linear(rates, "eight_one", "eight_two"),
+                linear(rates, "nine_one"),
+                linear(rates, "ten_one", "ten_two", "ten_three"),
+                linear(rates, "eleven_one"),
+                linear(rates, "twelve_one"),
+                linear(rates, "thirteen_one", "thirteen_two"),
+                linear(
+                    rates,
+                    "fourteen_one", "fourteen_two", "fourteen_three", "fourteen_four", "fourteen_five", "fourteen_six",
+                ),
+                choice("fifteen_one", batch_calc.TITLES_RATE),
+                Coalesce(generic_report_value("students_rating"), Value(0.0)),
+            ),
+        )
+
+
+class ScientificAndInnovativeWorkDatabaseCalculation(BaseDatabaseCalculation):
+    model = ScientificAndInnovativeWork
+    batch_calc = ScientificAndInnovativeWorkBatchCalculation
+
+    def get_result_expression(self):
+        return F("one_one")
+
+
+class OrganizationalAndEducationalWorkDatabaseCalculation(BaseDatabaseCalculation):
+    model = OrganizationalAndEducationalWork
+    batch_calc = OrganizationalAndEducationalWorkBatchCalculation
+
+    def get_fallback_q(self) -> Q:
+        return ~Q(eighteen_one="0")
+
+    def get_result_expression(self):
+        batch_calc = self.batch_calc
+        university, faculty = batch_calc.UNIVERSITY_POSITIONS, batch_calc.FACULTY_POSITIONS
+        rates, flags = batch_calc.FIELD_RATE, batch_calc.FLAG_RATE
+        thirteen = Case(
+            When(
+                thirteen_four__lt=batch_calc.THIRTEEN_LIMIT / rates["thirteen_four"],
+                then=first_of(flags, "thirteen_one")
+                + first_of(flags, "thirteen_two")
+                + first_of(flags, "thirteen_three")
+                + linear(rates, "thirteen_four"),
+            ),
+            default=Value(float(batch_calc.THIRTEEN_BASE))
+            + linear(rates, "thirteen_five", "thirteen_six", "thirteen_seven", "thirteen_eight"),
+            output_field=FloatField(),
+        )
+        return reduce(
+            operator.add,
+            (
+                choice("one_one", batch_calc.ONE_RATE),
+                first_of(flags, "two_one"),
+                first_of(flags, "three_one"),
+                choice("four_one", university),
+                choice("four_two", university),
+                choice("four_three", faculty),
+                choice("four_four", university),
+                choice("four_five", faculty),
+                choice("four_six", faculty),
+                first_of(flags, "five_one"),
+                first_of(flags, "five_two"),
+                linear(rates, "six_one"),
+                linear(rates, "seven_one"),
+                linear(rates, "eight_one") / Value(12.0),
+                choice("nine_one", batch_calc.NINE_RATE),
+                choice("ten_one", batch_calc.TEN_RATE),
+                first_of(flags, "eleven_one", "eleven_two"),
+                linear(rates, "twelve_one"),
+                thirteen,
+                linear(rates, "fourteen_one"),
+                linear(rates, "fifteen_one"),
+                first_of(flags, "sixteen_one"),
+                first_of(flags, "seventeen_one"),
+                linear(rates, "nineteen_one"),
+                first_of(flags, "twenty_zero_one", "twenty_zero_two", "twenty_zero_three"),
+                first_of(flags, "twenty_one_one", "twenty_one_two", "twenty_one_three"),
+            ),
+        )
+
+
+class ReportPeriodDatabaseCalculation:
+    """
+    Recalculates all reports of a report period inside the database:
+    one UPDATE per report model and one UPDATE of the generic reports.
+    """
+
+    DATABASE_CALC_MAP = {
+        EducationalAndMethodicalWork: EducationalAndMethodicalWorkDatabaseCalculation,
+        ScientificAndInnovativeWork: ScientificAndInnovativeWorkDatabaseCalculation,
+        OrganizationalAndEducationalWork: OrganizationalAndEducationalWorkDatabaseCalculation,
+    }
+
+    def __init__(self, report_period: ReportPeriod, generic_reports=None):
+        self.report_period = report_period
+        if generic_reports is None:
+            generic_reports = GenericReportData.objects.filter(report_period=report_period)
+        self.generic_reports = generic_reports
+
+        self.fallback_count = 0
+
+    def calculate(self) -> int:
+        """
+        :return: number of updated generic reports
+        """
+        self.fallback_count = 0
+        for report_model in REPORT_MODELS:
+            calc_obj = self.DATABASE_CALC_MAP[report_model](self.report_period, self.generic_reports)
+            calc_obj.update()
+            self.fallback_count += calc_obj.fallback_count
+
+        # Same accumulation as GenericReportCalculation.get_result
+        result = reduce(
+            operator.add,
+            (
+                Coalesce(
+                    Subquery(
+                        report_model.objects.filter(generic_report_data=OuterRef("pk")).values("adjusted_result")[:1]
+                    ),
+                    Value(0.0),
+                ) * Value(float(report_model.adjust_rate))
+                for report_model in REPORT_MODELS
+            ),
+        )
+        return GenericReportData.objects.filter(pk__in=self.generic_reports.values("pk")).update(
+            result=RoundTwo(result)
+        )
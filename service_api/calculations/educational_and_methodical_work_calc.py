@@ -63,23 +63,23 @@ class EducationalAndMethodicalWorkCalculation(BaseCalculation):
 
     def _calc_six(self) -> float:
         r = (
-            self._multiply_complex(25 / 100, self.report.six_one)
-            + self._multiply_complex(25 * 0.3 / 100, self.report.six_two)
-            + self._multiply_complex(20 / 100, self.report.six_three)
-            + self._multiply_complex(20 * 0.3 / 100, self.report.six_four)
+            self._multiply_complex_field(25 / 100, "six_one")
+            + self._multiply_complex_field(25 * 0.3 / 100, "six_two")
+            + self._multiply_complex_field(20 / 100, "six_three")
+            + self._multiply_complex_field(20 * 0.3 / 100, "six_four")
         )
         return r
     
     def _calc_seven(self) -> float:
         r = (
-            self._multiply_complex(50 / 100, self.report.seven_one)
-            + self._multiply_complex(50 * 0.3 / 100, self.report.seven_two)
-            + self._multiply_complex(100 / 100, self.report.seven_three)
-            + self._multiply_complex(100 * 0.3 / 100, self.report.seven_four)
-            + self._multiply_complex(40 / 100, self.report.seven_five)
-            + self._multiply_complex(40 * 0.3 / 100, self.report.seven_six)
-            + self._multiply_complex(80 / 100, self.report.seven_seven)
-            + self._multiply_complex(80 * 0.3 / 100, self.report.seven_eight)
+            self._multiply_complex_field(50 / 100, "seven_one")
+            + self._multiply_complex_field(50 * 0.3 / 100, "seven_two")
+            + self._multiply_complex_field(100 / 100, "seven_three")
+            + self._multiply_complex_field(100 * 0.3 / 100, "seven_four")
+            + self._multiply_complex_field(40 / 100, "seven_five")
+            + self._multiply_complex_field(40 * 0.3 / 100, "seven_six")
+            + self._multiply_complex_field(80 / 100, "seven_seven")
+            + self._multiply_complex_field(80 * 0.3 / 100, "seven_eight")
         )
         return r
 
@@ -1,20 +1,87 @@
 import logging
 import traceback
 
-from django.db.models import Sum, Count
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
 
+from service_api import aggregates
 from service_api.calculations import BaseCalculation
-from service_api.models import GenericReportData, REPORT_MODELS
+from service_api.models import DepartmentAggregate, FacultyAggregate, GenericReportData, REPORT_MODELS
+from user_profile.hierarchy import get_hierarchy
 from user_profile.models import Position, Profile
 
 logger = logging.getLogger()
 
+CUMULATIVE_AGGREGATES = {Position.BY_DEPARTMENT: DepartmentAggregate, Position.BY_FACULTY: FacultyAggregate}
+
 
 class GenericReportCalculation(BaseCalculation):
 
     def __init__(self, report: GenericReportData):
         self.report = report
 
+    @classmethod
+    def get_results(cls, generic_reports, cumulative: bool = False) -> dict:
+        """
+        Totals of many reports at once: one joined query for the section reports
+        and, with cumulative, one aggregate query per level of heads
+        :param generic_reports: queryset or list of GenericReportData
+        :return: {generic report pk: result}
+        """
+        if not isinstance(generic_reports, QuerySet):
+            generic_reports = GenericReportData.objects.filter(pk__in=[obj.pk for obj in generic_reports])
+
+        report_names = [report.__name__.lower() for report in REPORT_MODELS]
+        rows = generic_reports.order_by().values_list(
+            "pk",
+            "result",
+            "report_period_id",
+            "user__profile__department_id",
+            "user__profile__department__faculty_id",
+            "user__profile__position__cumulative_calculation",
+            *(f"{name}__pk" for name in report_names),
+            *(f"{name}__adjusted_result" for name in report_names),
+        )
+
+        results = {}
+        heads = []
+        for pk, stored_result, report_period_id, department_id, faculty_id, cumulative_opt, *sections in rows:
+            result = 0
+            for report, report_pk, adjusted_result in zip(
+                REPORT_MODELS, sections[:len(REPORT_MODELS)], sections[len(REPORT_MODELS):]
+            ):
+                if report_pk is None:
+                    continue
+
+                result += adjusted_result * report.adjust_rate
+            results[pk] = result
+            if cumulative and cumulative_opt is not None:
+                heads.append((pk, stored_result, report_period_id, department_id, faculty_id, cumulative_opt))
+
+        if heads:
+            groups = cls.get_cumulative_aggregates({head[2] for head in heads})
+            for pk, stored_result, report_period_id, department_id, faculty_id, cumulative_opt in heads:
+                group_id = faculty_id if cumulative_opt == Position.BY_FACULTY else department_id
+                result_sum, count = groups[cumulative_opt].get((report_period_id, group_id), (stored_result, 1))
+                # the report itself is excluded from the aggregate of its group
+                result_sum, count = result_sum - stored_result, count - 1
+                results[pk] = (results[pk] + (result_sum or 0) / (count or 1)) / 2
+
+        return {pk: cls.apply_rounding(result) for pk, result in results.items()}
+
+    @staticmethod
+    def get_cumulative_aggregates(report_period_ids) -> dict:
+        """
+        :return: {cumulative option: {(report period pk, department or faculty pk): (sum of results, count)}}
+        """
+        loaded = aggregates.load(report_period_ids)
+        return {
+            cumulative_opt: {
+                key: (aggregate.results_sum, aggregate.results_count) for key, aggregate in loaded[model].items()
+            }
+            for cumulative_opt, model in CUMULATIVE_AGGREGATES.items()
+        }
+
     def get_result(self) -> float:
         result = 0
         for report in REPORT_MODELS:
@@ -38,35 +105,43 @@ class GenericReportCalculation(BaseCalculation):
         if cumulative_opt is None:
             return result
 
-        data = {"result__sum": 0, "pk__count": 1}
-        if cumulative_opt == Position.BY_FACULTY:
-            data = GenericReportData.objects.filter(
-                user__profile__department__faculty=self.report.user.profile.department.faculty
-            ).exclude(pk=self.report.pk).aggregate(Sum("result"), Count('pk'))
-        elif cumulative_opt == Position.BY_DEPARTMENT:
-            data = GenericReportData.objects.filter(
-                user__profile__department=self.report.user.profile.department
-            ).exclude(pk=self.report.pk).aggregate(Sum("result"), Count('pk'))
+        department = self.report.user.profile.department
+        group_id = department.faculty_id if cumulative_opt == Position.BY_FACULTY else department.pk
+        groups = self.get_cumulative_aggregates([self.report.report_period_id])[cumulative_opt]
+        result_sum, count = groups.get((self.report.report_period_id, group_id), (self.report.result, 1))
+        # the report itself is excluded from the aggregate of its group
+        result_sum, count = result_sum - self.report.result, count - 1
 
-        return (result + (data["result__sum"] or 0) / (data["pk__count"] or 1)) / 2
+        return (result + (result_sum or 0) / (count or 1)) / 2
 
 
 class HeadsGetter:
+    """
+    Heads of the department and the faculty resolved from the cached org hierarchy
+    """
+
     def __init__(self, department=None, faculty=None):
+        """
+        :param department: department or its pk
+        :param faculty: faculty or its pk
+        """
         self.department = department
         self.faculty = faculty
 
-        self.head_of_faculty_profile = self.__get_head_of_faculty_profile()
-        self.head_of_department_profile = self.__get_head_of_department_profile()
+        hierarchy = get_hierarchy()
+        self.head_of_faculty = hierarchy.get_head_of_faculty(getattr(faculty, "pk", faculty))
+        self.head_of_department = hierarchy.get_head_of_department(getattr(department, "pk", department))
+
+    @cached_property
+    def head_of_faculty_profile(self):
+        return self.__get_profile(self.head_of_faculty)
 
-    def __get_head_of_faculty_profile(self):
-        return Profile.objects.filter(
-            department__faculty=self.faculty,
-            position__cumulative_calculation=Position.BY_FACULTY
-        ).first()
+    @cached_property
+    def head_of_department_profile(self):
+        return self.__get_profile(self.head_of_department)
 
-    def __get_head_of_department_profile(self):
-        return Profile.objects.filter(
-            department=self.department,
-            position__cumulative_calculation=Position.BY_DEPARTMENT
-        ).first()
+    @staticmethod
+    def __get_profile(node):
+        if node is None:
+            return None
+        return Profile.objects.filter(pk=node.pk).first()
@@ -149,7 +149,7 @@ class OrganizationalAndEducationalWorkCalculation(BaseCalculation):
         return r
 
     def __calc_eighteen(self) -> float:
-        r = self._divide(50, self.report.eighteen_one)
+        r = self._divide_field(50, "eighteen_one")
         return r
 
     def __calc_nineteen(self) -> float:
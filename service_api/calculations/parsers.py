@@ -0,0 +1,63 @@
+"""
+Tokenizer for the semicolon separated report fields:
+
+    "1,5;2;0,25"        - numbers, decimal comma or dot
+    "1,5(2);3(0,5)"     - V(K) pairs, "0" means no pairs
+
+strict=True is used by the model validators: every token must be a finite number.
+strict=False keeps the historical behaviour of the calculations, where an empty token counts as 0.
+The validators accepted "inf" and "nan" before, such stored tokens count as 0 in the calculations.
+
+The numbers are parsed on save into BaseReportModel.parsed_values, the calculations read them with get_parsed.
+"""
+import logging
+import math
+
+logger = logging.getLogger()
+
+SEPARATOR = ";"
+
+
+def _to_number(token: str, strict: bool, number_type=float, empty_as_zero: bool = True):
+    token = token.replace(",", ".")
+    if empty_as_zero and not strict:
+        token = token or 0
+    number = number_type(token)
+    if not math.isfinite(number):
+        if strict:
+            raise ValueError(f"Not a finite number: {token}")
+        logger.warning(f"Not a finite number {token} counts as 0")
+        return number_type(0)
+    return number
+
+
+def parse_numbers(value: str, strict: bool = True, number_type=float) -> list:
+    """
+    "1,5;2" -> [1.5, 2.0]
+    """
+    return [_to_number(token, strict, number_type) for token in value.split(SEPARATOR)]
+
+
+def parse_v_k_pairs(value: str, strict: bool = True) -> list[tuple[float, float]]:
+    """
+    "1,5(2);3(0,5)" -> [(1.5, 2.0), (3.0, 0.5)]
+    """
+    if value == "0":
+        return []
+
+    pairs = []
+    for token in value.split(SEPARATOR):
+        v, k = token.split("(")
+        pairs.append((_to_number(v, strict, empty_as_zero=False), _to_number(k.replace(")", ""), strict)))
+    return pairs
+
+
+def get_parsed(parsed_values: dict, field: str, value: str, parser) -> list:
+    """
+    Parsed value of the field from the parse stored on save: {field: [value, parsed value]}.
+    The value is parsed again if it was changed by QuerySet.update or bulk_update after the parse
+    """
+    stored = (parsed_values or {}).get(field)
+    if stored is not None and stored[0] == value:
+        return stored[1]
+    return parser(value, strict=False)
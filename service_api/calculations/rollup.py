@@ -0,0 +1,175 @@
+"""
+In-memory rollup of teachers scores to heads of departments, faculties and decans.
+
+Works on plain data, so the same code serves the ranking commands and the scoring simulation.
+Decimal values are rounded the same way as they are stored into DecimalField(max_digits=16, decimal_places=4).
+"""
+import decimal
+from decimal import Decimal
+
+from user_profile.models import Position
+
+DECIMAL_CONTEXT = decimal.Context(prec=16)
+FOUR_PLACES = Decimal(1).scaleb(-4)
+
+
+def to_decimal(value) -> Decimal:
+    """Value as it is read back from DecimalField(max_digits=16, decimal_places=4)"""
+    if value is None:
+        return None
+    if not isinstance(value, Decimal):
+        value = DECIMAL_CONTEXT.create_decimal_from_float(float(value))
+    return value.quantize(FOUR_PLACES, context=DECIMAL_CONTEXT)
+
+
+def rank(items: list, key) -> dict:
+    """
+    {item: place}, places start from 1, equal keys keep the order of items
+    """
+    return {item: place for place, item in enumerate(sorted(items, key=key), start=1)}
+
+
+class RollupTeacher:
+    __slots__ = ("key", "department_id", "faculty_id", "cumulative_calculation", "scores_sum")
+
+    def __init__(self, key, department_id, faculty_id, cumulative_calculation, scores_sum: Decimal):
+        """
+        :param key: identifier of the teacher result, teachers are expected in the order of keys
+        """
+        self.key = key
+        self.department_id = department_id
+        self.faculty_id = faculty_id
+        self.cumulative_calculation = cumulative_calculation
+        self.scores_sum = scores_sum
+
+    def __repr__(self):
+        return f"RollupTeacher({self.key})"
+
+
+class HeadResult:
+    __slots__ = ("teacher", "related_to_department_sum", "related_to_department_count", "scores_sum", "place")
+
+    def __init__(self, teacher: RollupTeacher, related_to_department_sum, related_to_department_count, scores_sum):
+        self.teacher = teacher
+        self.related_to_department_sum = related_to_department_sum
+        self.related_to_department_count = related_to_department_count
+        self.scores_sum = scores_sum
+        self.place = None
+
+
+class FacultyResult:
+    __slots__ = ("faculty_id", "places_sum", "places_sum_count", "places_sum_average", "place")
+
+    def __init__(self, faculty_id, places_sum, places_sum_count, places_sum_average):
+        self.faculty_id = faculty_id
+        self.places_sum = places_sum
+        self.places_sum_count = places_sum_count
+        self.places_sum_average = places_sum_average
+        self.place = None
+
+
+class DecanResult:
+    __slots__ = ("teacher", "sum_place", "place")
+
+    def __init__(self, teacher: RollupTeacher, sum_place: int):
+        self.teacher = teacher
+        self.sum_place = sum_place
+        self.place = None
+
+
+def aggregate_scores(teachers: list[RollupTeacher], group) -> dict:
+    """
+    :param group: group(teacher) -> group pk or None
+    :return: {group pk: (sum of scores, number of scored teachers)}
+    """
+    groups = {}
+    for teacher in teachers:
+        group_id = group(teacher)
+        if group_id is not None and teacher.scores_sum is not None:
+            scores_sum, count = groups.get(group_id, (0, 0))
+            groups[group_id] = (scores_sum + teacher.scores_sum, count + 1)
+    return groups
+
+
+def calc_heads_of_departments(teachers: list[RollupTeacher], departments: dict = None) -> list[HeadResult]:
+    """
+    Head score is the average score of the department staff plus the doubled own score,
+    the lower score the better, but places go from the highest score
+    :param departments: {department pk: (sum of scores, number of scored teachers)} of the whole staff,
+    aggregated from the teachers if omitted
+    """
+    if departments is None:
+        departments = aggregate_scores(teachers, lambda t: t.department_id)
+
+    # departments in the order of their first teacher, the first head of the department wins
+    department_heads = {}
+    for teacher in teachers:
+        if teacher.department_id is not None and department_heads.get(teacher.department_id) is None:
+            is_head = teacher.cumulative_calculation == Position.BY_DEPARTMENT
+            department_heads[teacher.department_id] = teacher if is_head else None
+
+    heads = []
+    for department_id, head in department_heads.items():
+        if head is None:
+            continue
+
+        related_sum, related_count = departments.get(department_id, (0, 0))
+        if head.scores_sum is not None:
+            related_sum, related_count = related_sum - head.scores_sum, related_count - 1
+        related_sum = to_decimal(related_sum) if related_count else None
+        # stored values are read back before the division, as the aggregate query of the scalar command did
+        average = related_sum / related_count if related_count else 0
+        heads.append(
+            HeadResult(head, related_sum, related_count, to_decimal(average + 2 * (head.scores_sum or 0)))
+        )
+
+    for head, place in rank(heads, key=lambda h: -h.scores_sum).items():
+        head.place = place
+    return heads
+
+
+def calc_faculties(teachers: list[RollupTeacher], faculties: dict = None) -> list[FacultyResult]:
+    """
+    Average score of the faculty staff except decans, the lower average the better
+    :param faculties: {faculty pk: (sum of scores, number of scored teachers)} of the whole staff,
+    aggregated from the teachers if omitted
+    """
+    if faculties is None:
+        faculties = aggregate_scores(teachers, lambda t: t.faculty_id)
+    decans = aggregate_scores(
+        [t for t in teachers if t.cumulative_calculation == Position.BY_FACULTY], lambda t: t.faculty_id
+    )
+    # faculties in the order of their first scored teacher except decans
+    faculty_ids = dict.fromkeys(
+        t.faculty_id
+        for t in teachers
+        if t.faculty_id is not None and t.cumulative_calculation != Position.BY_FACULTY and t.scores_sum is not None
+    )
+
+    results = []
+    for faculty_id in faculty_ids:
+        scores_sum, count = faculties[faculty_id]
+        decans_sum, decans_count = decans.get(faculty_id, (0, 0))
+        scores_sum, count = scores_sum - decans_sum, count - decans_count
+        results.append(FacultyResult(faculty_id, to_decimal(scores_sum), count, to_decimal(scores_sum / count)))
+
+    for faculty, place in rank(results, key=lambda f: f.places_sum_average).items():
+        faculty.place = place
+    return results
+
+
+def calc_decans(teachers: list[RollupTeacher], faculties: list[FacultyResult]) -> list[DecanResult]:
+    """
+    Decan score is the doubled own score plus the average score of the faculty, the lower score the better
+    """
+    averages = {faculty.faculty_id: faculty.places_sum_average for faculty in faculties}
+    decans = [
+        DecanResult(teacher, int(2 * teacher.scores_sum + averages[teacher.faculty_id]))
+        for teacher in teachers
+        if teacher.cumulative_calculation == Position.BY_FACULTY
+        and teacher.scores_sum is not None
+        and teacher.faculty_id in averages
+    ]
+    for decan, place in rank(decans, key=lambda d: d.sum_place).items():
+        decan.place = place
+    return decans
@@ -0,0 +1,277 @@
+"""
+What-if scoring: recalculates a report period with overridden coefficients in memory
+and compares the places with the stored results. Nothing is written to the database.
+
+Coefficients are addressed by dotted paths, a report model and a rate of its batch calculation
+or "places" and a section place field:
+
+    educationalandmethodicalwork.WORKLOAD_RATE.one_one=700
+    educationalandmethodicalwork.TITLES_RATE.professor=150
+    educationalandmethodicalwork.FIELD_RATE.two_one=60
+    educationalandmethodicalwork.COMPLEX_RATE.six_one=0.3
+    organizationalandeducationalwork.ONE_RATE.head=120
+    organizationalandeducationalwork.FLAG_RATE.five_one=300
+    organizationalandeducationalwork.DIVIDE_RATE.eighteen_one=40
+    organizationalandeducationalwork.THIRTEEN_LIMIT=200
+    places.scientificandinnovativework_place=2
+
+Every coefficient of the batch calculations is a rate: FIELD_RATE per unit of a numeric field,
+COMPLEX_RATE per V*K of a V(K) field, FLAG_RATE per raised flag, the choice rates per choice.
+"""
+import copy
+
+from service_api.calculations import rollup
+from service_api.calculations.batch_calc import ReportPeriodBatchCalculation
+from service_api.models import (
+    REPORT_MODELS,
+    DecansResults,
+    FacultyResults,
+    GenericReportData,
+    HeadsOfDepartmentsResults,
+    ReportPeriod,
+    TeacherResults,
+)
+from service_api.pipeline.stages import PLACE_RATES
+from user_profile.models import Faculty
+
+PLACES = "places"
+
+TEACHER = "teacher"
+HEAD_OF_DEPARTMENT = "head_of_department"
+FACULTY = "faculty"
+DECAN = "decan"
+LEVELS = (TEACHER, HEAD_OF_DEPARTMENT, FACULTY, DECAN)
+
+
+def parse_value(value: str):
+    value = value.replace(",", ".")
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def parse_overrides(items: list[str]) -> dict:
+    """
+    ["places.scientificandinnovativework_place=2"] -> {"places.scientificandinnovativework_place": 2}
+    """
+    overrides = {}
+    for item in items:
+        path, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Expected path=value: {item}")
+        overrides[path.strip()] = parse_value(value.strip())
+    return overrides
+
+
+class SimulatedReportPeriodCalculation(ReportPeriodBatchCalculation):
+    """
+    Batch calculation over the preloaded columns with the overridden rates
+    """
+
+    def __init__(self, report_period: ReportPeriod, generic_report_ids, batch_calcs: dict, overrides: dict):
+        """
+        :param batch_calcs: {report model: loaded batch calculation}
+        :param overrides: {report model: {rate name: value or {key: value}}}
+        """
+        super().__init__(report_period, GenericReportData.objects.none())
+        self.generic_report_ids = generic_report_ids
+        self.batch_calcs = batch_calcs
+        self.overrides = overrides
+
+    def get_generic_report_ids(self):
+        return self.generic_report_ids
+
+    def get_batch_calculation(self, report_model):
+        batch_calc = copy.copy(self.batch_calcs[report_model])
+        for name, value in self.overrides.get(report_model, {}).items():
+            if isinstance(value, dict):
+                value = {**getattr(batch_calc, name), **value}
+            setattr(batch_calc, name, value)
+        return batch_calc
+
+
+class RankMovement:
+    __slots__ = ("level", "key", "name", "stored_place", "simulated_place")
+
+    def __init__(self, level: str, key, name: str, stored_place, simulated_place):
+        self.level = level
+        self.key = key
+        self.name = name
+        self.stored_place = stored_place
+        self.simulated_place = simulated_place
+
+    @property
+    def shift(self):
+        """Positive if the simulated place is higher than the stored one"""
+        if self.stored_place is None or self.simulated_place is None:
+            return None
+        return self.stored_place - self.simulated_place
+
+    @property
+    def changed(self) -> bool:
+        return self.stored_place != self.simulated_place
+
+    def as_dict(self) -> dict:
+        return {
+            "level": self.level,
+            "key": self.key,
+            "name": self.name,
+            "stored_place": self.stored_place,
+            "simulated_place": self.simulated_place,
+            "shift": self.shift,
+        }
+
+
+class ScoringSimulation:
+    """
+    Usage:
+        simulation = ScoringSimulation(report_period)
+        simulation.load()
+        for movement in simulation.run({"educationalandmethodicalwork.WORKLOAD_RATE.one_one": 700}):
+            ...
+
+    Inputs are loaded once, every run takes only the in-memory calculation.
+    """
+
+    def __init__(self, report_period: ReportPeriod):
+        self.report_period = report_period
+        self.generic_reports = GenericReportData.objects.filter(
+            report_period=report_period, user__profile__department__isnull=False
+        )
+        self.batch_calcs = {}
+        self.teachers = {}
+        self.names = {}
+        self.teacher_results_order = {}
+        self.stored_places = {}
+
+    def load(self):
+        for report_model in REPORT_MODELS:
+            batch_calc = ReportPeriodBatchCalculation.BATCH_CALC_MAP[report_model](
+                self.report_period, self.generic_reports
+            )
+            batch_calc.load()
+            self.batch_calcs[report_model] = batch_calc
+
+        self.teachers = {}
+        for pk, department_id, faculty_id, cumulative_calculation, last_name, first_name in (
+            self.generic_reports.order_by("pk").values_list(
+                "pk",
+                "user__profile__department_id",
+                "user__profile__department__faculty_id",
+                "user__profile__position__cumulative_calculation",
+                "user__last_name",
+                "user__first_name",
+            )
+        ):
+            self.teachers[pk] = (department_id, faculty_id, cumulative_calculation)
+            self.names[(TEACHER, pk)] = f"{last_name} {first_name}"
+        for pk, title in Faculty.objects.values_list("pk", "title"):
+            self.names[(FACULTY, pk)] = title.title()
+
+        teacher_results = TeacherResults.objects.filter(generic_report_data__report_period=self.report_period)
+        # heads are looked up in the order of the stored teacher results
+        self.teacher_results_order = dict(teacher_results.values_list("generic_report_data_id", "pk"))
+
+        by_teacher = {"teacher_result__generic_report_data__report_period": self.report_period}
+        self.stored_places = {
+            TEACHER: dict(teacher_results.values_list("generic_report_data_id", "place")),
+            HEAD_OF_DEPARTMENT: dict(
+                HeadsOfDepartmentsResults.objects.filter(**by_teacher).values_list(
+                    "teacher_result__generic_report_data_id", "place"
+                )
+            ),
+            FACULTY: dict(
+                FacultyResults.objects.filter(report_period=self.report_period).values_list("faculty_id", "place")
+            ),
+            DECAN: dict(
+                DecansResults.objects.filter(**by_teacher).values_list(
+                    "teacher_result__generic_report_data_id", "place"
+                )
+            ),
+        }
+
+    def get_overrides(self, overrides: dict) -> tuple[dict, dict]:
+        """
+        :return: {report model: {rate name: value or {key: value}}}, place rates
+        """
+        models = {report_model.__name__.lower(): report_model for report_model in REPORT_MODELS}
+        report_overrides, place_rates = {}, dict(PLACE_RATES)
+        for path, value in overrides.items():
+            target, _, name = path.partition(".")
+            if target == PLACES:
+                if name not in place_rates:
+                    raise ValueError(f"Unknown place field {name}, expected one of {', '.join(place_rates)}")
+                place_rates[name] = value
+                continue
+
+            if target not in models:
+                raise ValueError(f"Unknown report {target}, expected one of {', '.join(models)} or {PLACES}")
+            report_model = models[target]
+            name, _, key = name.partition(".")
+            current = getattr(ReportPeriodBatchCalculation.BATCH_CALC_MAP[report_model], name, None)
+            if not name.isupper() or current is None:
+                raise ValueError(f"Unknown rate {name} of {target}")
+
+            rates = report_overrides.setdefault(report_model, {})
+            if isinstance(current, dict):
+                if key not in current:
+                    raise ValueError(
+                        f"Unknown key {key} of {target}.{name}, expected one of {', '.join(map(str, current))}"
+                    )
+                rates.setdefault(name, {})[key] = value
+            else:
+                rates[name] = value
+        return report_overrides, place_rates
+
+    def calc_teachers_places(self, report_results: dict, place_rates: dict) -> dict:
+        """
+        Same ranking as the teachers places stage
+        :return: {generic report pk: (scores_sum, place)}
+        """
+        scores = {}
+        for report_model, results in report_results.items():
+            rate = place_rates[report_model.__name__.lower() + "_place"]
+            ordered = sorted(results, key=lambda r: (-r[2], r[1]))
+            for place, (_, generic_report_id, _, _) in enumerate(ordered, start=1):
+                scores.setdefault(generic_report_id, []).append(rate * place)
+
+        scores_sum = {generic_report_id: sum(places, 0.0) for generic_report_id, places in scores.items()}
+        places = rollup.rank(list(scores_sum), key=lambda pk: (scores_sum[pk], pk))
+        return {pk: (scores_sum[pk], place) for pk, place in places.items()}
+
+    def teacher_order(self, generic_report_id: int):
+        teacher_result_id = self.teacher_results_order.get(generic_report_id)
+        return teacher_result_id is None, teacher_result_id or 0, generic_report_id
+
+    def run(self, overrides: dict = None) -> list[RankMovement]:
+        """
+        :param overrides: {dotted path: value}, see the module docstring
+        :return: places of every teacher, head of department, faculty and decan
+        """
+        report_overrides, place_rates = self.get_overrides(overrides or {})
+        calc_obj = SimulatedReportPeriodCalculation(
+            self.report_period, self.teachers.keys(), self.batch_calcs, report_overrides
+        )
+        calc_obj.calculate()
+
+        teachers_places = self.calc_teachers_places(calc_obj.report_results, place_rates)
+        teachers = [
+            rollup.RollupTeacher(pk, *self.teachers[pk], rollup.to_decimal(teachers_places[pk][0]))
+            for pk in sorted(teachers_places, key=self.teacher_order)
+        ]
+        faculties = rollup.calc_faculties(teachers)
+        simulated_places = {
+            TEACHER: {pk: place for pk, (_, place) in teachers_places.items()},
+            HEAD_OF_DEPARTMENT: {h.teacher.key: h.place for h in rollup.calc_heads_of_departments(teachers)},
+            FACULTY: {f.faculty_id: f.place for f in faculties},
+            DECAN: {d.teacher.key: d.place for d in rollup.calc_decans(teachers, faculties)},
+        }
+
+        movements = []
+        for level in LEVELS:
+            stored, simulated = self.stored_places[level], simulated_places[level]
+            for key in sorted(stored.keys() | simulated.keys()):
+                name = self.names.get((FACULTY if level == FACULTY else TEACHER, key), str(key))
+                movements.append(RankMovement(level, key, name, stored.get(key), simulated.get(key)))
+        return movements
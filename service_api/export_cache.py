@@ -0,0 +1,190 @@
+"""
+Generated exports kept on the local disk until the data of their report period changes.
+
+The data version of a report period combines three versions stored in the default cache, a table of the database
+shared by the workers and the management commands: one of the period, changed by saved or deleted reports and
+by the stages of the pipeline, one of all periods, changed by renamed users and changed results outside
+the pipeline, and the version of the org hierarchy. They are read with one query once per request,
+see system_app.versions. The files are named after the export key and the data version, so responses carry
+an ETag and a Last-Modified of the file and a repeated download returns 304 or the cached bytes without reading
+the report tables.
+
+Usage:
+    response = cached_export(request, report_period.pk, ("pivot", report_period.pk), lambda: CsvFormat().render(export))
+"""
+import functools
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from service_api.models import (
+    REPORT_MODELS,
+    DecansResults,
+    FacultyResults,
+    GenericReportData,
+    HeadsOfDepartmentsResults,
+    TeacherResults,
+)
+from system_app import versions
+from user_profile import hierarchy
+
+VERSION_KEY = "service_api.export_cache.version"
+
+
+def get_version_key(report_period_id=None) -> str:
+    return VERSION_KEY if report_period_id is None else f"{VERSION_KEY}.{report_period_id}"
+
+
+def get_version(report_period_id) -> str:
+    keys = [get_version_key(), get_version_key(report_period_id), hierarchy.VERSION_KEY]
+    data_versions = versions.get_many(keys)
+    return ".".join(data_versions[key] for key in keys)
+
+
+def invalidate(report_period_id=None):
+    """
+    :param report_period_id: exports of all periods if None
+    """
+    versions.change(get_version_key(report_period_id))
+
+
+def on_change(report_period_id=None):
+    invalidate(report_period_id)
+    # an export built inside the transaction may contain rolled back changes
+    transaction.on_commit(lambda: invalidate(report_period_id))
+
+
+def changes_exports(func):
+    """
+    Stage functions writing the period in bulk, without signals
+    """
+
+    @functools.wraps(func)
+    def wrapper(report_period, *args, **kwargs):
+        try:
+            return func(report_period, *args, **kwargs)
+        finally:
+            on_change(report_period.pk)
+
+    return wrapper
+
+
+def get_path(key: tuple, version: str) -> Path:
+    return Path(settings.EXPORTS_CACHE_DIR) / f"{get_key_hash(key)}-{hashlib.sha1(version.encode()).hexdigest()}"
+
+
+def get_key_hash(key: tuple) -> str:
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+def write_through(chunks: Iterable[bytes], path: Path) -> Iterator[bytes]:
+    """
+    Yields the chunks and writes them to the file, the file appears only when all chunks are written
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "wb") as file:
+            for chunk in chunks:
+                file.write(chunk)
+                yield chunk
+        os.replace(tmp_path, path)
+        # files of the previous versions of the export
+        for old_path in path.parent.glob(f"{path.name.split('-')[0]}-*"):
+            if old_path != path and not old_path.name.endswith(".tmp"):
+                old_path.unlink(missing_ok=True)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def cached_export(
+    request, report_period_id, key: tuple, content: Callable[[], Iterable[bytes]], content_type: str = "text/csv"
+):
+    """
+    :param key: export type and its parameters, e.g. ("pivot", report period pk, level type, pk)
+    :param content: called on a cache miss, chunks of the export
+    :return: 304, the cached file or the content streamed to the client and to the cache
+    """
+    version = get_version(report_period_id)
+    path = get_path(key, version)
+    etag = f'"{hashlib.sha1(f"{key!r}{version}".encode()).hexdigest()}"'
+    try:
+        last_modified = int(path.stat().st_mtime)
+    except FileNotFoundError:
+        last_modified = None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if last_modified is not None:
+            response = FileResponse(open(path, "rb"), content_type=content_type)
+        else:
+            response = StreamingHttpResponse(write_through(content(), path), content_type=content_type)
+            response["Last-Modified"] = http_date()
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    # the browser revalidates the export on every download
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@receiver(post_save, sender=GenericReportData)
+@receiver(post_delete, sender=GenericReportData)
+def generic_report_changed(sender, instance, **kwargs):
+    on_change(instance.report_period_id)
+
+
+def section_report_changed(sender, instance, **kwargs):
+    if sender.generic_report_data.field.is_cached(instance):
+        report_period_id = getattr(instance.generic_report_data, "report_period_id", None)
+    else:
+        report_period_id = (
+            GenericReportData.objects.filter(pk=instance.generic_report_data_id)
+            .values_list("report_period_id", flat=True)
+            .first()
+        )
+    on_change(report_period_id)
+
+
+for report_model in REPORT_MODELS:
+    post_save.connect(section_report_changed, sender=report_model)
+    post_delete.connect(section_report_changed, sender=report_model)
+
+
+@receiver(post_save, sender=FacultyResults)
+@receiver(post_delete, sender=FacultyResults)
+def faculty_results_changed(sender, instance, **kwargs):
+    on_change(instance.report_period_id)
+
+
+@receiver(post_save, sender=TeacherResults)
+@receiver(post_save, sender=HeadsOfDepartmentsResults)
+@receiver(post_save, sender=DecansResults)
+@receiver(post_delete, sender=TeacherResults)
+@receiver(post_delete, sender=HeadsOfDepartmentsResults)
+@receiver(post_delete, sender=DecansResults)
+def results_changed(sender, **kwargs):
+    # results are saved one by one only outside the pipeline, e.g. in the admin
+    on_change()
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    # users are saved on every login, only the names are exported
+    exported_fields = {"last_name", "first_name", "email"}
+    if instance.pk is None or (update_fields is not None and not exported_fields & set(update_fields)):
+        return
+    saved = User.objects.filter(pk=instance.pk).values_list("last_name", "first_name", "email").first()
+    if saved != (instance.last_name, instance.first_name, instance.email):
+        on_change()
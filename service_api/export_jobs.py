@@ -0,0 +1,159 @@
+"""
+Exports built in the background: the admin queues an ExportJob, the run_export_worker command claims the jobs
+one by one, writes the files to EXPORT_JOBS_DIR and counts the written rows, so the admin shows the progress
+and the user downloads the file when it's ready. The queue is the database table, no broker is needed.
+
+Usage:
+    job = enqueue(request.user, report_period, ExportJob.PIVOT_ARCHIVE, export_format="xlsx")
+    ./manage.py run_export_worker
+"""
+import logging
+import os
+import traceback
+import uuid
+from pathlib import Path
+from typing import Iterator
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from service_api.exports import FORMATS, Export
+from service_api.models import ExportJob, ReportPeriod
+
+logger = logging.getLogger()
+
+# a running job marks its heartbeat with every chunk of rows,
+# jobs left running by a stopped worker are claimed again when their heartbeat is older than this time
+STALE_AFTER = timezone.timedelta(minutes=10)
+
+
+def enqueue(
+    user,
+    report_period: ReportPeriod,
+    export: str,
+    export_format: str = "csv",
+    level_type: str = None,
+    level_pk: int = None,
+    columns: str = "",
+) -> ExportJob:
+    """
+    :param columns: keys of the exported columns separated by commas, all columns if empty
+    """
+    if export not in dict(ExportJob.EXPORT_CHOICES):
+        raise ValueError(f"Unknown export {export}")
+    if export_format not in FORMATS:
+        raise ValueError(f"Unknown format {export_format}")
+    return ExportJob.objects.create(
+        user=user,
+        report_period=report_period,
+        export=export,
+        export_format=export_format,
+        level_type=level_type,
+        level_pk=level_pk,
+        columns=columns,
+    )
+
+
+def get_path(job: ExportJob) -> Path:
+    return Path(settings.EXPORT_JOBS_DIR) / job.file_name
+
+
+def claim_next() -> ExportJob:
+    """
+    :return: the oldest pending job marked as running, None if the queue is empty.
+    The status is switched by a conditional update, so two workers never run the same job
+    """
+    stale = ExportJob.objects.filter(status=ExportJob.RUNNING, heartbeat_at__lt=timezone.now() - STALE_AFTER)
+    stale.update(status=ExportJob.PENDING, rows=0)
+    pending = ExportJob.objects.filter(status=ExportJob.PENDING).order_by("created_at", "pk")
+    for pk in pending.values_list("pk", flat=True):
+        now = timezone.now()
+        claimed = ExportJob.objects.filter(pk=pk, status=ExportJob.PENDING).update(
+            status=ExportJob.RUNNING, started_at=now, heartbeat_at=now
+        )
+        if claimed:
+            return ExportJob.objects.select_related("report_period", "user").get(pk=pk)
+    return None
+
+
+def get_content(job: ExportJob) -> tuple[int, Iterator[bytes], str]:
+    """
+    :return: number of rows to read, chunks of the file and its extension
+    """
+    from service_api.views import (
+        DecansReportView,
+        FacultiesReportView,
+        HeadsOfDepartmentsReportView,
+        PivotReport,
+        PivotReportArchive,
+        RawInputsReport,
+        TeachersReportView,
+    )
+
+    def progress(rows):
+        ExportJob.objects.filter(pk=job.pk).update(rows=F("rows") + rows, heartbeat_at=timezone.now())
+
+    export_format = FORMATS[job.export_format]
+    keys = [key for key in job.columns.split(",") if key]
+    report_classes = {
+        ExportJob.PIVOT: PivotReport,
+        ExportJob.PIVOT_ARCHIVE: PivotReportArchive,
+        ExportJob.RAW_INPUTS: RawInputsReport,
+    }
+    if job.export in report_classes:
+        report_class = report_classes[job.export]
+        # the raw inputs are scoped by the user who queued the job, as in the view
+        scope = {"user": job.user} if report_class is RawInputsReport else {}
+        report = report_class(None, job.report_period_id, job.level_type, job.level_pk, **scope)
+        export = Export(report.get_qs(), report.get_columns(), progress)
+        export = export.project(keys) if keys else export
+        # the archive reads the reports twice, for the faculties and for the departments
+        total = export.queryset.count() * (2 if report_class is PivotReportArchive else 1)
+        _, extension = report.get_file_type(export_format)
+        return total, report.get_content(export, export_format), extension
+
+    view_class = {
+        view_class.REPORT_MODEL.file_name: view_class
+        for view_class in (TeachersReportView, HeadsOfDepartmentsReportView, FacultiesReportView, DecansReportView)
+    }[job.export]
+    view = view_class()
+    export = Export(view.get_qs(job.report_period), view.get_columns(), progress)
+    export = export.project(keys) if keys else export
+    return export.queryset.count(), export_format.render(export), export_format.extension
+
+
+def run(job: ExportJob) -> ExportJob:
+    """
+    Writes the file of the claimed job, the file appears only when the export is complete
+    """
+    tmp_path = Path(settings.EXPORT_JOBS_DIR) / f"{uuid.uuid4().hex}.tmp"
+    try:
+        total, chunks, extension = get_content(job)
+        ExportJob.objects.filter(pk=job.pk).update(total=total, rows=0, heartbeat_at=timezone.now())
+        file_name = f"{job.export}_{job.report_period.report_period.replace('/', '-')}_{job.pk}.{extension}"
+        tmp_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "wb") as file:
+            for chunk in chunks:
+                file.write(chunk)
+        os.replace(tmp_path, tmp_path.with_name(file_name))
+        ExportJob.objects.filter(pk=job.pk).update(
+            status=ExportJob.DONE, rows=F("total"), file_name=file_name, finished_at=timezone.now()
+        )
+    except Exception:
+        logger.exception(f"Export job {job.pk} failed")
+        ExportJob.objects.filter(pk=job.pk).update(
+            status=ExportJob.FAILED, error=traceback.format_exc(), finished_at=timezone.now()
+        )
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    job.refresh_from_db()
+    return job
+
+
+@receiver(post_delete, sender=ExportJob)
+def export_job_deleted(sender, instance, **kwargs):
+    if instance.file_name:
+        get_path(instance).unlink(missing_ok=True)
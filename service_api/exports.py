@@ -0,0 +1,358 @@
+"""
+Exports streamed row by row in CSV, JSON Lines or XLSX.
+
+An export is a queryset and its columns, every column declares the ORM paths of its values once. Rows are read
+with values_list of the paths of the exported columns only, so the joins are resolved by the database,
+and with a server-side iterator, so a university-wide export keeps a flat memory profile and the first bytes
+are sent before the last rows are read.
+
+Usage:
+    export = Export(qs, [*user_columns("user"), Column("result", "Бал", "result")])
+    export, export_format = parse_request(request, export)  # ?columns=name,result&format=xlsx
+    chunks = export_format.render(export)
+"""
+import codecs
+import csv
+import io
+import itertools
+import json
+import math
+import re
+import zipfile
+from datetime import date
+from decimal import Decimal
+from typing import Callable, Iterable, Iterator
+from xml.sax.saxutils import escape
+
+from django.core.exceptions import BadRequest
+from django.core.serializers.json import DjangoJSONEncoder
+
+from user_profile.models import Profile
+
+CHUNK_SIZE = 2000
+ZIP_BUFFER_SIZE = 64 * 1024
+
+
+class Column:
+    def __init__(self, key: str, header: str, *fields: str, value: Callable = None):
+        """
+        :param key: name of the column in ?columns= and in JSON Lines
+        :param fields: ORM paths of the values of the column
+        :param value: value(*values of the fields) -> value of the cell, the value of the only field by default
+        """
+        self.key = key
+        self.header = header
+        self.fields = fields
+        self.value = value
+
+    def get_value(self, values: tuple, number: int):
+        if self.value is None:
+            return values[0]
+        return self.value(*values)
+
+    def __repr__(self):
+        return f"Column({self.key})"
+
+
+class NumberColumn(Column):
+    """
+    Number of the row in the export
+    """
+
+    def get_value(self, values: tuple, number: int):
+        return number
+
+
+def title(value: str):
+    return value and value.title()
+
+
+def user_columns(user: str) -> list[Column]:
+    """
+    ПІБ, Кафедра, Факультет, Посада columns
+    :param user: ORM path of the user, e.g. "generic_report_data__user"
+    """
+    return [
+        Column(
+            "name",
+            "ПІБ",
+            f"{user}__last_name",
+            f"{user}__first_name",
+            f"{user}__email",
+            value=Profile.format_last_name_and_initial,
+        ),
+        Column("department", "Кафедра", f"{user}__profile__department__title", value=title),
+        Column("faculty", "Факультет", f"{user}__profile__department__faculty__title", value=title),
+        Column("position", "Посада", f"{user}__profile__position__title", value=title),
+    ]
+
+
+class Export:
+    def __init__(self, queryset, columns: list[Column], progress: Callable = None):
+        """
+        :param progress: progress(number of rows) called for every CHUNK_SIZE read rows and for the rest
+        """
+        self.queryset = queryset
+        self.columns = columns
+        self.progress = progress
+
+    @property
+    def keys(self) -> list[str]:
+        return [column.key for column in self.columns]
+
+    @property
+    def headers(self) -> list[str]:
+        return [column.header for column in self.columns]
+
+    def for_queryset(self, queryset) -> "Export":
+        return Export(queryset, self.columns, self.progress)
+
+    def project(self, keys: list[str]) -> "Export":
+        """
+        Export of the given columns only, in the given order
+        """
+        columns = {column.key: column for column in self.columns}
+        unknown = [key for key in keys if key not in columns]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        return Export(self.queryset, [columns[key] for key in keys], self.progress)
+
+    def get_rows(self) -> Iterator[list]:
+        for _, rows in self.get_groups():
+            yield from rows
+
+    def get_groups(self, *group_fields: str) -> Iterator[tuple[tuple, Iterator[list]]]:
+        """
+        Rows split into groups on the fly, every group is numbered from 1
+        :param group_fields: ORM paths of the group, the queryset must be ordered by the group first
+        :return: (values of the group fields, rows of the group), the rows must be read before the next group
+        """
+        fields = list(dict.fromkeys(field for column in self.columns for field in column.fields))
+        positions = [[fields.index(field) for field in column.fields] for column in self.columns]
+        # values_list() without fields would read all of them
+        rows = self.queryset.values_list(*(fields + list(group_fields) or ["pk"])).iterator(chunk_size=CHUNK_SIZE)
+        if self.progress is not None:
+            rows = self.track(rows)
+        # the pk read without fields is not a group
+        group_slice = slice(len(fields), len(fields) + len(group_fields))
+        for group, group_rows in itertools.groupby(rows, key=lambda row: row[group_slice]):
+            yield group, (
+                [
+                    column.get_value(tuple(row[i] for i in column_positions), number)
+                    for column, column_positions in zip(self.columns, positions)
+                ]
+                for number, row in enumerate(group_rows, start=1)
+            )
+
+    def track(self, rows: Iterator[tuple]) -> Iterator[tuple]:
+        count = 0
+        for row in rows:
+            yield row
+            count += 1
+            if count == CHUNK_SIZE:
+                self.progress(count)
+                count = 0
+        if count:
+            self.progress(count)
+
+
+class ExportFormat:
+    extension: str = None
+    content_type: str = None
+
+    def render(self, export: Export, rows: Iterable[list] = None) -> Iterator[bytes]:
+        """
+        :param rows: rows of the export, e.g. of one group, all rows by default
+        """
+        raise NotImplementedError
+
+
+class Echo:
+    """
+    File-like object for csv.writer, returns the written line instead of keeping it
+    """
+
+    def write(self, value):
+        return value
+
+
+class CsvFormat(ExportFormat):
+    extension = "csv"
+    content_type = "text/csv"
+
+    def render(self, export: Export, rows: Iterable[list] = None) -> Iterator[bytes]:
+        writer = csv.writer(Echo())
+        # Excel reads the file as UTF-8 only with the BOM
+        yield codecs.BOM_UTF8
+        yield writer.writerow(export.headers).encode("utf-8")
+        for row in export.get_rows() if rows is None else rows:
+            yield writer.writerow(row).encode("utf-8")
+
+
+class JsonLinesFormat(ExportFormat):
+    extension = "jsonl"
+    content_type = "application/x-ndjson"
+
+    def render(self, export: Export, rows: Iterable[list] = None) -> Iterator[bytes]:
+        keys = export.keys
+        for row in export.get_rows() if rows is None else rows:
+            yield (json.dumps(dict(zip(keys, row)), ensure_ascii=False, cls=DjangoJSONEncoder) + "\n").encode("utf-8")
+
+
+class ChunksBuffer(io.RawIOBase):
+    """
+    Unseekable file collecting the written bytes until they are taken
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        self.size += len(b)
+        return len(b)
+
+    def pop(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks, self.size = [], 0
+        return data
+
+
+class XlsxFormat(ExportFormat):
+    """
+    Workbook of one sheet with inline strings, written row by row by render_zip
+    """
+
+    extension = "xlsx"
+    content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+    XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+    RELATIONSHIPS_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+    PACKAGE_RELATIONSHIPS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+    CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml"
+    PARTS = {
+        "[Content_Types].xml": (
+            f'{XML}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            f'<Override PartName="/xl/workbook.xml" ContentType="{CONTENT_TYPE}.sheet.main+xml"/>'
+            f'<Override PartName="/xl/worksheets/sheet1.xml" ContentType="{CONTENT_TYPE}.worksheet+xml"/>'
+            f'<Override PartName="/xl/styles.xml" ContentType="{CONTENT_TYPE}.styles+xml"/>'
+            "</Types>"
+        ),
+        "_rels/.rels": (
+            f'{XML}<Relationships xmlns="{PACKAGE_RELATIONSHIPS_NS}">'
+            f'<Relationship Id="rId1" Type="{RELATIONSHIPS_NS}/officeDocument" Target="xl/workbook.xml"/>'
+            "</Relationships>"
+        ),
+        "xl/workbook.xml": (
+            f'{XML}<workbook xmlns="{MAIN_NS}" xmlns:r="{RELATIONSHIPS_NS}">'
+            '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+            "</workbook>"
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            f'{XML}<Relationships xmlns="{PACKAGE_RELATIONSHIPS_NS}">'
+            f'<Relationship Id="rId1" Type="{RELATIONSHIPS_NS}/worksheet" Target="worksheets/sheet1.xml"/>'
+            f'<Relationship Id="rId2" Type="{RELATIONSHIPS_NS}/styles" Target="styles.xml"/>'
+            "</Relationships>"
+        ),
+        "xl/styles.xml": (
+            f'{XML}<styleSheet xmlns="{MAIN_NS}">'
+            '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+            '<fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border/></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+            "</styleSheet>"
+        ),
+    }
+    # characters which are not allowed in XML
+    ILLEGAL_CHARACTERS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+    @staticmethod
+    def get_column_letter(index: int) -> str:
+        """
+        :param index: 0 - A, 26 - AA
+        """
+        letters = ""
+        index += 1
+        while index:
+            index, remainder = divmod(index - 1, 26)
+            letters = chr(ord("A") + remainder) + letters
+        return letters
+
+    def get_cell(self, reference: str, value) -> str:
+        if value is None:
+            return ""
+        if isinstance(value, bool):
+            return f'<c r="{reference}" t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, (int, float, Decimal)):
+            if not math.isfinite(value):
+                # nan and inf are not numbers of SpreadsheetML, Excel reports such a file as corrupt
+                return ""
+            return f'<c r="{reference}"><v>{value}</v></c>'
+        if isinstance(value, date):
+            value = value.isoformat()
+        text = escape(self.ILLEGAL_CHARACTERS.sub("", str(value)))
+        return f'<c r="{reference}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+    def get_row(self, letters: list[str], number: int, values: list) -> str:
+        cells = "".join(self.get_cell(f"{letter}{number}", value) for letter, value in zip(letters, values))
+        return f'<row r="{number}">{cells}</row>'
+
+    def get_sheet(self, export: Export, rows: Iterable[list]) -> Iterator[bytes]:
+        letters = [self.get_column_letter(i) for i in range(len(export.columns))]
+        yield f'{self.XML}<worksheet xmlns="{self.MAIN_NS}"><sheetData>'.encode("utf-8")
+        yield self.get_row(letters, 1, export.headers).encode("utf-8")
+        for number, row in enumerate(rows, start=2):
+            yield self.get_row(letters, number, row).encode("utf-8")
+        yield b"</sheetData></worksheet>"
+
+    def render(self, export: Export, rows: Iterable[list] = None) -> Iterator[bytes]:
+        rows = export.get_rows() if rows is None else rows
+        return render_zip(
+            [*((name, [xml.encode("utf-8")]) for name, xml in self.PARTS.items())]
+            + [("xl/worksheets/sheet1.xml", self.get_sheet(export, rows))]
+        )
+
+
+def render_zip(entries: Iterable[tuple[str, Iterable[bytes]]]) -> Iterator[bytes]:
+    """
+    ZIP archive written on the fly with data descriptors, neither the entries nor the archive are kept in memory
+    :param entries: (name, chunks of the content), the chunks are read only when the entry is written
+    """
+    buffer = ChunksBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, chunks in entries:
+            with archive.open(name, "w") as entry:
+                for chunk in chunks:
+                    entry.write(chunk)
+                    if buffer.size >= ZIP_BUFFER_SIZE:
+                        yield buffer.pop()
+    yield buffer.pop()
+
+
+FORMATS = {export_format.extension: export_format for export_format in (CsvFormat(), JsonLinesFormat(), XlsxFormat())}
+
+
+def parse_request(request, export: Export) -> tuple[Export, ExportFormat]:
+    """
+    Projection of ?columns=key,key and the format of ?format=csv|jsonl|xlsx, CSV by default
+    """
+    export_format = FORMATS.get(request.GET.get("format", CsvFormat.extension))
+    if export_format is None:
+        raise BadRequest(f"Unknown format, one of {', '.join(FORMATS)} is expected")
+    columns = request.GET.get("columns")
+    if columns:
+        try:
+            export = export.project([key.strip() for key in columns.split(",")])
+        except ValueError as e:
+            raise BadRequest(str(e))
+    return export, export_format
@@ -1,54 +1,32 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from service_api.calculations.educational_and_methodical_work_calc import EducationalAndMethodicalWorkCalculation
-from service_api.calculations.generic_report_calc import GenericReportCalculation
-from service_api.calculations.organizational_and_educational_work_calc import (
-    OrganizationalAndEducationalWorkCalculation,
-)
-from service_api.calculations.scientific_and_innovative_work_calc import ScientificAndInnovativeWorkCalculation
-from service_api.models import (
-    ReportPeriod,
-    REPORT_MODELS,
-    EducationalAndMethodicalWork,
-    ScientificAndInnovativeWork,
-    OrganizationalAndEducationalWork,
-    GenericReportData,
-)
-from user_profile.models import Profile
-
-MODEL_CALC_MAP = {
-    EducationalAndMethodicalWork.__name__.lower(): EducationalAndMethodicalWorkCalculation,
-    ScientificAndInnovativeWork.__name__.lower(): ScientificAndInnovativeWorkCalculation,
-    OrganizationalAndEducationalWork.__name__.lower(): OrganizationalAndEducationalWorkCalculation,
-}
+from service_api.pipeline import get_report_period
+from service_api.pipeline.stages import BATCH_ENGINE, ENGINES, calc_raw_reports
 
 
 class Command(BaseCommand):
     help = "Calculate all reports for all users"
 
-    def handle(self, *args, **options):
-        report_period = ReportPeriod.objects.get(is_active=True)
-        for profile in Profile.objects.filter(department__isnull=False):
-            self.stdout.write(f"Calculating for {profile.user.username}...", ending=" ")
-            generic_reports = profile.user.genericreportdata_set.filter(report_period=report_period)
-            if not generic_reports:
-                generic_report = GenericReportData.objects.create(user=profile.user, report_period=report_period)
-            else:
-                generic_report = generic_reports.first()
-            for report_model in REPORT_MODELS:
-                report = getattr(generic_report, report_model.__name__.lower(), None)
-                if not report:
-                    self.stdout.write(
-                        f"No report {report_model.__name__.lower()} found", style_func=self.style.ERROR, ending=" "
-                    )
-                    report = report_model.objects.create(generic_report_data=generic_report)
-
-                result = MODEL_CALC_MAP[report_model.__name__.lower()](report).get_result()
-                report.result = result
-                report.adjusted_result = report_model.raw_calculation(result, generic_report)
-                report.save()
+    def add_arguments(self, parser):
+        parser.add_argument("--period", help="Report period, e.g. 2023/2024. The active one by default")
+        parser.add_argument(
+            "--engine",
+            choices=ENGINES,
+            default=BATCH_ENGINE,
+            help="batch - vectorized calculation of the whole period (default), scalar - report by report, "
+            "db - scores of every report model written by the database with one UPDATE, "
+            "rounded by the database and may differ from the other engines by 0.01",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of processes of the batch engine, the reports are partitioned by faculty",
+        )
 
-            calc_obj = GenericReportCalculation(generic_report)
-            generic_report.result = calc_obj.get_result()
-            generic_report.save()
-            self.stdout.write("finished")
+    def handle(self, *args, **options):
+        if options["workers"] > 1 and options["engine"] != BATCH_ENGINE:
+            raise CommandError("--workers is supported by the batch engine only")
+        report_period = get_report_period(options["period"])
+        count = calc_raw_reports(report_period, engine=options["engine"], workers=options["workers"])
+        self.stdout.write(f"Calculated {count} reports", style_func=self.style.SUCCESS)
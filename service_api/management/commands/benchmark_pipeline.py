@@ -0,0 +1,63 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from service_api import benchmark
+from service_api.pipeline.stages import BATCH_ENGINE, ENGINES
+
+
+class Command(BaseCommand):
+    help = "Benchmark the ranking pipeline on throwaway SQLite databases of synthetic universities"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="1000,10000,50000",
+            help="Comma separated numbers of teachers, 1000,10000,50000 by default",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--engine", choices=ENGINES, default=BATCH_ENGINE, help="Engine of the raw reports stage")
+        parser.add_argument("--output", help="Write the results to the JSON file")
+        parser.add_argument("--baseline", help="JSON file of a previous run, regressions fail the command")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed relative growth of wall time and peak RSS against the baseline, 0.2 by default",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options["sizes"].split(",")]
+        except ValueError:
+            raise CommandError(f"Invalid sizes {options['sizes']}")
+
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+
+        try:
+            results = benchmark.run(sizes, seed=options["seed"], engine=options["engine"], callback=self.write_size)
+        except ValueError as e:
+            raise CommandError(e)
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results are written to {options['output']}")
+
+        if baseline is not None:
+            regressions = benchmark.compare(results, baseline, options["tolerance"])
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n" + "\n".join(regressions))
+            self.stdout.write("No regressions against the baseline", style_func=self.style.SUCCESS)
+
+    def write_size(self, size: int, results: dict):
+        self.stdout.write(f"{size} teachers", style_func=self.style.MIGRATE_HEADING)
+        for stage, measurements in results.items():
+            self.stdout.write(
+                f"  {stage:<40} {measurements[benchmark.WALL_TIME]:9.3f}s "
+                f"{measurements[benchmark.PEAK_RSS]:8.1f}MB {measurements[benchmark.QUERIES]:7} queries "
+                f"{measurements[benchmark.ROWS]:7} rows"
+            )
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from service_api.synthetic import SyntheticUniversity
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic synthetic university for load and scale testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--faculties", type=int, default=5)
+        parser.add_argument("--departments", type=int, default=5, help="Departments per faculty")
+        parser.add_argument("--teachers", type=int, default=1000, help="Staff including heads and decans")
+        parser.add_argument(
+            "--period",
+            action="append",
+            dest="periods",
+            help="Report period, e.g. 2023/2024. May be repeated, the last one is activated if none is active",
+        )
+        parser.add_argument("--prefix", default="synthetic", help="Prefix of usernames and titles")
+
+    def handle(self, *args, **options):
+        university = SyntheticUniversity(
+            seed=options["seed"],
+            faculties=options["faculties"],
+            departments=options["departments"],
+            teachers=options["teachers"],
+            periods=tuple(options["periods"] or ("2023/2024",)),
+            prefix=options["prefix"],
+        )
+        start = time.perf_counter()
+        try:
+            created = university.generate()
+        except ValueError as e:
+            raise CommandError(e)
+
+        self.stdout.write(", ".join(f"{count} {name}" for name, count in created.items()))
+        self.stdout.write(f"Generated in {time.perf_counter() - start:.2f}s", style_func=self.style.SUCCESS)
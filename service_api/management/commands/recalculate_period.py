@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from service_api.pipeline import StageResult, get_report_period
+from service_api.pipeline.stages import BATCH_ENGINE, ENGINES, PIPELINE, RAW_REPORTS
+
+
+class Command(BaseCommand):
+    help = "Recalculate reports and all places of the report period in one transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--period", help="Report period, e.g. 2023/2024. The active one by default")
+        parser.add_argument("--force", action="store_true", help="Run the stages even if their inputs did not change")
+        parser.add_argument("--engine", choices=ENGINES, default=BATCH_ENGINE, help="Engine of the raw reports stage")
+
+    def handle(self, *args, **options):
+        report_period = get_report_period(options["period"])
+        self.stdout.write(f"Report period {report_period}")
+        results = PIPELINE.run(
+            report_period,
+            force=options["force"],
+            stage_kwargs={RAW_REPORTS: {"engine": options["engine"]}},
+            callback=self.write_result,
+        )
+        self.stdout.write(f"Finished in {sum(r.duration for r in results):.2f}s", style_func=self.style.SUCCESS)
+
+    def write_result(self, result: StageResult):
+        if result.status == StageResult.SKIPPED:
+            self.stdout.write(f"{result.stage.name:<24} skipped, inputs unchanged", style_func=self.style.WARNING)
+        else:
+            self.stdout.write(f"{result.stage.name:<24} {result.duration:8.2f}s {result.rows:8} rows")
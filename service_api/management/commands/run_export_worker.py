@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from service_api import export_jobs
+from service_api.models import ExportJob
+
+
+class Command(BaseCommand):
+    help = "Run the export jobs queued in the admin and write their files to EXPORT_JOBS_DIR"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+        parser.add_argument("--sleep", type=float, default=5, help="Seconds between the polls of an empty queue")
+
+    def handle(self, *args, **options):
+        while True:
+            job = export_jobs.claim_next()
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["sleep"])
+                continue
+
+            self.stdout.write(f"Export job {job.pk}: {job}")
+            job = export_jobs.run(job)
+            if job.status == ExportJob.DONE:
+                self.stdout.write(f"{job.file_name} {job.rows} rows", style_func=self.style.SUCCESS)
+            else:
+                self.stdout.write(job.error, style_func=self.style.ERROR)
@@ -0,0 +1,63 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from service_api.calculations.simulation import ScoringSimulation, parse_overrides
+from service_api.pipeline import get_report_period
+
+
+class Command(BaseCommand):
+    help = "Recalculate places with changed coefficients and show rank movements, the database is not changed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--period", help="Report period, e.g. 2023/2024. The active one by default")
+        parser.add_argument(
+            "--set",
+            action="append",
+            default=[],
+            dest="overrides",
+            metavar="PATH=VALUE",
+            help="Coefficient override, e.g. educationalandmethodicalwork.WORKLOAD_RATE.one_one=700, "
+            "educationalandmethodicalwork.FIELD_RATE.two_one=60, "
+            "organizationalandeducationalwork.FLAG_RATE.five_one=300 "
+            "or places.scientificandinnovativework_place=2, the rates are the upper case attributes "
+            "of the batch calculations. May be repeated",
+        )
+        parser.add_argument("--all", action="store_true", help="Show unchanged places too")
+        parser.add_argument("--json", action="store_true", help="Output JSON lines")
+
+    def handle(self, *args, **options):
+        try:
+            overrides = parse_overrides(options["overrides"])
+        except ValueError as e:
+            raise CommandError(e)
+
+        simulation = ScoringSimulation(get_report_period(options["period"]))
+        start = time.perf_counter()
+        simulation.load()
+        loaded = time.perf_counter()
+        try:
+            movements = simulation.run(overrides)
+        except ValueError as e:
+            raise CommandError(e)
+        finished = time.perf_counter()
+
+        if not options["all"]:
+            movements = [m for m in movements if m.changed]
+        for movement in movements:
+            if options["json"]:
+                self.stdout.write(json.dumps(movement.as_dict(), ensure_ascii=False))
+            else:
+                shift = f"{movement.shift:+d}" if movement.shift is not None else ""
+                self.stdout.write(
+                    f"{movement.level:<20} {movement.name:<40} "
+                    f"{movement.stored_place or '-':>6} -> {movement.simulated_place or '-':<6} {shift}"
+                )
+
+        if not options["json"]:
+            self.stdout.write(
+                f"{len([m for m in movements if m.changed])} places changed, "
+                f"loaded in {loaded - start:.2f}s, simulated in {finished - loaded:.2f}s",
+                style_func=self.style.SUCCESS,
+            )
@@ -0,0 +1,79 @@
+# Generated by Django 3.2.16 on 2026-10-18 07:39
+
+import math
+
+from django.db import migrations, models
+
+
+# the parser as of this migration, the migration doesn't depend on the current code of the app
+def to_number(token: str, empty_as_zero: bool = True) -> float:
+    token = token.replace(",", ".")
+    if empty_as_zero:
+        token = token or 0
+    number = float(token)
+    return number if math.isfinite(number) else 0.0
+
+
+def parse_numbers(value: str) -> list:
+    return [to_number(token) for token in value.split(";")]
+
+
+def parse_v_k_pairs(value: str) -> list:
+    if value == "0":
+        return []
+
+    pairs = []
+    for token in value.split(";"):
+        v, k = token.split("(")
+        pairs.append((to_number(v, empty_as_zero=False), to_number(k.replace(")", ""))))
+    return pairs
+
+
+PARSED_FIELDS = {
+    "educationalandmethodicalwork": {
+        field: parse_v_k_pairs
+        for field in (
+            "six_one", "six_two", "six_three", "six_four",
+            "seven_one", "seven_two", "seven_three", "seven_four",
+            "seven_five", "seven_six", "seven_seven", "seven_eight",
+        )
+    },
+    "organizationalandeducationalwork": {"eighteen_one": parse_numbers},
+}
+
+
+def fill_parsed_values(apps, schema_editor):
+    for model_name, parsed_fields in PARSED_FIELDS.items():
+        model = apps.get_model("service_api", model_name)
+        reports = []
+        for report in model.objects.only("pk", *parsed_fields).iterator():
+            report.parsed_values = {}
+            for field, parser in parsed_fields.items():
+                value = getattr(report, field)
+                try:
+                    report.parsed_values[field] = [value, parser(value)]
+                except (ValueError, AttributeError):
+                    continue
+            reports.append(report)
+        model.objects.bulk_update(reports, ["parsed_values"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_api', '0019_decansresults_facultyresults_headsofdepartmentsresults_teacherresults'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='educationalandmethodicalwork',
+            name='parsed_values',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='organizationalandeducationalwork',
+            name='parsed_values',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(fill_parsed_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.16 on 2026-10-18 07:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_api', '0020_parsed_values'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PipelineRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(max_length=64)),
+                ('fingerprint', models.CharField(max_length=40)),
+                ('rows', models.IntegerField(default=0)),
+                ('duration', models.FloatField(default=0)),
+                ('finished_at', models.DateTimeField(auto_now=True)),
+                ('report_period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='service_api.reportperiod')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='pipelinerun',
+            constraint=models.UniqueConstraint(fields=('report_period', 'stage'), name='unique_pipeline_run_stage'),
+        ),
+    ]
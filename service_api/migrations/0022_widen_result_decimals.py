@@ -0,0 +1,38 @@
+# Generated by Django 3.2.16 on 2026-10-18 07:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_api', '0021_pipelinerun'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='facultyresults',
+            name='places_sum',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=16, null=True),
+        ),
+        migrations.AlterField(
+            model_name='facultyresults',
+            name='places_sum_average',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=16, null=True),
+        ),
+        migrations.AlterField(
+            model_name='headsofdepartmentsresults',
+            name='related_to_department_sum',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=16, null=True),
+        ),
+        migrations.AlterField(
+            model_name='headsofdepartmentsresults',
+            name='scores_sum',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=16, null=True),
+        ),
+        migrations.AlterField(
+            model_name='teacherresults',
+            name='scores_sum',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=16, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.16 on 2026-10-18 07:59
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicates(apps, schema_editor):
+    """Rows were matched by a lookup only, keep the first row of every faculty and report period"""
+    FacultyResults = apps.get_model("service_api", "FacultyResults")
+    first_ids = (
+        FacultyResults.objects.values("report_period", "faculty").annotate(first_id=Min("id")).values("first_id")
+    )
+    FacultyResults.objects.exclude(id__in=first_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_api', '0022_widen_result_decimals'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='facultyresults',
+            constraint=models.UniqueConstraint(fields=('report_period', 'faculty'), name='unique_faculty_results_report_period_faculty'),
+        ),
+    ]
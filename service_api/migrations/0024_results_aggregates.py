@@ -0,0 +1,47 @@
+# Generated by Django 3.2.16 on 2026-10-18 08:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0003_auto_20210628_1834'),
+        ('service_api', '0023_faculty_results_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacultyAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('results_sum', models.FloatField(default=0)),
+                ('results_count', models.IntegerField(default=0)),
+                ('scores_sum', models.DecimalField(decimal_places=4, default=0, max_digits=16)),
+                ('scores_count', models.IntegerField(default=0)),
+                ('faculty', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user_profile.faculty')),
+                ('report_period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='service_api.reportperiod')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DepartmentAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('results_sum', models.FloatField(default=0)),
+                ('results_count', models.IntegerField(default=0)),
+                ('scores_sum', models.DecimalField(decimal_places=4, default=0, max_digits=16)),
+                ('scores_count', models.IntegerField(default=0)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user_profile.department')),
+                ('report_period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='service_api.reportperiod')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='facultyaggregate',
+            constraint=models.UniqueConstraint(fields=('report_period', 'faculty'), name='unique_faculty_aggregate'),
+        ),
+        migrations.AddConstraint(
+            model_name='departmentaggregate',
+            constraint=models.UniqueConstraint(fields=('report_period', 'department'), name='unique_department_aggregate'),
+        ),
+    ]
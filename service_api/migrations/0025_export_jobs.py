@@ -0,0 +1,45 @@
+# Generated by Django 3.2.16 on 2026-10-18 08:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('service_api', '0024_results_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('export', models.CharField(choices=[('pivot', 'Звіт університету'), ('pivot_archive', 'Архів звітів факультетів та кафедр'), ('teachers_results', 'Рейтинг викладачів'), ('heads_of_departments_results', 'Рейтинг завідувачів кафедр'), ('faculty_results', 'Рейтинг факультетів'), ('decans_results', 'Рейтинг деканів')], max_length=64, verbose_name='Звіт')),
+                ('level_type', models.CharField(blank=True, max_length=20, null=True)),
+                ('level_pk', models.IntegerField(blank=True, null=True)),
+                ('export_format', models.CharField(default='csv', max_length=10, verbose_name='Формат')),
+                ('columns', models.CharField(blank=True, default='', max_length=1024)),
+                ('status', models.CharField(choices=[('pending', 'В черзі'), ('running', 'Виконується'), ('done', 'Готово'), ('failed', 'Помилка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('rows', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('file_name', models.CharField(blank=True, default='', max_length=256)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Додано')),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+                ('report_period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='service_api.reportperiod', verbose_name='Звітний період')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Користувач')),
+            ],
+            options={
+                'verbose_name': 'Експорт',
+                'verbose_name_plural': 'Експорти',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='exportjob',
+            index=models.Index(fields=['status', 'created_at'], name='export_job_status_created'),
+        ),
+    ]
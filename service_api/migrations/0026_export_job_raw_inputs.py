@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_api', '0025_export_jobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='export',
+            field=models.CharField(choices=[('pivot', 'Звіт університету'), ('pivot_archive', 'Архів звітів факультетів та кафедр'), ('raw_inputs', 'Вхідні дані звітів'), ('teachers_results', 'Рейтинг викладачів'), ('heads_of_departments_results', 'Рейтинг завідувачів кафедр'), ('faculty_results', 'Рейтинг факультетів'), ('decans_results', 'Рейтинг деканів')], max_length=64, verbose_name='Звіт'),
+        ),
+    ]
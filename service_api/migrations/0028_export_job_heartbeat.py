@@ -0,0 +1,26 @@
+# Generated by Django 3.2.16 on 2026-10-18 08:54
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def set_heartbeat(apps, schema_editor):
+    """The running jobs have no heartbeat yet, they count from their start"""
+    ExportJob = apps.get_model("service_api", "ExportJob")
+    ExportJob.objects.filter(started_at__isnull=False).update(heartbeat_at=F("started_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_api', '0026_export_job_raw_inputs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(set_heartbeat, migrations.RunPython.noop),
+    ]
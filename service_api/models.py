@@ -1,17 +1,22 @@
+import copy
 from datetime import datetime
 
 from django.contrib import admin
 from django.contrib.auth.models import User
 from django.core import validators
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from django.db.models import UniqueConstraint
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.templatetags.static import static
 from django.utils.safestring import mark_safe
 
 from service_api.calculations import BaseCalculation
+from service_api.calculations.parsers import parse_numbers, parse_v_k_pairs
+from system_app import versions
 from system_app.models import Documents
-from user_profile.models import Faculty
+from user_profile.models import Department, Faculty
 
 YES_SVG = f"<img src='{static('admin/img/icon-yes.svg')}' alt='False'>"
 NO_SVG = f"<img src='{static('admin/img/icon-no.svg')}' alt='False'>"
@@ -19,25 +24,21 @@ NO_SVG = f"<img src='{static('admin/img/icon-no.svg')}' alt='False'>"
 
 def number_semicolon_validator(value):
     try:
-        [int(i) for i in value.split(";")]
+        parse_numbers(value, number_type=int)
     except:
         raise ValidationError("Невірний формат даних. Введіть цілі числа через крапку з комою.")
 
 
 def float_number_semicolon_validator(value):
     try:
-        [float(i.replace(",", ".")) for i in value.split(";")]
+        parse_numbers(value)
     except:
         raise ValidationError("Невірний формат даних. Введіть цілі або дробні числа через крапку з комою.")
 
 
 def float_number_brackets_float_number_semicolon_validator(value):
     try:
-        if value != "0":
-            for i in value.split(";"):
-                v, k = i.split("(")
-                float(v.replace(",", "."))
-                float(k.replace(")", "").replace(",", "."))
+        parse_v_k_pairs(value)
     except:
         raise ValidationError(
             "Невірний формат даних. Цілі або дробні пари чисел в форматі V(K) "
@@ -47,6 +48,8 @@ def float_number_brackets_float_number_semicolon_validator(value):
 
 class BaseReportModel(models.Model):
     adjust_rate = 1
+    # Semicolon separated fields, parsed on save into `parsed_values`: {field name: parser}
+    parsed_fields = {}
 
     generic_report_data = models.OneToOneField("GenericReportData", on_delete=models.CASCADE, blank=True, null=True)
     result = models.FloatField(verbose_name="Підсумковий бал", default=0, validators=[validators.MinValueValidator(0)])
@@ -73,10 +76,37 @@ class BaseReportModel(models.Model):
     def get_final_result(self) -> float:
         return self.raw_calculation(self.result, self.generic_report_data)
 
+    def parse_values(self) -> dict:
+        """
+        :return: {field: [value, parsed value]}, the value tells the calculations whether the parse is current
+        """
+        parsed_values = {}
+        for field, parser in self.parsed_fields.items():
+            value = getattr(self, field)
+            try:
+                parsed_values[field] = [value, parser(value, strict=False)]
+            except (ValueError, AttributeError):
+                # Calculation parses the raw value
+                continue
+        return parsed_values
+
+    def save(self, *args, **kwargs):
+        if self.parsed_fields:
+            self.parsed_values = self.parse_values()
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and set(update_fields) & set(self.parsed_fields):
+                kwargs["update_fields"] = {*update_fields, "parsed_values"}
+        super().save(*args, **kwargs)
+
     class Meta:
         abstract = True
 
 
+REPORT_PERIODS_VERSION_KEY = "service_api.report_periods.version"
+# (version, {report period: object}) of the process, see ReportPeriod.get_cached
+_report_periods = (None, {})
+
+
 class ReportPeriod(models.Model):
     REPORT_PERIOD_CHOICES = [(f"{i}/{i + 1}", f"{i}/{i + 1}") for i in range(2020, 2030, 1)]
 
@@ -95,7 +125,39 @@ class ReportPeriod(models.Model):
 
     @staticmethod
     def get_active():
-        return ReportPeriod.objects.filter(is_active=True).first()
+        active = next((obj for obj in ReportPeriod.get_cached().values() if obj.is_active), None)
+        return copy.copy(active)
+
+    @staticmethod
+    def get_by_period(report_period: str):
+        """
+        :param report_period: "2023/2024"
+        """
+        return copy.copy(ReportPeriod.get_cached().get(report_period))
+
+    @staticmethod
+    def get_by_pk(pk: int):
+        return copy.copy(next((obj for obj in ReportPeriod.get_cached().values() if obj.pk == pk), None))
+
+    @staticmethod
+    def get_cached() -> dict:
+        """
+        All report periods {"2023/2024": report period}, kept by the process until a report period is saved
+        or deleted. The version of the periods is read from the default cache, a table of the database shared
+        by all processes, once per request, see system_app.versions, so a period activated in one worker
+        is active in the others on their next request. The objects are shared, use copies to change them.
+        """
+        global _report_periods
+        version = versions.get(REPORT_PERIODS_VERSION_KEY)
+        if _report_periods[0] != version:
+            _report_periods = (version, {obj.report_period: obj for obj in ReportPeriod.objects.order_by("pk")})
+        return _report_periods[1]
+
+    @staticmethod
+    def invalidate_cache():
+        global _report_periods
+        _report_periods = (None, {})
+        versions.change(REPORT_PERIODS_VERSION_KEY)
 
     @staticmethod
     def get_current_report_period():
@@ -156,13 +218,17 @@ class GenericReportData(models.Model):
 
     @admin.display(description="Всі звіти")
     def admin_reports(self):
-        report_conditions = [
-            f"{r.NAME}{YES_SVG if getattr(self, r.__name__.lower(), False) else NO_SVG}" for r in REPORT_MODELS
-        ]
+        report_conditions = [f"{r.NAME}{YES_SVG if self.is_report_done(r) else NO_SVG}" for r in REPORT_MODELS]
         return mark_safe("<br/>".join(report_conditions))
 
+    def is_report_done(self, report_model) -> bool:
+        name = report_model.__name__.lower()
+        # annotated by the admin changelist instead of a query per report, see GenericReportDataAdmin
+        done = getattr(self, f"{name}_done", None)
+        return bool(getattr(self, name, False)) if done is None else done
+
     def all_reports_done(self):
-        return all(getattr(self, r.__name__.lower(), False) for r in REPORT_MODELS)
+        return all(self.is_report_done(r) for r in REPORT_MODELS)
 
     class Meta:
         verbose_name = "Загальний звіт"
@@ -369,6 +435,16 @@ class EducationalAndMethodicalWork(BaseReportModel):
     # 15 Отримання звання
     fifteen_one = models.CharField(max_length=50, choices=POSITION_CHOICES, default=NONE, null=True, blank=True)
 
+    parsed_fields = {
+        field: parse_v_k_pairs
+        for field in (
+            "six_one", "six_two", "six_three", "six_four",
+            "seven_one", "seven_two", "seven_three", "seven_four",
+            "seven_five", "seven_six", "seven_seven", "seven_eight",
+        )
+    }
+    parsed_values = models.JSONField(default=dict, blank=True, editable=False)
+
     @staticmethod
     def get_report(user, report_period: ReportPeriod):
         return EducationalAndMethodicalWork.objects.filter(
@@ -612,6 +688,9 @@ class OrganizationalAndEducationalWork(BaseReportModel):
     twenty_one_two = models.BooleanField(verbose_name="національних", default=False)
     twenty_one_three = models.BooleanField(verbose_name="обласних", default=False)
 
+    parsed_fields = {"eighteen_one": parse_numbers}
+    parsed_values = models.JSONField(default=dict, blank=True, editable=False)
+
     @staticmethod
     def get_report(user, report_period):
         return OrganizationalAndEducationalWork.objects.filter(
@@ -639,7 +718,7 @@ class TeacherResults(models.Model):
     organizationalandeducationalwork_place = models.IntegerField(null=True, blank=True)
     scientificandinnovativework_place = models.IntegerField(null=True, blank=True)
 
-    scores_sum = models.DecimalField(decimal_places=4, max_digits=10, null=True, blank=True)
+    scores_sum = models.DecimalField(decimal_places=4, max_digits=16, null=True, blank=True)
     place = models.IntegerField(null=True, blank=True)
 
 
@@ -648,10 +727,10 @@ class HeadsOfDepartmentsResults(models.Model):
 
     teacher_result = models.OneToOneField(TeacherResults, on_delete=models.CASCADE)
 
-    related_to_department_sum = models.DecimalField(decimal_places=4, max_digits=10, null=True, blank=True)
+    related_to_department_sum = models.DecimalField(decimal_places=4, max_digits=16, null=True, blank=True)
     related_to_department_count = models.IntegerField(null=True, blank=True)
 
-    scores_sum = models.DecimalField(decimal_places=4, max_digits=10, null=True, blank=True)
+    scores_sum = models.DecimalField(decimal_places=4, max_digits=16, null=True, blank=True)
     place = models.IntegerField(null=True, blank=True)
 
 
@@ -669,11 +748,129 @@ class FacultyResults(models.Model):
     report_period = models.ForeignKey(ReportPeriod, on_delete=models.CASCADE)
     faculty = models.ForeignKey(Faculty, on_delete=models.CASCADE)
 
-    places_sum = models.DecimalField(decimal_places=4, max_digits=10, null=True, blank=True)
+    places_sum = models.DecimalField(decimal_places=4, max_digits=16, null=True, blank=True)
     places_sum_count = models.IntegerField(null=True, blank=True)
-    places_sum_average = models.DecimalField(decimal_places=4, max_digits=10, null=True, blank=True)
+    places_sum_average = models.DecimalField(decimal_places=4, max_digits=16, null=True, blank=True)
 
     place = models.IntegerField(null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=["report_period", "faculty"], name="unique_faculty_results_report_period_faculty")
+        ]
+
+
+class PipelineRun(models.Model):
+    """
+    Last successful run of a ranking pipeline stage, see service_api.pipeline
+    """
+
+    report_period = models.ForeignKey(ReportPeriod, on_delete=models.CASCADE)
+    stage = models.CharField(max_length=64)
+    fingerprint = models.CharField(max_length=40)
+    rows = models.IntegerField(default=0)
+    duration = models.FloatField(default=0)
+    finished_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [UniqueConstraint(fields=["report_period", "stage"], name="unique_pipeline_run_stage")]
+
+
+class ResultsAggregate(models.Model):
+    """
+    Running sums of the teachers of a group for a report period, see service_api.aggregates
+    """
+
+    report_period = models.ForeignKey(ReportPeriod, on_delete=models.CASCADE)
+
+    results_sum = models.FloatField(default=0)
+    results_count = models.IntegerField(default=0)
+    scores_sum = models.DecimalField(decimal_places=4, max_digits=16, default=0)
+    scores_count = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DepartmentAggregate(ResultsAggregate):
+    department = models.ForeignKey(Department, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=["report_period", "department"], name="unique_department_aggregate")
+        ]
+
+
+class FacultyAggregate(ResultsAggregate):
+    faculty = models.ForeignKey(Faculty, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [UniqueConstraint(fields=["report_period", "faculty"], name="unique_faculty_aggregate")]
+
+
+class ExportJob(models.Model):
+    """
+    Export written to EXPORT_JOBS_DIR by the run_export_worker command, see service_api.export_jobs
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "В черзі"),
+        (RUNNING, "Виконується"),
+        (DONE, "Готово"),
+        (FAILED, "Помилка"),
+    )
+
+    PIVOT = "pivot"
+    PIVOT_ARCHIVE = "pivot_archive"
+    RAW_INPUTS = "raw_inputs"
+    EXPORT_CHOICES = (
+        (PIVOT, "Звіт університету"),
+        (PIVOT_ARCHIVE, "Архів звітів факультетів та кафедр"),
+        (RAW_INPUTS, "Вхідні дані звітів"),
+        (TeacherResults.file_name, "Рейтинг викладачів"),
+        (HeadsOfDepartmentsResults.file_name, "Рейтинг завідувачів кафедр"),
+        (FacultyResults.file_name, "Рейтинг факультетів"),
+        (DecansResults.file_name, "Рейтинг деканів"),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Користувач")
+    report_period = models.ForeignKey(ReportPeriod, on_delete=models.CASCADE, verbose_name="Звітний період")
+    export = models.CharField(max_length=64, choices=EXPORT_CHOICES, verbose_name="Звіт")
+    level_type = models.CharField(max_length=20, null=True, blank=True)
+    level_pk = models.IntegerField(null=True, blank=True)
+    export_format = models.CharField(max_length=10, default="csv", verbose_name="Формат")
+    columns = models.CharField(max_length=1024, blank=True, default="")
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name="Статус")
+    rows = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    file_name = models.CharField(max_length=256, blank=True, default="")
+    error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Додано")
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершено")
+
+    class Meta:
+        verbose_name = "Експорт"
+        verbose_name_plural = "Експорти"
+        indexes = [models.Index(fields=["status", "created_at"], name="export_job_status_created")]
+
+    def __str__(self):
+        return f"{self.get_export_display()} {self.report_period}"
+
 
 REPORT_MODELS = (EducationalAndMethodicalWork, ScientificAndInnovativeWork, OrganizationalAndEducationalWork)
+
+
+@receiver(post_save, sender=ReportPeriod)
+@receiver(post_delete, sender=ReportPeriod)
+def report_period_changed(sender, **kwargs):
+    ReportPeriod.invalidate_cache()
+    # periods cached inside the transaction may contain rolled back changes
+    transaction.on_commit(ReportPeriod.invalidate_cache)
@@ -0,0 +1,132 @@
+"""
+Ranking pipeline: stages with declared dependencies, executed for one report period in one transaction.
+
+A stage is skipped when the fingerprint of its inputs equals the fingerprint stored by its last successful run.
+"""
+import hashlib
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from service_api.models import PipelineRun, ReportPeriod
+
+
+def get_report_period(report_period: str = None) -> ReportPeriod:
+    """
+    :param report_period: "2023/2024" or "2023-2024", the active report period if empty
+    """
+    if report_period:
+        obj = ReportPeriod.get_by_period(report_period.replace("-", "/"))
+    else:
+        obj = ReportPeriod.get_active()
+    if obj is None:
+        raise ReportPeriod.DoesNotExist(f"Report period {report_period or 'active'} does not exist")
+    return obj
+
+
+def content_hash(*parts) -> str:
+    """
+    SHA1 of the rows of the given iterables, querysets are iterated without caching
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        rows = part.iterator() if hasattr(part, "iterator") else part
+        for row in rows:
+            digest.update(repr(row).encode())
+        digest.update(b"|")
+    return digest.hexdigest()
+
+
+class Stage:
+    def __init__(self, name: str, func, depends_on: tuple = (), inputs=None):
+        """
+        :param func: func(report_period, **kwargs) -> number of processed rows
+        :param depends_on: names of the stages which must be executed before
+        :param inputs: inputs(report_period) -> fingerprint, the stage is never skipped if None
+        """
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.inputs = inputs
+
+    def get_fingerprint(self, report_period: ReportPeriod):
+        return self.inputs(report_period) if self.inputs is not None else None
+
+    def __repr__(self):
+        return f"Stage({self.name})"
+
+
+class StageResult:
+    RAN = "ran"
+    SKIPPED = "skipped"
+
+    def __init__(self, stage: Stage, status: str, rows: int = 0, duration: float = 0):
+        self.stage = stage
+        self.status = status
+        self.rows = rows
+        self.duration = duration
+
+
+class Pipeline:
+    def __init__(self, stages: list[Stage]):
+        self.stages = self.sort(stages)
+
+    @staticmethod
+    def sort(stages: list[Stage]) -> list[Stage]:
+        """Topological order of the stages, declaration order is kept between independent stages"""
+        by_name = {stage.name: stage for stage in stages}
+        for stage in stages:
+            unknown = set(stage.depends_on) - set(by_name)
+            if unknown:
+                raise ImproperlyConfigured(f"{stage} depends on unknown stages {', '.join(sorted(unknown))}")
+
+        ordered, done = [], set()
+        while len(ordered) < len(stages):
+            ready = [s for s in stages if s.name not in done and set(s.depends_on) <= done]
+            if not ready:
+                raise ImproperlyConfigured(f"Circular dependency between {[s for s in stages if s.name not in done]}")
+            ordered.append(ready[0])
+            done.add(ready[0].name)
+        return ordered
+
+    def run(self, report_period: ReportPeriod, force: bool = False, stage_kwargs: dict = None, callback=None):
+        """
+        Executes all stages in one transaction, every stage in its own savepoint.
+        Any error rolls back the whole run.
+
+        :param force: execute stages even if their inputs did not change
+        :param stage_kwargs: {stage name: kwargs of the stage function}
+        :param callback: callback(StageResult) after every stage
+        :return: list of StageResult
+        """
+        stage_kwargs = stage_kwargs or {}
+        last_runs = {run.stage: run for run in PipelineRun.objects.filter(report_period=report_period)}
+        results = []
+        with transaction.atomic():
+            for stage in self.stages:
+                last_run = last_runs.get(stage.name)
+                fingerprint = stage.get_fingerprint(report_period)
+                if not force and fingerprint is not None and last_run and last_run.fingerprint == fingerprint:
+                    result = StageResult(stage, StageResult.SKIPPED)
+                else:
+                    start = time.perf_counter()
+                    with transaction.atomic():
+                        rows = stage.func(report_period, **stage_kwargs.get(stage.name, {}))
+                    result = StageResult(stage, StageResult.RAN, rows, time.perf_counter() - start)
+
+                    PipelineRun.objects.update_or_create(
+                        report_period=report_period,
+                        stage=stage.name,
+                        defaults={
+                            # inputs may be changed by the stage itself, e.g. created empty reports
+                            "fingerprint": stage.get_fingerprint(report_period) or "",
+                            "rows": result.rows,
+                            "duration": result.duration,
+                        },
+                    )
+
+                results.append(result)
+                if callback is not None:
+                    callback(result)
+        return results
@@ -0,0 +1,363 @@
+"""
+Stages of the ranking pipeline. Every stage calculates one report period and returns the number of processed rows.
+"""
+import operator
+from functools import reduce
+
+from django.db.models import (
+    BooleanField,
+    Case,
+    Count,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Max,
+    Q,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.functions import Coalesce, RowNumber
+
+from service_api import aggregates
+from service_api.calculations import rollup
+from service_api.calculations.batch_calc import ParallelReportPeriodBatchCalculation, ReportPeriodBatchCalculation
+from service_api.calculations.db_calc import ReportPeriodDatabaseCalculation
+from service_api.calculations.educational_and_methodical_work_calc import EducationalAndMethodicalWorkCalculation
+from service_api.calculations.generic_report_calc import GenericReportCalculation
+from service_api.calculations.organizational_and_educational_work_calc import (
+    OrganizationalAndEducationalWorkCalculation,
+)
+from service_api.calculations.scientific_and_innovative_work_calc import ScientificAndInnovativeWorkCalculation
+from service_api.export_cache import changes_exports
+from service_api.pipeline import Pipeline, Stage, content_hash
+from service_api.upsert import bulk_upsert
+from service_api.models import (
+    REPORT_MODELS,
+    DecansResults,
+    DepartmentAggregate,
+    EducationalAndMethodicalWork,
+    FacultyAggregate,
+    FacultyResults,
+    GenericReportData,
+    HeadsOfDepartmentsResults,
+    OrganizationalAndEducationalWork,
+    ReportPeriod,
+    ScientificAndInnovativeWork,
+    TeacherResults,
+)
+from user_profile.models import Department, Position, Profile
+
+MODEL_CALC_MAP = {
+    EducationalAndMethodicalWork.__name__.lower(): EducationalAndMethodicalWorkCalculation,
+    ScientificAndInnovativeWork.__name__.lower(): ScientificAndInnovativeWorkCalculation,
+    OrganizationalAndEducationalWork.__name__.lower(): OrganizationalAndEducationalWorkCalculation,
+}
+
+BATCH_ENGINE = "batch"
+SCALAR_ENGINE = "scalar"
+DATABASE_ENGINE = "db"
+ENGINES = (BATCH_ENGINE, SCALAR_ENGINE, DATABASE_ENGINE)
+
+PLACE_FIELDS = [report.__name__.lower() + "_place" for report in REPORT_MODELS]
+PLACE_RATES = {
+    "educationalandmethodicalwork_place": 1.5,
+    "scientificandinnovativework_place": 1.5,
+    "organizationalandeducationalwork_place": 1,
+}
+
+
+def create_missing_reports(report_period: ReportPeriod):
+    """
+    Empty generic and section reports for the staff who didn't fill them in
+    :return: generic reports of the staff
+    """
+    profiles = Profile.objects.filter(department__isnull=False)
+    GenericReportData.objects.bulk_create(
+        [
+            GenericReportData(user_id=user_id, report_period=report_period)
+            for user_id in profiles.exclude(user__genericreportdata__report_period=report_period).values_list(
+                "user_id", flat=True
+            )
+        ]
+    )
+    generic_reports = GenericReportData.objects.filter(
+        report_period=report_period, user__profile__department__isnull=False
+    )
+    for report_model in REPORT_MODELS:
+        missing = generic_reports.filter(**{f"{report_model.__name__.lower()}__isnull": True})
+        report_model.objects.bulk_create(
+            [report_model(generic_report_data_id=pk) for pk in missing.values_list("pk", flat=True)]
+        )
+    return generic_reports
+
+
+@changes_exports
+def calc_raw_reports(report_period: ReportPeriod, engine: str = BATCH_ENGINE, workers: int = 1) -> int:
+    """
+    :param workers: number of processes of the batch engine, partitioned by faculty
+    """
+    generic_reports = create_missing_reports(report_period)
+
+    if engine == SCALAR_ENGINE:
+        generic_reports = list(generic_reports)
+        for generic_report in generic_reports:
+            for report_model in REPORT_MODELS:
+                report = getattr(generic_report, report_model.__name__.lower())
+                result = MODEL_CALC_MAP[report_model.__name__.lower()](report).get_result()
+                report.result = result
+                report.adjusted_result = report_model.raw_calculation(result, generic_report)
+                report.save()
+
+        results = GenericReportCalculation.get_results(generic_reports)
+        for generic_report in generic_reports:
+            generic_report.result = results[generic_report.pk]
+            generic_report.save()
+        return len(generic_reports)
+
+    if engine == DATABASE_ENGINE:
+        return ReportPeriodDatabaseCalculation(report_period, generic_reports).calculate()
+
+    if workers > 1:
+        calc_obj = ParallelReportPeriodBatchCalculation(report_period, generic_reports, workers=workers)
+    else:
+        calc_obj = ReportPeriodBatchCalculation(report_period, generic_reports)
+    count = len(calc_obj.calculate())
+    calc_obj.save()
+    return count
+
+
+def section_place(report_name: str):
+    """
+    ROW_NUMBER() OVER (ORDER BY result DESC) among teachers who have the report,
+    NULL for teachers without it
+    """
+    has_report = Q(**{f"{report_name}__isnull": False})
+    return Case(
+        When(
+            has_report,
+            then=Window(
+                expression=RowNumber(),
+                partition_by=[ExpressionWrapper(has_report, output_field=BooleanField())],
+                order_by=[F(f"{report_name}__result").desc(), F("pk").asc()],
+            ),
+        ),
+        default=None,
+    )
+
+
+@changes_exports
+def calc_teachers_places(report_period: ReportPeriod) -> int:
+    places = {report.__name__.lower() + "_place": section_place(report.__name__.lower()) for report in REPORT_MODELS}
+    scores_sum = sum(
+        (Value(PLACE_RATES[place_name]) * Coalesce(place, Value(0)) for place_name, place in places.items()),
+        Value(0.0),
+    )
+    rows = (
+        GenericReportData.objects.filter(report_period=report_period)
+        .filter(reduce(operator.or_, (Q(**{f"{report.__name__.lower()}__isnull": False}) for report in REPORT_MODELS)))
+        .annotate(**places, scores_sum=ExpressionWrapper(scores_sum, output_field=FloatField()))
+        .values_list("pk", *PLACE_FIELDS, "scores_sum")
+    )
+
+    teacher_results = [
+        TeacherResults(
+            generic_report_data_id=generic_report_id,
+            scores_sum=scores_sum,
+            **dict(zip(PLACE_FIELDS, section_places)),
+        )
+        for generic_report_id, *section_places, scores_sum in rows
+    ]
+    teacher_results.sort(key=lambda tr: (tr.scores_sum, tr.generic_report_data_id))
+    for place, tr in enumerate(teacher_results, start=1):
+        tr.place = place
+
+    count = bulk_upsert(TeacherResults, teacher_results, ["generic_report_data"])
+    # teachers without reports in the period anymore
+    TeacherResults.objects.filter(generic_report_data__report_period=report_period).exclude(
+        generic_report_data__in=[tr.generic_report_data_id for tr in teacher_results]
+    ).delete()
+    return count
+
+
+def load_rollup_teachers(report_period: ReportPeriod) -> list[rollup.RollupTeacher]:
+    """Teachers results of the period with their department, faculty and position in one query"""
+    return [
+        rollup.RollupTeacher(*row)
+        for row in TeacherResults.objects.filter(generic_report_data__report_period=report_period)
+        .order_by("pk")
+        .values_list(
+            "pk",
+            "generic_report_data__user__profile__department_id",
+            "generic_report_data__user__profile__department__faculty_id",
+            "generic_report_data__user__profile__position__cumulative_calculation",
+            "scores_sum",
+        )
+    ]
+
+
+def calc_aggregates(report_period: ReportPeriod) -> int:
+    return aggregates.rebuild(report_period)
+
+
+@changes_exports
+def calc_heads_of_departments(report_period: ReportPeriod) -> int:
+    heads = rollup.calc_heads_of_departments(
+        load_rollup_teachers(report_period), aggregates.scores_by_group(report_period, DepartmentAggregate)
+    )
+    bulk_upsert(
+        HeadsOfDepartmentsResults,
+        [
+            HeadsOfDepartmentsResults(
+                teacher_result_id=head.teacher.key,
+                related_to_department_sum=head.related_to_department_sum,
+                related_to_department_count=head.related_to_department_count,
+                scores_sum=head.scores_sum,
+                place=head.place,
+            )
+            for head in heads
+        ],
+        ["teacher_result"],
+    )
+    # teachers who are not heads anymore
+    HeadsOfDepartmentsResults.objects.filter(
+        teacher_result__generic_report_data__report_period=report_period
+    ).exclude(teacher_result__in=[head.teacher.key for head in heads]).delete()
+    return len(heads)
+
+
+@changes_exports
+def calc_faculty(report_period: ReportPeriod) -> int:
+    faculties = rollup.calc_faculties(
+        load_rollup_teachers(report_period), aggregates.scores_by_group(report_period, FacultyAggregate)
+    )
+    bulk_upsert(
+        FacultyResults,
+        [
+            FacultyResults(
+                report_period=report_period,
+                faculty_id=faculty.faculty_id,
+                places_sum=faculty.places_sum,
+                places_sum_count=faculty.places_sum_count,
+                places_sum_average=faculty.places_sum_average,
+                place=faculty.place,
+            )
+            for faculty in faculties
+        ],
+        ["report_period", "faculty"],
+    )
+    FacultyResults.objects.filter(report_period=report_period).exclude(
+        faculty__in=[faculty.faculty_id for faculty in faculties]
+    ).delete()
+    return len(faculties)
+
+
+@changes_exports
+def calc_decans(report_period: ReportPeriod) -> int:
+    teachers = load_rollup_teachers(report_period)
+    faculties = rollup.calc_faculties(teachers, aggregates.scores_by_group(report_period, FacultyAggregate))
+    decans = rollup.calc_decans(teachers, faculties)
+    bulk_upsert(
+        DecansResults,
+        [
+            DecansResults(teacher_result_id=decan.teacher.key, sum_place=decan.sum_place, place=decan.place)
+            for decan in decans
+        ],
+        ["teacher_result"],
+    )
+    DecansResults.objects.filter(teacher_result__generic_report_data__report_period=report_period).exclude(
+        teacher_result__in=[decan.teacher.key for decan in decans]
+    ).delete()
+    return len(decans)
+
+
+def org_structure_inputs():
+    return (
+        Profile.objects.order_by("pk").values_list("user_id", "department_id", "position_id"),
+        Department.objects.order_by("pk").values_list("pk", "faculty_id"),
+        Position.objects.order_by("pk").values_list("pk", "cumulative_calculation"),
+    )
+
+
+def raw_reports_inputs(report_period: ReportPeriod) -> str:
+    # Reports are edited through save(), so updated_at reflects every change of the raw values
+    reports = [
+        model.objects.filter(generic_report_data__report_period=report_period).aggregate(
+            Count("pk"), Max("updated_at")
+        )
+        for model in REPORT_MODELS
+    ]
+    return content_hash(
+        (report_period.annual_workload,),
+        GenericReportData.objects.filter(report_period=report_period).aggregate(Count("pk"), Max("updated_at")).items(),
+        reports,
+        *org_structure_inputs(),
+    )
+
+
+def teachers_places_inputs(report_period: ReportPeriod) -> str:
+    return content_hash(
+        *[
+            model.objects.filter(generic_report_data__report_period=report_period)
+            .order_by("pk")
+            .values_list("generic_report_data_id", "result")
+            for model in REPORT_MODELS
+        ]
+    )
+
+
+def teacher_results_inputs(report_period: ReportPeriod):
+    return (
+        TeacherResults.objects.filter(generic_report_data__report_period=report_period)
+        .order_by("pk")
+        .values_list("pk", "generic_report_data_id", "scores_sum"),
+        *org_structure_inputs(),
+    )
+
+
+def aggregates_inputs(report_period: ReportPeriod) -> str:
+    return content_hash(
+        GenericReportData.objects.filter(report_period=report_period).order_by("pk").values_list("pk", "result"),
+        *teacher_results_inputs(report_period),
+    )
+
+
+def heads_of_departments_inputs(report_period: ReportPeriod) -> str:
+    return content_hash(*teacher_results_inputs(report_period))
+
+
+def faculty_inputs(report_period: ReportPeriod) -> str:
+    return content_hash(*teacher_results_inputs(report_period))
+
+
+def decans_inputs(report_period: ReportPeriod) -> str:
+    return content_hash(
+        *teacher_results_inputs(report_period),
+        FacultyResults.objects.filter(report_period=report_period)
+        .order_by("pk")
+        .values_list("faculty_id", "places_sum_average"),
+    )
+
+
+RAW_REPORTS = "raw_reports"
+TEACHERS_PLACES = "teachers_places"
+AGGREGATES = "aggregates"
+HEADS_OF_DEPARTMENTS = "heads_of_departments"
+FACULTY = "faculty"
+DECANS = "decans"
+
+PIPELINE = Pipeline(
+    [
+        Stage(RAW_REPORTS, calc_raw_reports, inputs=raw_reports_inputs),
+        Stage(TEACHERS_PLACES, calc_teachers_places, depends_on=(RAW_REPORTS,), inputs=teachers_places_inputs),
+        Stage(AGGREGATES, calc_aggregates, depends_on=(RAW_REPORTS, TEACHERS_PLACES), inputs=aggregates_inputs),
+        Stage(
+            HEADS_OF_DEPARTMENTS,
+            calc_heads_of_departments,
+            depends_on=(TEACHERS_PLACES, AGGREGATES),
+            inputs=heads_of_departments_inputs,
+        ),
+        Stage(FACULTY, calc_faculty, depends_on=(TEACHERS_PLACES, AGGREGATES), inputs=faculty_inputs),
+        Stage(DECANS, calc_decans, depends_on=(TEACHERS_PLACES, AGGREGATES, FACULTY), inputs=decans_inputs),
+    ]
+)
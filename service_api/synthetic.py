@@ -0,0 +1,268 @@
+"""
+Deterministic synthetic university for load and scale testing.
+
+The same seed and sizes always give the same faculties, departments, staff and reports.
+Everything is inserted with bulk_create, report values are generated from the field definitions
+of the report models, so they pass the model validators.
+"""
+import random
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.auth.models import User
+from django.core import validators
+from django.db import models, transaction
+
+from service_api.models import (
+    REPORT_MODELS,
+    BaseReportModel,
+    EducationalAndMethodicalWork,
+    GenericReportData,
+    ReportPeriod,
+    float_number_brackets_float_number_semicolon_validator,
+    float_number_semicolon_validator,
+    number_semicolon_validator,
+)
+from user_profile.models import Department, Faculty, Position, Profile
+
+FIRST_NAMES = ("Олександр", "Андрій", "Олена", "Ірина", "Сергій", "Наталія", "Віктор", "Тетяна", "Юрій", "Оксана")
+LAST_NAMES = ("Коваленко", "Бондаренко", "Ткаченко", "Шевченко", "Мельник", "Кравченко", "Олійник", "Лисенко")
+# Share of empty values, most of the report fields are not filled in by most of the staff
+EMPTY_RATE = 0.7
+
+
+def random_v_k(rnd: random.Random) -> str:
+    if rnd.random() < EMPTY_RATE:
+        return "0"
+    return ";".join(
+        f"{rnd.randint(1, 40)},{rnd.randint(0, 9)}({rnd.choice(('1', '0,5', '0,25', '0,3'))})"
+        for _ in range(rnd.randint(1, 3))
+    )
+
+
+def random_numbers(rnd: random.Random, number_type=float) -> str:
+    if rnd.random() < EMPTY_RATE:
+        return "0"
+    if number_type is int:
+        return ";".join(str(rnd.randint(1, 10)) for _ in range(rnd.randint(1, 3)))
+    return ";".join(f"{rnd.randint(1, 10)},{rnd.randint(0, 9)}" for _ in range(rnd.randint(1, 3)))
+
+
+def max_value(field: models.Field, default):
+    for validator in field.validators:
+        if isinstance(validator, validators.MaxValueValidator):
+            return validator.limit_value
+    return default
+
+
+def field_generator(field: models.Field):
+    """
+    rnd -> plausible value of the report field, None if the field is not filled by the staff
+    """
+    if field.choices:
+        values = [value for value, _ in field.choices]
+        return lambda rnd: values[0] if rnd.random() < EMPTY_RATE else rnd.choice(values[1:])
+
+    if isinstance(field, models.BooleanField):
+        return lambda rnd: rnd.random() > EMPTY_RATE
+
+    if isinstance(field, models.CharField):
+        if float_number_brackets_float_number_semicolon_validator in field.validators:
+            return random_v_k
+        if float_number_semicolon_validator in field.validators:
+            return random_numbers
+        if number_semicolon_validator in field.validators:
+            return lambda rnd: random_numbers(rnd, int)
+        return None
+
+    if isinstance(field, models.IntegerField):
+        limit = max_value(field, 5)
+        return lambda rnd: 0 if rnd.random() < EMPTY_RATE else rnd.randint(1, min(limit, 5))
+
+    if isinstance(field, models.FloatField):
+        limit = max_value(field, 100)
+        return lambda rnd: 0 if rnd.random() < EMPTY_RATE else round(rnd.uniform(0, limit), 2)
+
+    return None
+
+
+def report_generators(report_model) -> list:
+    base_fields = {field.name for field in BaseReportModel._meta.get_fields()} | {"id", "parsed_values"}
+    generators = []
+    for field in report_model._meta.concrete_fields:
+        if field.name in base_fields:
+            continue
+        generator = field_generator(field)
+        if generator is not None:
+            generators.append((field.name, generator))
+    return generators
+
+
+class SyntheticUniversity:
+    """
+    Usage:
+        SyntheticUniversity(seed=1, teachers=50000).generate()
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        faculties: int = 5,
+        departments: int = 5,
+        teachers: int = 1000,
+        periods: tuple = ("2023/2024",),
+        prefix: str = "synthetic",
+        batch_size: int = 2000,
+    ):
+        """
+        :param departments: departments per faculty
+        :param teachers: staff of the university including heads of departments and decans
+        :param prefix: prefix of usernames, faculty and position titles
+        """
+        self.rnd = random.Random(seed)
+        self.faculties = faculties
+        self.departments = departments
+        self.teachers = teachers
+        self.periods = periods
+        self.prefix = prefix
+        self.batch_size = batch_size
+
+    def bulk_create(self, model, objects: list) -> list:
+        return model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def create_positions(self) -> dict:
+        positions = {}
+        for cumulative_calculation, title in (
+            (None, "викладач"),
+            (Position.BY_DEPARTMENT, "завідувач кафедри"),
+            (Position.BY_FACULTY, "декан"),
+        ):
+            positions[cumulative_calculation], _ = Position.objects.get_or_create(
+                title=f"{self.prefix} {title}", defaults={"cumulative_calculation": cumulative_calculation}
+            )
+        return positions
+
+    def create_departments(self) -> list[list[int]]:
+        """
+        :return: department pks of every faculty
+        """
+        self.bulk_create(Faculty, [Faculty(title=f"{self.prefix} факультет {i}") for i in range(self.faculties)])
+        faculties = Faculty.objects.filter(title__startswith=f"{self.prefix} факультет ").order_by("pk")
+        self.bulk_create(
+            Department,
+            [
+                Department(faculty_id=faculty_id, title=f"{self.prefix} кафедра {i}.{j}")
+                for i, faculty_id in enumerate(faculties.values_list("pk", flat=True))
+                for j in range(self.departments)
+            ],
+        )
+        departments = {}
+        for pk, faculty_id in (
+            Department.objects.filter(faculty__in=faculties).order_by("pk").values_list("pk", "faculty_id")
+        ):
+            departments.setdefault(faculty_id, []).append(pk)
+        return list(departments.values())
+
+    def create_staff(self, faculties: list[list[int]], positions: dict) -> list[int]:
+        """
+        Every department gets a head, every faculty gets a decan in its first department,
+        the rest of the staff is spread over the departments
+        :return: user pks
+        """
+        self.bulk_create(
+            User,
+            [
+                User(
+                    username=f"{self.prefix}{i:06d}",
+                    email=f"{self.prefix}{i:06d}@example.com",
+                    first_name=f"{self.rnd.choice(FIRST_NAMES)} {self.rnd.choice(FIRST_NAMES)}",
+                    last_name=self.rnd.choice(LAST_NAMES),
+                    password=UNUSABLE_PASSWORD_PREFIX,
+                )
+                for i in range(self.teachers)
+            ],
+        )
+        users = list(
+            User.objects.filter(username__startswith=self.prefix).order_by("username").values_list("pk", flat=True)
+        )
+
+        departments = [department for faculty in faculties for department in faculty]
+        staff = [(department, positions[Position.BY_DEPARTMENT]) for department in departments]
+        staff += [(faculty[0], positions[Position.BY_FACULTY]) for faculty in faculties if faculty]
+        profiles = []
+        for i, user_id in enumerate(users):
+            if i < len(staff):
+                department_id, position = staff[i]
+            else:
+                department_id, position = departments[i % len(departments)], positions[None]
+            profiles.append(Profile(user_id=user_id, department_id=department_id, position_id=position.pk))
+        self.bulk_create(Profile, profiles)
+        return users
+
+    def create_report_periods(self) -> list[ReportPeriod]:
+        report_periods = []
+        for report_period in self.periods:
+            obj, _ = ReportPeriod.objects.get_or_create(
+                report_period=report_period, defaults={"annual_workload": round(self.rnd.uniform(500, 600), 1)}
+            )
+            report_periods.append(obj)
+        if not ReportPeriod.objects.filter(is_active=True).exists():
+            ReportPeriod.objects.filter(pk=report_periods[-1].pk).update(is_active=True)
+            ReportPeriod.invalidate_cache()
+        return report_periods
+
+    def create_reports(self, users: list[int], report_period: ReportPeriod) -> int:
+        rnd = self.rnd
+        self.bulk_create(
+            GenericReportData,
+            [
+                GenericReportData(
+                    user_id=user_id,
+                    report_period=report_period,
+                    assignment_duration=10 if rnd.random() < 0.9 else rnd.randint(1, 9),
+                    assignment=rnd.choice((1, 1, 1, 0.5, 0.25)),
+                    students_rating=round(rnd.uniform(0, 200), 2),
+                )
+                for user_id in users
+            ],
+        )
+        generic_reports = list(
+            GenericReportData.objects.filter(report_period=report_period, user__username__startswith=self.prefix)
+            .order_by("user__username")
+            .values_list("pk", flat=True)
+        )
+
+        for report_model in REPORT_MODELS:
+            generators = report_generators(report_model)
+            reports = []
+            for generic_report_id in generic_reports:
+                report = report_model(
+                    generic_report_data_id=generic_report_id, **{name: gen(rnd) for name, gen in generators}
+                )
+                if report_model is EducationalAndMethodicalWork:
+                    # total workload includes the classroom hours
+                    report.one_three = min(600, round(report.one_one + report.one_two + rnd.uniform(0, 300), 2))
+                report.parsed_values = report.parse_values()
+                reports.append(report)
+            self.bulk_create(report_model, reports)
+        return len(generic_reports)
+
+    @transaction.atomic
+    def generate(self) -> dict:
+        """
+        :return: number of created objects by model name
+        """
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise ValueError(f"Users with prefix {self.prefix} already exist")
+
+        positions = self.create_positions()
+        faculties = self.create_departments()
+        users = self.create_staff(faculties, positions)
+        report_periods = self.create_report_periods()
+        reports = sum(self.create_reports(users, report_period) for report_period in report_periods)
+        return {
+            "faculties": len(faculties),
+            "departments": sum(len(departments) for departments in faculties),
+            "users": len(users),
+            "report periods": len(report_periods),
+            "reports": reports,
+        }
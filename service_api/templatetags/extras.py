@@ -15,4 +15,10 @@ def period_url_replace(value: str) -> str:
 
 @register.filter()
 def filter_qs_by_report_period(qs, value):
-    return qs.filter(report_period=value).first()
+    """
+    First object of the report period. Objects are filtered in memory,
+    so prefetched objects don't query the database in a loop
+    :param value: report period or its pk
+    """
+    report_period_id = getattr(value, "pk", value)
+    return next((obj for obj in qs.all() if obj.report_period_id == report_period_id), None)
@@ -1,3 +1,1064 @@
-from django.test import TestCase
+import copy
+import csv
+import io
+import json
+import random
+import tempfile
+import zipfile
+from decimal import Decimal
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from service_api import aggregates, benchmark, export_cache, export_jobs
+from service_api.calculations.batch_calc import (
+    ParallelReportPeriodBatchCalculation,
+    ReportPeriodBatchCalculation,
+)
+from service_api.calculations.db_calc import ReportPeriodDatabaseCalculation
+from service_api.calculations.educational_and_methodical_work_calc import EducationalAndMethodicalWorkCalculation
+from service_api.calculations.generic_report_calc import GenericReportCalculation
+from service_api.calculations.parsers import parse_numbers, parse_v_k_pairs
+from service_api.calculations.organizational_and_educational_work_calc import (
+    OrganizationalAndEducationalWorkCalculation,
+)
+from service_api.calculations.scientific_and_innovative_work_calc import ScientificAndInnovativeWorkCalculation
+from service_api.calculations.simulation import TEACHER, ScoringSimulation
+from service_api.exports import FORMATS
+from service_api.forms.report_forms import EducationalAndMethodicalWorkForm
+from service_api.models import (
+    DecansResults,
+    DepartmentAggregate,
+    EducationalAndMethodicalWork,
+    ExportJob,
+    FacultyAggregate,
+    FacultyResults,
+    GenericReportData,
+    HeadsOfDepartmentsResults,
+    OrganizationalAndEducationalWork,
+    ReportPeriod,
+    REPORT_MODELS,
+    REPORT_PERIODS_VERSION_KEY,
+    ScientificAndInnovativeWork,
+    TeacherResults,
+)
+from service_api.pipeline import StageResult
+from service_api.pipeline.stages import PIPELINE, RAW_REPORTS
+from service_api.synthetic import SyntheticUniversity
+from service_api.upsert import bulk_upsert
+from system_app import versions
+from user_profile.hierarchy import get_hierarchy
+from user_profile.models import Department, Faculty, Position, Profile
+
+MODEL_CALC_MAP = {
+    EducationalAndMethodicalWork: EducationalAndMethodicalWorkCalculation,
+    ScientificAndInnovativeWork: ScientificAndInnovativeWorkCalculation,
+    OrganizationalAndEducationalWork: OrganizationalAndEducationalWorkCalculation,
+}
+
+
+def random_v_k(rnd: random.Random) -> str:
+    if rnd.random() < 0.5:
+        return "0"
+    return ";".join(
+        f"{rnd.randint(1, 20)},{rnd.randint(0, 9)}({rnd.choice(('1', '0,5', '0,25', '2'))})"
+        for _ in range(rnd.randint(1, 3))
+    )
+
+
+def create_university(rnd: random.Random, report_period: ReportPeriod, teachers: int = 30):
+    faculty = Faculty.objects.create(title="faculty")
+    departments = [Department.objects.create(faculty=faculty, title=f"department {i}") for i in range(3)]
+    positions = [
+        Position.objects.create(title="teacher"),
+        Position.objects.create(title="head", cumulative_calculation=Position.BY_DEPARTMENT),
+    ]
+    Position.objects.create(title="dean", cumulative_calculation=Position.BY_FACULTY)
+
+    for i in range(teachers):
+        user = User.objects.create(username=f"user{i}", first_name="Name Surname", last_name=f"Last{i}")
+        user.profile.department = rnd.choice(departments)
+        user.profile.position = positions[0] if i > len(departments) else positions[1]
+        user.profile.save()
+
+        generic_report = GenericReportData.objects.create(
+            user=user,
+            report_period=report_period,
+            assignment_duration=rnd.choice((0, 3.5, 7, 10)),
+            students_rating=rnd.uniform(0, 200),
+        )
+        EducationalAndMethodicalWork.objects.create(
+            generic_report_data=generic_report,
+            one_one=rnd.uniform(0, 300),
+            one_two=rnd.uniform(0, 100),
+            one_three=rnd.uniform(300, 600),
+            two_one=rnd.randint(0, 2),
+            three_two=rnd.randint(0, 3),
+            four_one=rnd.choice([c for c, _ in EducationalAndMethodicalWork.LEVELS_CHOICES]),
+            five_four=rnd.randint(0, 2),
+            six_one=random_v_k(rnd),
+            six_four=random_v_k(rnd),
+            seven_two=random_v_k(rnd),
+            seven_seven=random_v_k(rnd),
+            eight_two=rnd.randint(0, 5),
+            fourteen_six=rnd.randint(0, 5),
+            fifteen_one=rnd.choice([c for c, _ in EducationalAndMethodicalWork.POSITION_CHOICES]),
+        )
+        ScientificAndInnovativeWork.objects.create(generic_report_data=generic_report, one_one=rnd.uniform(0, 500))
+        positions_choices = [c for c, _ in OrganizationalAndEducationalWork.POSITION_CHOICES]
+        OrganizationalAndEducationalWork.objects.create(
+            generic_report_data=generic_report,
+            one_one=rnd.choice(positions_choices),
+            four_three=rnd.choice(positions_choices),
+            five_two=rnd.random() < 0.5,
+            eight_one=rnd.randint(0, 7),
+            eleven_one=rnd.random() < 0.3,
+            eleven_two=rnd.random() < 0.5,
+            thirteen_one=rnd.random() < 0.5,
+            thirteen_four=rnd.randint(0, 20),
+            thirteen_five=rnd.randint(0, 3),
+            eighteen_one=rnd.choice(("0", "3", "2;4", "1,5;0")),
+            twenty_zero_two=rnd.random() < 0.5,
+            twenty_zero_three=rnd.random() < 0.5,
+            twenty_one_three=rnd.random() < 0.5,
+        )
+
+
+class ParsersTestCase(TestCase):
+    def test_parse_v_k_pairs(self):
+        self.assertEqual(parse_v_k_pairs("0"), [])
+        self.assertEqual(parse_v_k_pairs("1,5(2);3(0,5)"), [(1.5, 2.0), (3.0, 0.5)])
+        self.assertEqual(parse_v_k_pairs("1,5()", strict=False), [(1.5, 0)])
+        for value in ("1,5()", "1,5", "(2)", "1(2)(3)", "inf(1)"):
+            with self.assertRaises(ValueError):
+                parse_v_k_pairs(value)
+
+    def test_parse_numbers(self):
+        self.assertEqual(parse_numbers("1,5;2;0.25"), [1.5, 2.0, 0.25])
+        self.assertEqual(parse_numbers("1;", strict=False), [1.0, 0])
+        for value in ("1;", "a", "nan"):
+            with self.assertRaises(ValueError):
+                parse_numbers(value)
+        # non-finite numbers stored before the validators rejected them count as 0 in the calculations
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(parse_numbers("1;-inf", strict=False), [1.0, 0.0])
+            self.assertEqual(parse_v_k_pairs("1(inf);nan(2)", strict=False), [(1.0, 0.0), (0.0, 2.0)])
+
+    def test_parsed_values_filled_on_save(self):
+        report = OrganizationalAndEducationalWork.objects.create(eighteen_one="2;0,5")
+        self.assertEqual(report.parsed_values, {"eighteen_one": ["2;0,5", [2.0, 0.5]]})
+
+        report.eighteen_one = "4"
+        report.save(update_fields=["eighteen_one"])
+        report.refresh_from_db()
+        self.assertEqual(report.parsed_values, {"eighteen_one": ["4", [4.0]]})
+
+    def test_parsed_values_after_update(self):
+        report = OrganizationalAndEducationalWork.objects.create(eighteen_one="2")
+        calc_class = MODEL_CALC_MAP[OrganizationalAndEducationalWork]
+        # the raw text changed without save, the stored parse of "2" is ignored
+        OrganizationalAndEducationalWork.objects.filter(pk=report.pk).update(eighteen_one="5")
+        report.refresh_from_db()
+        self.assertEqual(report.parsed_values, {"eighteen_one": ["2", [2.0]]})
+        self.assertEqual(calc_class(report)._divide_field(50, "eighteen_one"), 10.0)
+
+
+class ReportPeriodBatchCalculationTestCase(TestCase):
+    def setUp(self):
+        self.report_period = ReportPeriod.objects.create(
+            report_period="2023/2024", is_active=True, annual_workload=577.3
+        )
+        create_university(random.Random(42), self.report_period)
+
+    def test_batch_matches_scalar_calculation(self):
+        # reports saved before the parse was stored and reports changed by update()
+        EducationalAndMethodicalWork.objects.filter(pk__lte=10).update(parsed_values={})
+        EducationalAndMethodicalWork.objects.filter(pk__gt=10, pk__lte=20).update(six_one="2(3);1,5(0,5)")
+
+        calc_obj = ReportPeriodBatchCalculation(self.report_period)
+        generic_results = calc_obj.calculate()
+
+        for report_model, results in calc_obj.report_results.items():
+            self.assertEqual(len(results), report_model.objects.count())
+            for pk, _, result, adjusted_result in results:
+                report = report_model.objects.get(pk=pk)
+                expected = MODEL_CALC_MAP[report_model](report).get_result()
+                self.assertEqual(result, expected)
+                self.assertEqual(adjusted_result, report_model.raw_calculation(expected, report.generic_report_data))
+
+        calc_obj.save()
+        for generic_report in GenericReportData.objects.all():
+            self.assertEqual(generic_results[generic_report.pk], GenericReportCalculation(generic_report).get_result())
+
+
+class ReportPeriodDatabaseCalculationTestCase(TestCase):
+    def setUp(self):
+        self.report_period = ReportPeriod.objects.create(
+            report_period="2023/2024", is_active=True, annual_workload=577.3
+        )
+        create_university(random.Random(7), self.report_period)
+
+    def get_results(self) -> dict:
+        results = {
+            (report_model, pk): (result, adjusted_result)
+            for report_model in REPORT_MODELS
+            for pk, result, adjusted_result in report_model.objects.values_list("pk", "result", "adjusted_result")
+        }
+        results.update(GenericReportData.objects.values_list("pk", "result"))
+        return results
+
+    def test_database_matches_scalar_calculation(self):
+        # 31.82 / 0.8 is 39.774999... as a float: round() gives 39.77, ROUND of SQLite gives 39.78
+        tie = ScientificAndInnovativeWork.objects.select_related("generic_report_data").first()
+        tie.one_one = 31.82
+        tie.save()
+        GenericReportData.objects.filter(pk=tie.generic_report_data_id).update(assignment_duration=8)
+
+        calc_obj = ReportPeriodDatabaseCalculation(self.report_period)
+        with self.assertNumQueries(9):
+            self.assertEqual(calc_obj.calculate(), GenericReportData.objects.count())
+        self.assertGreater(calc_obj.fallback_count, 0)
+        self.assertEqual(ScientificAndInnovativeWork.objects.get(pk=tie.pk).adjusted_result, 39.78)
+
+        # the ties are rounded away from zero by the database, every report differs by 0.01 at most
+        for report_model, calc_model in MODEL_CALC_MAP.items():
+            for report in report_model.objects.select_related("generic_report_data__report_period"):
+                expected = calc_model(report).get_result()
+                self.assertAlmostEqual(report.result, expected, delta=0.011)
+                self.assertAlmostEqual(
+                    report.adjusted_result,
+                    report_model.raw_calculation(report.result, report.generic_report_data),
+                    delta=0.011,
+                )
+
+        for generic_report in GenericReportData.objects.all():
+            self.assertAlmostEqual(
+                generic_report.result, GenericReportCalculation(generic_report).get_result(), delta=0.011
+            )
+
+        database_results = self.get_results()
+        batch_calc = ReportPeriodBatchCalculation(self.report_period, GenericReportData.objects.all())
+        batch_calc.calculate()
+        batch_calc.save()
+        batch_results = self.get_results()
+        self.assertEqual(database_results.keys(), batch_results.keys())
+        different = [key for key, results in batch_results.items() if database_results[key] != results]
+        self.assertIn((ScientificAndInnovativeWork, tie.pk), different)
+        self.assertLess(len(different), len(batch_results) / 10)
+
+
+class IncrementalRecalculationTestCase(TestCase):
+    def setUp(self):
+        self.report_period = ReportPeriod.objects.create(
+            report_period="2023/2024", is_active=True, annual_workload=577.3
+        )
+        create_university(random.Random(3), self.report_period, teachers=5)
+        self.report = EducationalAndMethodicalWork.objects.select_related("generic_report_data__user").last()
+        self.user = self.report.generic_report_data.user
+        self.client.force_login(self.user)
+
+    def post_report(self, **changes):
+        form = EducationalAndMethodicalWorkForm(instance=self.report)
+        data = {name: value for name, value in form.initial.items() if value is not None}
+        data.update(changes)
+        response = self.client.post(reverse("educational_and_methodical_work"), data)
+        self.assertEqual(response.status_code, 302)
+
+    def test_changed_scoring_field_recalculates_scores(self):
+        self.post_report(two_one=self.report.two_one + 1)
+
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.result, EducationalAndMethodicalWorkCalculation(self.report).get_result())
+        generic_report = self.report.generic_report_data
+        generic_report.refresh_from_db()
+        self.assertEqual(generic_report.result, GenericReportCalculation(generic_report).get_result())
+
+    def test_unchanged_save_skips_calculation(self):
+        EducationalAndMethodicalWork.objects.filter(pk=self.report.pk).update(result=-1)
+        self.post_report()
+
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.result, -1)
+
+
+class TeachersPlacesTestCase(TestCase):
+    def setUp(self):
+        self.report_period = ReportPeriod.objects.create(
+            report_period="2023/2024", is_active=True, annual_workload=577.3
+        )
+        create_university(random.Random(5), self.report_period)
+        calc_obj = ReportPeriodBatchCalculation(self.report_period)
+        calc_obj.calculate()
+        calc_obj.save()
+
+    def test_places(self):
+        call_command("2_calc_teachers_places", stdout=io.StringIO())
+
+        teacher_results = TeacherResults.objects.filter(generic_report_data__report_period=self.report_period)
+        self.assertEqual(teacher_results.count(), GenericReportData.objects.count())
+        for report_model in (EducationalAndMethodicalWork, ScientificAndInnovativeWork, OrganizationalAndEducationalWork):
+            place_name = report_model.__name__.lower() + "_place"
+            places = [
+                getattr(tr, place_name)
+                for tr in teacher_results.order_by(
+                    f"-generic_report_data__{report_model.__name__.lower()}__result", "generic_report_data"
+                )
+            ]
+            self.assertEqual(places, list(range(1, len(places) + 1)))
+
+        previous = None
+        for tr in teacher_results.order_by("place"):
+            self.assertEqual(
+                tr.scores_sum,
+                Decimal(
+                    1.5 * tr.educationalandmethodicalwork_place
+                    + 1.5 * tr.scientificandinnovativework_place
+                    + tr.organizationalandeducationalwork_place
+                ),
+            )
+            if previous is not None:
+                self.assertGreaterEqual(tr.scores_sum, previous)
+            previous = tr.scores_sum
+
+    def test_teacher_without_reports(self):
+        call_command("2_calc_teachers_places", stdout=io.StringIO())
+        generic_report = GenericReportData.objects.first()
+        for report_model in REPORT_MODELS:
+            report_model.objects.filter(generic_report_data=generic_report).delete()
+
+        call_command("2_calc_teachers_places", stdout=io.StringIO())
+        teacher_results = TeacherResults.objects.filter(generic_report_data__report_period=self.report_period)
+        self.assertFalse(teacher_results.filter(generic_report_data=generic_report).exists())
+        self.assertEqual(teacher_results.count(), GenericReportData.objects.count() - 1)
+        places = sorted(teacher_results.values_list("place", flat=True))
+        self.assertEqual(places, list(range(1, len(places) + 1)))
+
+
+class RecalculatePeriodTestCase(TestCase):
+    def setUp(self):
+        self.report_period = ReportPeriod.objects.create(
+            report_period="2023/2024", is_active=True, annual_workload=577.3
+        )
+        create_university(random.Random(11), self.report_period)
+
+    def test_unchanged_stages_are_skipped(self):
+        results = PIPELINE.run(self.report_period)
+        self.assertEqual([r.stage.name for r in results], [s.name for s in PIPELINE.stages])
+        self.assertTrue(all(r.status == StageResult.RAN for r in results))
+        self.assertEqual(TeacherResults.objects.count(), GenericReportData.objects.count())
+        self.assertEqual(DecansResults.objects.count(), 0)
+
+        results = PIPELINE.run(self.report_period)
+        self.assertTrue(all(r.status == StageResult.SKIPPED for r in results))
+
+        report = EducationalAndMethodicalWork.objects.first()
+        report.two_one += 1
+        report.save()
+        statuses = {r.stage.name: r.status for r in PIPELINE.run(self.report_period)}
+        self.assertEqual(statuses[RAW_REPORTS], StageResult.RAN)
+
+    def test_command_output(self):
+        out = io.StringIO()
+        call_command("recalculate_period", "--period", "2023-2024", stdout=out)
+        for stage in PIPELINE.stages:
+            self.assertIn(stage.name, out.getvalue())
+
+
+class ParallelReportPeriodBatchCalculationTestCase(TransactionTestCase):
+    def setUp(self):
+        self.report_period = ReportPeriod.objects.create(
+            report_period="2023/2024", is_active=True, annual_workload=577.3
+        )
+        create_university(random.Random(13), self.report_period)
+        Department.objects.filter(pk=Department.objects.first().pk).update(
+            faculty=Faculty.objects.create(title="second faculty")
+        )
+
+    def test_parallel_matches_batch_calculation(self):
+        calc_obj = ReportPeriodBatchCalculation(self.report_period)
+        calc_obj.calculate()
+
+        parallel_calc_obj = ParallelReportPeriodBatchCalculation(self.report_period, workers=2)
+        self.assertEqual(len(parallel_calc_obj.get_partitions()), 2)
+        self.assertEqual(parallel_calc_obj.calculate(), calc_obj.generic_results)
+        self.assertEqual(parallel_calc_obj.report_results, calc_obj.report_results)
+
+
+class ScoringSimulationTestCase(TestCase):
+    def setUp(self):
+        self.report_period = ReportPeriod.objects.create(
+            report_period="2023/2024", is_active=True, annual_workload=577.3
+        )
+        create_university(random.Random(17), self.report_period)
+        PIPELINE.run(self.report_period)
+        self.simulation = ScoringSimulation(self.report_period)
+        self.simulation.load()
+
+    def test_stored_coefficients_keep_places(self):
+        movements = self.simulation.run()
+        self.assertEqual(len([m for m in movements if m.level == TEACHER]), TeacherResults.objects.count())
+        self.assertEqual([m for m in movements if m.changed], [])
+
+    def test_overridden_coefficients(self):
+        professor = (
+            EducationalAndMethodicalWork.objects.filter(fifteen_one=EducationalAndMethodicalWork.PROFESSOR)
+            .order_by("generic_report_data__teacherresults__place")
+            .last()
+        )
+        stored_places = list(TeacherResults.objects.order_by("pk").values_list("place", flat=True))
+
+        with self.assertNumQueries(0):
+            movements = self.simulation.run({"educationalandmethodicalwork.TITLES_RATE.professor": 10000})
+
+        movement = next(m for m in movements if m.level == TEACHER and m.key == professor.generic_report_data_id)
+        self.assertGreater(movement.shift, 0)
+        self.assertEqual(list(TeacherResults.objects.order_by("pk").values_list("place", flat=True)), stored_places)
+
+        with self.assertRaises(ValueError):
+            self.simulation.run({"educationalandmethodicalwork.TITLES_RATE.unknown": 1})
+
+    def test_overridden_field_rates(self):
+        generic_report_id = (
+            EducationalAndMethodicalWork.objects.filter(two_one__gt=0)
+            .order_by("generic_report_data__teacherresults__place")
+            .values_list("generic_report_data", flat=True)
+            .last()
+        )
+        movements = self.simulation.run(
+            {
+                "educationalandmethodicalwork.FIELD_RATE.two_one": 100000,
+                "organizationalandeducationalwork.FLAG_RATE.five_one": 0,
+                "organizationalandeducationalwork.THIRTEEN_LIMIT": 0,
+            }
+        )
+        movement = next(m for m in movements if m.level == TEACHER and m.key == generic_report_id)
+        self.assertGreater(movement.shift, 0)
+        with self.assertRaises(ValueError):
+            self.simulation.run({"educationalandmethodicalwork.FIELD_RATE.unknown": 1})
+
+
+class SyntheticUniversityTestCase(TestCase):
+    def generate(self, prefix: str):
+        SyntheticUniversity(seed=3, faculties=2, departments=3, teachers=40, prefix=prefix).generate()
+        return list(
+            EducationalAndMethodicalWork.objects.filter(generic_report_data__user__username__startswith=prefix)
+            .order_by("generic_report_data__user__username")
+            .values_list("one_one", "six_one", "seven_seven", "fifteen_one", "parsed_values")
+        )
+
+    def test_generate(self):
+        reports = self.generate("first")
+
+        self.assertEqual(len(reports), 40)
+        self.assertEqual(Profile.objects.filter(position__cumulative_calculation=Position.BY_DEPARTMENT).count(), 6)
+        self.assertEqual(Profile.objects.filter(position__cumulative_calculation=Position.BY_FACULTY).count(), 2)
+        for report_model in REPORT_MODELS:
+            for report in report_model.objects.all():
+                report.full_clean()
+            self.assertEqual(report_model.objects.count(), 40)
+        self.assertTrue(any(six_one != "0" for _, six_one, *_ in reports))
+        for _, six_one, _, _, parsed_values in reports:
+            self.assertEqual(parsed_values["six_one"], [six_one, [list(pair) for pair in parse_v_k_pairs(six_one)]])
+
+        self.assertEqual(self.generate("second"), reports)
+        with self.assertRaises(ValueError):
+            self.generate("first")
+
+
+class BenchmarkCompareTestCase(TestCase):
+    def test_compare(self):
+        def results(wall_time, peak_rss, queries):
+            return {
+                "sizes": {
+                    "1000": {"raw_reports": {"wall_time": wall_time, "peak_rss_mb": peak_rss, "queries": queries}}
+                }
+            }
+
+        baseline = results(2.0, 100, 30)
+        self.assertEqual(benchmark.compare(results(2.3, 110, 30), baseline), [])
+        self.assertEqual(benchmark.compare(results(2.0, 100, 30), {"sizes": {}}), [])
+        self.assertEqual(len(benchmark.compare(results(3.0, 100, 30), baseline)), 1)
+        self.assertEqual(len(benchmark.compare(results(2.0, 200, 31), baseline)), 2)
+        # the memory of a baseline measured another way is not compared
+        tracemalloc_baseline = {**baseline, "meta": {"peak_memory": benchmark.TRACEMALLOC}}
+        self.assertEqual(len(benchmark.compare(results(2.0, 200, 31), tracemalloc_baseline)), 1)
+
+    def test_peak_memory_of_every_stage(self):
+        with benchmark.PeakMemory() as large:
+            data = bytearray(100 * 1024 * 1024)
+            del data
+        with benchmark.PeakMemory() as small:
+            data = bytearray(10 * 1024 * 1024)
+            del data
+        self.assertGreater(large.peak_mb - small.peak_mb, 50)
+
+
+class BulkUpsertTestCase(TestCase):
+    def test_insert_and_update_on_natural_key(self):
+        report_period = ReportPeriod.objects.create(report_period="2023/2024", is_active=True)
+        faculties = [Faculty.objects.create(title=f"faculty {i}") for i in range(3)]
+        FacultyResults.objects.create(report_period=report_period, faculty=faculties[0], place=5, places_sum_count=1)
+
+        with self.assertNumQueries(1):
+            count = bulk_upsert(
+                FacultyResults,
+                [
+                    FacultyResults(report_period=report_period, faculty=faculty, places_sum=Decimal("1.23456"), place=i)
+                    for i, faculty in enumerate(faculties, start=1)
+                ],
+                ["report_period", "faculty"],
+                ["places_sum", "place"],
+            )
+
+        self.assertEqual(count, 3)
+        self.assertEqual(
+            list(FacultyResults.objects.order_by("faculty").values_list("places_sum", "places_sum_count", "place")),
+            [(Decimal("1.2346"), 1, 1), (Decimal("1.2346"), None, 2), (Decimal("1.2346"), None, 3)],
+        )
+
+
+class RollupTestCase(TestCase):
+    def setUp(self):
+        SyntheticUniversity(seed=5, faculties=2, departments=2, teachers=30, periods=("2022/2023", "2023/2024")).generate()
+        self.report_periods = list(ReportPeriod.objects.order_by("report_period"))
+        for report_period in self.report_periods:
+            PIPELINE.run(report_period)
+
+    def test_results_of_every_period(self):
+        for report_period in self.report_periods:
+            by_period = {"teacher_result__generic_report_data__report_period": report_period}
+            faculty_results = {f.faculty_id: f for f in FacultyResults.objects.filter(report_period=report_period)}
+            self.assertEqual(len(faculty_results), 2)
+
+            decans = DecansResults.objects.filter(**by_period).select_related(
+                "teacher_result__generic_report_data__user__profile__department"
+            )
+            self.assertEqual(len(decans), 2)
+            for decan in decans:
+                faculty_id = decan.teacher_result.generic_report_data.user.profile.department.faculty_id
+                self.assertEqual(
+                    decan.sum_place,
+                    int(2 * decan.teacher_result.scores_sum + faculty_results[faculty_id].places_sum_average),
+                )
+
+            heads = HeadsOfDepartmentsResults.objects.filter(**by_period).order_by("place")
+            self.assertEqual(len(heads), 4)
+            for head in heads:
+                department = head.teacher_result.generic_report_data.user.profile.department
+                related = TeacherResults.objects.filter(
+                    generic_report_data__report_period=report_period,
+                    generic_report_data__user__profile__department=department,
+                ).exclude(pk=head.teacher_result_id)
+                self.assertEqual(head.related_to_department_count, related.count())
+            self.assertEqual([h.scores_sum for h in heads], sorted((h.scores_sum for h in heads), reverse=True))
+
+
+class GenericReportBatchCalculationTestCase(TestCase):
+    def setUp(self):
+        SyntheticUniversity(seed=11, faculties=2, departments=2, teachers=30, periods=("2022/2023", "2023/2024")).generate()
+        for report_period in ReportPeriod.objects.all():
+            PIPELINE.run(report_period)
+        # a teacher without some of the section reports
+        ScientificAndInnovativeWork.objects.filter(pk__in=ScientificAndInnovativeWork.objects.values("pk")[:3]).delete()
+
+    def test_batch_matches_scalar_calculation(self):
+        generic_reports = GenericReportData.objects.select_related("user__profile__position")
+        with self.assertNumQueries(1):
+            results = GenericReportCalculation.get_results(generic_reports)
+        with self.assertNumQueries(3):
+            cumulative_results = GenericReportCalculation.get_results(generic_reports, cumulative=True)
+
+        self.assertEqual(len(results), 60)
+        for generic_report in generic_reports:
+            calc_obj = GenericReportCalculation(generic_report)
+            result = calc_obj.get_result()
+            self.assertEqual(results[generic_report.pk], result)
+            # the group sum is aggregated once, the own result is subtracted from it
+            self.assertAlmostEqual(
+                cumulative_results[generic_report.pk], calc_obj.get_cumulative_result(result), delta=0.01
+            )
+
+    def test_list_of_reports(self):
+        generic_reports = list(GenericReportData.objects.order_by("pk")[:5])
+        with self.assertNumQueries(1):
+            results = GenericReportCalculation.get_results(generic_reports)
+        self.assertEqual(list(results), [generic_report.pk for generic_report in generic_reports])
+
+
+class ResultsAggregatesTestCase(TestCase):
+    def setUp(self):
+        SyntheticUniversity(seed=13, faculties=2, departments=2, teachers=30).generate()
+        self.report_period = ReportPeriod.objects.get()
+        PIPELINE.run(self.report_period)
+
+    def get_aggregates(self) -> dict:
+        return {
+            model: {
+                key: (round(a.results_sum, 6), a.results_count, a.scores_sum, a.scores_count)
+                for key, a in aggregates.load([self.report_period.pk])[model].items()
+            }
+            for model in aggregates.GROUPS
+        }
+
+    def test_rebuild(self):
+        departments = self.get_aggregates()[DepartmentAggregate]
+        self.assertEqual(len(departments), 4)
+        for department in Department.objects.filter(title__startswith="synthetic"):
+            teacher_results = TeacherResults.objects.filter(
+                generic_report_data__user__profile__department=department
+            )
+            self.assertEqual(
+                departments[(self.report_period.pk, department.pk)][2:],
+                (sum(tr.scores_sum for tr in teacher_results), teacher_results.count()),
+            )
+
+    def test_incremental_changes_match_rebuild(self):
+        changed = list(GenericReportData.objects.order_by("pk")[:4])
+        previous_results = {}
+        for generic_report in changed:
+            previous_results[generic_report] = generic_report.result
+            generic_report.result += 10.5
+            generic_report.save(update_fields=["result"])
+        aggregates.apply_result_changes(previous_results)
+
+        user = User.objects.create(username="new teacher")
+        user.profile.department = changed[0].user.profile.department
+        user.profile.save()
+        GenericReportData.objects.create(user=user, report_period=self.report_period, result=3)
+
+        incremental = self.get_aggregates()
+        aggregates.rebuild(self.report_period)
+        self.assertEqual(incremental, self.get_aggregates())
+
+    def test_deleted_report_rebuilds_period(self):
+        GenericReportData.objects.filter(pk=GenericReportData.objects.order_by("pk")[0].pk).delete()
+        self.assertFalse(DepartmentAggregate.objects.exists())
+        self.assertEqual(sum(a[1] for a in self.get_aggregates()[FacultyAggregate].values()), 29)
+
+
+class ReportPeriodCacheTestCase(TestCase):
+    def setUp(self):
+        self.old = ReportPeriod.objects.create(report_period="2022/2023", is_active=True, annual_workload=550)
+        self.new = ReportPeriod.objects.create(report_period="2023/2024", annual_workload=560)
+
+    def test_cached_lookups(self):
+        self.assertEqual(ReportPeriod.get_active(), self.old)
+        # a new request reads the version of the cached periods once
+        versions.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(ReportPeriod.get_active(), self.old)
+        with self.assertNumQueries(0):
+            self.assertEqual(ReportPeriod.get_active(), self.old)
+            self.assertEqual(ReportPeriod.get_by_period("2023/2024"), self.new)
+            self.assertIsNone(ReportPeriod.get_by_period("2030/2031"))
+            # callers get their own copies
+            ReportPeriod.get_active().annual_workload = 0
+            self.assertEqual(ReportPeriod.get_active().annual_workload, 550)
+
+    def test_activation_in_other_process(self):
+        self.assertEqual(ReportPeriod.get_active(), self.old)
+        # another worker activated the period: it changed the rows and the version in the database cache only
+        ReportPeriod.objects.filter(pk=self.old.pk).update(is_active=False)
+        ReportPeriod.objects.filter(pk=self.new.pk).update(is_active=True)
+        cache.set(REPORT_PERIODS_VERSION_KEY, "other process", timeout=None)
+        # seen on the next request or when the version read by this process is older than the TTL
+        self.assertEqual(ReportPeriod.get_active(), self.old)
+        with mock.patch.object(versions, "TTL", 0):
+            self.assertEqual(ReportPeriod.get_active(), self.new)
+
+    def test_admin_activation_invalidates_cache(self):
+        self.assertEqual(ReportPeriod.get_active(), self.old)
+        admin = User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse("admin:service_api_reportperiod_change", args=[self.new.pk]),
+            {"report_period": "2023/2024", "is_active": "on", "annual_workload": 560},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ReportPeriod.get_active(), self.new)
+        self.assertFalse(ReportPeriod.get_by_period("2022/2023").is_active)
+
+
+def without_microsoft_context_processor() -> list:
+    # the Microsoft login context processor requests the OpenID configuration over the network
+    templates = copy.deepcopy(settings.TEMPLATES)
+    for template in templates:
+        processors = template.get("OPTIONS", {}).get("context_processors", [])
+        template["OPTIONS"]["context_processors"] = [p for p in processors if not p.startswith("microsoft_auth")]
+    return templates
+
+
+@override_settings(TEMPLATES=without_microsoft_context_processor())
+class ReportPagesTestCase(TestCase):
+    def setUp(self):
+        self.report_period = ReportPeriod.objects.create(
+            report_period="2023/2024", is_active=True, annual_workload=577.3
+        )
+        create_university(random.Random(17), self.report_period, teachers=5)
+        PIPELINE.run(self.report_period)
+        self.user = User.objects.get(username="user4")
+        self.client.force_login(self.user)
+
+    def get(self, url: str, queries: int):
+        # the first request loads the cached report periods and org hierarchy
+        self.client.get(url)
+        # session, user, the versions of the cached report periods and org hierarchy and report bundle,
+        # the session is saved on every request with three more queries
+        with self.assertNumQueries(5 + queries + 3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_reports(self):
+        # and the list of the user reports
+        response = self.get(reverse("reports"), 1)
+        self.assertEqual(response.context["teacher_result"], TeacherResults.objects.get(generic_report_data__user=self.user))
+
+    def test_report_pdf(self):
+        ScientificAndInnovativeWork.objects.filter(generic_report_data__user=self.user).delete()
+        response = self.get(reverse("report_pdf", args=["2023-2024"]), 0)
+        self.assertIsNone(response.context["scientific_and_innovative_work"])
+        self.assertIsNotNone(response.context["educational_and_methodical_work"])
+
+    def test_report_form_without_generic_report(self):
+        # the other forms render the report without a generic report, the teacher is read from the user
+        html = render_to_string(
+            "service_api/raw_report_forms/raw_generic_report_data_view.html",
+            {"is_pdf": True, "user": self.user, "form": []},
+        )
+        self.assertIn(str(self.user.profile.department), html)
+        self.assertIn(f"{self.user.last_name} {self.user.first_name}", html)
+
+
+@override_settings(TEMPLATES=without_microsoft_context_processor())
+class ReportAdminTestCase(TestCase):
+    def setUp(self):
+        self.report_period = ReportPeriod.objects.create(
+            report_period="2023/2024", is_active=True, annual_workload=577.3
+        )
+        create_university(random.Random(19), self.report_period, teachers=30)
+        ScientificAndInnovativeWork.objects.filter(generic_report_data__user__username="user3").delete()
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "password"))
+
+    def test_changelist_queries(self):
+        for model in (GenericReportData, *REPORT_MODELS):
+            url = reverse(f"admin:service_api_{model.__name__.lower()}_changelist")
+            self.client.get(url)
+            # session and user, two counts, the page of rows and the three queries of the saved session,
+            # the generic reports also read the version of the cached report periods for the export link
+            with self.assertNumQueries(9 if model is GenericReportData else 8):
+                response = self.client.get(url)
+            self.assertEqual(len(response.context["cl"].result_list), 25)
+
+    def test_report_periods_changelist_queries(self):
+        for year in range(2018, 2023):
+            ReportPeriod.objects.create(report_period=f"{year}/{year + 1}", annual_workload=577.3)
+        url = reverse("admin:service_api_reportperiod_changelist")
+        self.client.get(url)
+        # session and user, two counts, the page of rows, the faculties, the departments and the saved session
+        with self.assertNumQueries(10):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context["cl"].result_list), 6)
+
+    def test_reports_done(self):
+        response = self.client.get(reverse("admin:service_api_genericreportdata_changelist") + "?q=Last3")
+        (generic_report,) = response.context["cl"].result_list
+        self.assertFalse(generic_report.is_report_done(ScientificAndInnovativeWork))
+        self.assertTrue(generic_report.is_report_done(EducationalAndMethodicalWork))
+        self.assertFalse(generic_report.all_reports_done())
+
+
+class CsvExportsTestCase(TestCase):
+    def setUp(self):
+        exports_cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(exports_cache_dir.cleanup)
+        settings_override = override_settings(EXPORTS_CACHE_DIR=exports_cache_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.report_period = ReportPeriod.objects.create(
+            report_period="2023/2024", is_active=True, annual_workload=577.3
+        )
+        create_university(random.Random(18), self.report_period, teachers=20)
+        PIPELINE.run(self.report_period)
+        self.client.force_login(User.objects.get(username="user4"))
+
+    def get_rows(self, url: str) -> list:
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        # the rows are read with one query while the response is streamed
+        with self.assertNumQueries(1):
+            content = b"".join(response.streaming_content).decode("utf-8-sig")
+        return list(csv.reader(io.StringIO(content)))
+
+    def test_teachers(self):
+        rows = self.get_rows(f"/csv_reports/teachers/{self.report_period.pk}/")
+        teacher_result = TeacherResults.objects.get(place=1)
+        profile = teacher_result.generic_report_data.user.profile
+        self.assertEqual(len(rows), TeacherResults.objects.count() + 1)
+        self.assertEqual(
+            rows[1][:6],
+            [
+                "1",
+                profile.last_name_and_initial,
+                str(profile.department),
+                str(profile.department.faculty),
+                str(profile.position),
+                str(teacher_result.scores_sum),
+            ],
+        )
+
+    def test_pivot_report(self):
+        rows = self.get_rows(reverse("pivot_report_all", args=[self.report_period.pk]))
+        results = list(
+            GenericReportData.objects.filter(report_period=self.report_period)
+            .order_by("-result")
+            .values_list("result", flat=True)
+        )
+        self.assertEqual([float(row[7]) for row in rows[1:]], results)
+
+    def test_pivot_report_of_department(self):
+        department = Department.objects.order_by("pk").last()
+        rows = self.get_rows(reverse("pivot_report_by_type", args=[self.report_period.pk, "department", department.pk]))
+        members = GenericReportData.objects.filter(user__profile__department=department)
+        self.assertEqual([row[0] for row in rows[1:]], [str(i) for i in range(1, members.count() + 1)])
+        self.assertEqual({row[2] for row in rows[1:]}, {str(department)})
+
+        rows = self.get_rows(
+            reverse("pivot_report_by_type", args=[self.report_period.pk, "faculty", department.faculty_id])
+        )
+        self.assertEqual(
+            len(rows) - 1, GenericReportData.objects.filter(user__profile__department__faculty=department.faculty).count()
+        )
+
+    def test_results_of_heads(self):
+        for name, model in (
+            ("head-of-departments", HeadsOfDepartmentsResults),
+            ("faculties", FacultyResults),
+            ("decans", DecansResults),
+        ):
+            rows = self.get_rows(f"/csv_reports/{name}/{self.report_period.pk}/")
+            places = model.objects.order_by("place").values_list("place", flat=True)
+            self.assertEqual([row[0] for row in rows[1:]], [str(place) for place in places])
+
+    def test_cached_export(self):
+        url = f"/csv_reports/teachers/{self.report_period.pk}/"
+        rows = self.get_rows(url)
+
+        # served from the file without reading the reports
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            content = b"".join(response.streaming_content).decode("utf-8-sig")
+        self.assertFalse([query for query in queries if "service_api_" in query["sql"]])
+        self.assertEqual(list(csv.reader(io.StringIO(content))), rows)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+        generic_report = GenericReportData.objects.get(teacherresults__place=1)
+        generic_report.assignment = 0.5
+        generic_report.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_rows(url)[1][16], "0.5")
+
+    def test_version_in_database(self):
+        # the versions kept by the process may be rolled back with the previous test
+        versions.clear()
+        export_cache.get_version(self.report_period.pk)
+        # the versions of all periods, of the period and of the org hierarchy, once per request
+        versions.clear()
+        with self.assertNumQueries(1):
+            version = export_cache.get_version(self.report_period.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(export_cache.get_version(self.report_period.pk), version)
+        # the recalculation commands run in other processes, they change the version stored in the database
+        call_command("4_calc_faculty", "--period", self.report_period.report_period, stdout=io.StringIO())
+        self.assertNotEqual(export_cache.get_version(self.report_period.pk), version)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT cache_key FROM {settings.CACHES['default']['LOCATION']}")
+            keys = [key for key, in cursor.fetchall()]
+        self.assertTrue(any(key.endswith(export_cache.get_version_key(self.report_period.pk)) for key in keys))
+
+    def test_projection_and_formats(self):
+        url = reverse("pivot_report_all", args=[self.report_period.pk])
+        response = self.client.get(url, {"format": "jsonl", "columns": "name,result"})
+        with CaptureQueriesContext(connection) as queries:
+            lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        # only the requested fields are read
+        self.assertNotIn("assignment", queries[0]["sql"])
+        self.assertEqual(json.loads(lines[0]).keys(), {"name", "result"})
+        self.assertEqual(len(lines), GenericReportData.objects.filter(report_period=self.report_period).count())
+
+        response = self.client.get(url, {"format": "xlsx", "columns": "number,name"})
+        self.assertTrue(response["Content-Disposition"].endswith(".xlsx"))
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            sheet = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+        rows = [
+            [cell.findtext(".//{*}v") or cell.findtext(".//{*}t") for cell in row]
+            for row in sheet.iter("{http://schemas.openxmlformats.org/spreadsheetml/2006/main}row")
+        ]
+        self.assertEqual(rows[:2], [["#", "ПІБ"], ["1", self.get_rows(url)[1][1]]])
+
+        # the rows of a projection without fields are numbered through
+        response = self.client.get(url, {"format": "jsonl", "columns": "number"})
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual([json.loads(line)["number"] for line in lines], list(range(1, len(lines) + 1)))
+
+        self.assertEqual(self.client.get(url, {"columns": "name,unknown"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"format": "pdf"}).status_code, 400)
+
+        # non-finite numbers are written as empty cells
+        xlsx_format = FORMATS["xlsx"]
+        self.assertEqual([xlsx_format.get_cell("A1", value) for value in (float("nan"), float("-inf"))], ["", ""])
+        self.assertEqual(xlsx_format.get_cell("A1", 1.5), '<c r="A1"><v>1.5</v></c>')
+
+    def test_archive(self):
+        response = self.client.get(reverse("pivot_report_archive", args=[self.report_period.pk]))
+        # one ordered query for the faculties and one for the departments
+        with self.assertNumQueries(2):
+            content = b"".join(response.streaming_content)
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            entries = {name: archive.read(name) for name in archive.namelist()}
+
+        departments = Department.objects.filter(faculty__isnull=False)
+        self.assertEqual(len(entries), Faculty.objects.count() + departments.count())
+        for department in departments:
+            url = reverse("pivot_report_by_type", args=[self.report_period.pk, "department", department.pk])
+            pivot_report = b"".join(self.client.get(url).streaming_content)
+            self.assertEqual(entries[f"{department.faculty}/{department}.csv"], pivot_report)
+
+    def test_archive_entry_names(self):
+        # a department titled as its faculty
+        department = Department.objects.filter(faculty__isnull=False, profile__isnull=False).first()
+        Department.objects.filter(pk=department.pk).update(title=department.faculty.title)
+        response = self.client.get(reverse("pivot_report_archive", args=[self.report_period.pk]))
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            names = archive.namelist()
+
+        faculty = str(department.faculty)
+        self.assertEqual(len(names), len(set(names)))
+        self.assertIn(f"{faculty}/{faculty}.csv", names)
+        self.assertIn(f"{faculty}/{faculty} ({department.pk}).csv", names)
+
+    def test_raw_inputs(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "password"))
+        rows = self.get_rows(reverse("raw_inputs_report", args=[self.report_period.pk]))
+        header, rows = rows[0], rows[1:]
+        self.assertEqual(len(rows), GenericReportData.objects.filter(report_period=self.report_period).count())
+        input_fields = sum(
+            len([f for f in model._meta.concrete_fields if not f.primary_key and not f.is_relation])
+            for model in REPORT_MODELS
+        )
+        self.assertGreater(len(header), input_fields)
+        self.assertFalse([column for column in header if "parsed_values" in column])
+
+        report = EducationalAndMethodicalWork.objects.select_related("generic_report_data__user__profile").first()
+        name = report.generic_report_data.user.profile.last_name_and_initial
+        row = next(row for row in rows if row[header.index("ПІБ")] == name)
+        for field in ("one_one", "two_one", "result", "adjusted_result"):
+            column = header.index(f"{report.NAME}: {report._meta.get_field(field).verbose_name} ({field})")
+            self.assertEqual(row[column], str(getattr(report, field)))
+
+    def test_raw_inputs_scope(self):
+        url = reverse("raw_inputs_report", args=[self.report_period.pk])
+        # the teachers are not staff
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        hierarchy = get_hierarchy()
+        head = next(
+            user for user in User.objects.filter(is_superuser=False)
+            if hierarchy.get_scope_department_ids(user.pk)
+        )
+        head.is_staff = True
+        head.save()
+        self.client.force_login(head)
+        department_ids = hierarchy.get_scope_department_ids(head.pk)
+        rows = self.get_rows(url)
+        self.assertEqual(
+            len(rows) - 1,
+            GenericReportData.objects.filter(
+                report_period=self.report_period, user__profile__department__in=department_ids
+            ).count(),
+        )
+        self.assertLess(len(rows) - 1, GenericReportData.objects.filter(report_period=self.report_period).count())
+
+    def test_raw_inputs_export_job_scope(self):
+        export_jobs_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(export_jobs_dir.cleanup)
+        hierarchy = get_hierarchy()
+        head = next(
+            user for user in User.objects.filter(is_superuser=False)
+            if hierarchy.get_scope_department_ids(user.pk)
+        )
+        with override_settings(EXPORT_JOBS_DIR=export_jobs_dir.name):
+            job = export_jobs.enqueue(head, self.report_period, ExportJob.RAW_INPUTS)
+            call_command("run_export_worker", "--once", stdout=io.StringIO())
+            job.refresh_from_db()
+            self.assertEqual(job.status, ExportJob.DONE)
+            with open(export_jobs.get_path(job), encoding="utf-8-sig") as file:
+                rows = list(csv.reader(file))
+
+        # the head who queued the job gets the teachers of their departments only
+        scope = GenericReportData.objects.filter(
+            report_period=self.report_period,
+            user__profile__department__in=hierarchy.get_scope_department_ids(head.pk),
+        )
+        self.assertEqual(job.total, scope.count())
+        self.assertEqual(len(rows) - 1, scope.count())
+        self.assertLess(len(rows) - 1, GenericReportData.objects.filter(report_period=self.report_period).count())
+
+    def test_export_job(self):
+        export_jobs_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(export_jobs_dir.cleanup)
+        user = User.objects.get(username="user4")
+        with override_settings(EXPORT_JOBS_DIR=export_jobs_dir.name):
+            job = export_jobs.enqueue(user, self.report_period, ExportJob.PIVOT)
+            failed = export_jobs.enqueue(user, self.report_period, ExportJob.PIVOT, columns="unknown")
+            with self.assertLogs(level="ERROR"):
+                call_command("run_export_worker", "--once", stdout=io.StringIO())
+
+            job.refresh_from_db()
+            self.assertEqual(job.status, ExportJob.DONE)
+            self.assertEqual((job.rows, job.total), (GenericReportData.objects.count(),) * 2)
+            self.assertEqual(ExportJob.objects.get(pk=failed.pk).status, ExportJob.FAILED)
+
+            response = self.client.get(reverse("export_job_download", args=[job.pk]))
+            pivot_report = self.client.get(reverse("pivot_report_all", args=[self.report_period.pk]))
+            self.assertEqual(b"".join(response.streaming_content), b"".join(pivot_report.streaming_content))
+            self.client.force_login(User.objects.get(username="user5"))
+            self.assertEqual(self.client.get(reverse("export_job_download", args=[job.pk])).status_code, 404)
+
+            path = export_jobs.get_path(job)
+            job.delete()
+            self.assertFalse(path.exists())
+
+    def test_stale_export_job(self):
+        user = User.objects.get(username="user4")
+        now = timezone.now()
+        live = export_jobs.enqueue(user, self.report_period, ExportJob.PIVOT)
+        stale = export_jobs.enqueue(user, self.report_period, ExportJob.PIVOT)
+        # both jobs started long ago, only the live one still marks its heartbeat
+        ExportJob.objects.update(status=ExportJob.RUNNING, started_at=now - timezone.timedelta(hours=2), rows=10)
+        ExportJob.objects.filter(pk=live.pk).update(heartbeat_at=now)
+        ExportJob.objects.filter(pk=stale.pk).update(heartbeat_at=now - export_jobs.STALE_AFTER * 2)
+
+        job = export_jobs.claim_next()
+        self.assertEqual(job.pk, stale.pk)
+        self.assertEqual((job.status, job.rows), (ExportJob.RUNNING, 0))
+        self.assertGreater(job.heartbeat_at, now)
+        live.refresh_from_db()
+        self.assertEqual((live.status, live.rows), (ExportJob.RUNNING, 10))
+        self.assertIsNone(export_jobs.claim_next())
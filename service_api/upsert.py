@@ -0,0 +1,57 @@
+"""
+Bulk INSERT ... ON CONFLICT DO UPDATE for the result tables.
+
+Rows are matched by a unique natural key instead of the primary key, so a whole batch of results
+is written without reading the existing rows first. Supported by SQLite 3.24+ and PostgreSQL 9.5+.
+"""
+from django.db import NotSupportedError, connections, router
+
+SUPPORTED_VENDORS = ("sqlite", "postgresql")
+
+
+def bulk_upsert(model, objs: list, unique_fields: list[str], update_fields: list[str] = None, batch_size: int = None):
+    """
+    :param objs: model instances, primary keys are ignored
+    :param unique_fields: fields of a unique constraint of the model
+    :param update_fields: fields updated on conflict, all inserted fields except the unique ones by default
+    :return: number of written rows
+    """
+    if not objs:
+        return 0
+
+    connection = connections[router.db_for_write(model)]
+    if connection.vendor not in SUPPORTED_VENDORS:
+        raise NotSupportedError(f"bulk_upsert is not supported by {connection.vendor}")
+
+    meta = model._meta
+    fields = [f for f in meta.concrete_fields if not f.primary_key]
+    unique = [meta.get_field(name) for name in unique_fields]
+    if update_fields is None:
+        update = [f for f in fields if f not in unique]
+    else:
+        update = [meta.get_field(name) for name in update_fields]
+
+    qn = connection.ops.quote_name
+    columns = ", ".join(qn(f.column) for f in fields)
+    placeholders = "(" + ", ".join(["%s"] * len(fields)) + ")"
+    conflict = ", ".join(qn(f.column) for f in unique)
+    if update:
+        action = "DO UPDATE SET " + ", ".join(f"{qn(f.column)} = EXCLUDED.{qn(f.column)}" for f in update)
+    else:
+        action = "DO NOTHING"
+
+    max_batch_size = max((connection.features.max_query_params or 2 ** 16) // len(fields), 1)
+    batch_size = min(batch_size or max_batch_size, max_batch_size)
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(objs), batch_size):
+            batch = objs[start:start + batch_size]
+            params = []
+            for obj in batch:
+                params.extend(f.get_db_prep_save(f.pre_save(obj, add=True), connection) for f in fields)
+            cursor.execute(
+                f"INSERT INTO {qn(meta.db_table)} ({columns}) VALUES {', '.join([placeholders] * len(batch))} "
+                f"ON CONFLICT ({conflict}) {action}",
+                params,
+            )
+    return len(objs)
@@ -1,18 +1,21 @@
-import codecs
-import csv
 import logging
 import traceback
+from typing import Iterator
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db import models
-from django.http import HttpResponseRedirect, HttpResponse
+from django.db import models, transaction
+from django.http import FileResponse, Http404, HttpResponseRedirect
+from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
 from django.views.generic import TemplateView, FormView
 from django.views.generic.base import ContextMixin, View
 from microsoft_auth.context_processors import microsoft
 
+from service_api import aggregates, export_jobs
+from service_api.bundles import get_report_bundle, get_section_reports
 from service_api.calculations import BaseCalculation
 from service_api.calculations.educational_and_methodical_work_calc import (
     EducationalAndMethodicalWorkCalculation,
@@ -27,6 +30,8 @@ from service_api.calculations.organizational_and_educational_work_calc import (
 from service_api.calculations.scientific_and_innovative_work_calc import (
     ScientificAndInnovativeWorkCalculation,
 )
+from service_api.export_cache import cached_export
+from service_api.exports import Column, Export, ExportFormat, NumberColumn, parse_request, render_zip, user_columns
 from service_api.forms.report_forms import (
     GenericReportDataForm,
     EducationalAndMethodicalWorkForm,
@@ -43,7 +48,10 @@ from service_api.models import (
     HeadsOfDepartmentsResults,
     FacultyResults,
     DecansResults,
+    ExportJob,
+    REPORT_MODELS,
 )
+from user_profile.hierarchy import get_hierarchy
 from user_profile.models import Faculty, Department
 
 logger = logging.getLogger()
@@ -56,26 +64,21 @@ class __BaseView(ContextMixin):
     def dispatch(self, request, *args, **kwargs):
         report_period_str = (kwargs.get("report_period") or "").replace("-", "/")
         if report_period_str:
-            self.report_period = ReportPeriod.objects.filter(report_period=report_period_str).first()
+            self.report_period = ReportPeriod.get_by_period(report_period_str)
         else:
             self.report_period = ReportPeriod.get_active()
 
         if request.user.is_authenticated:
-            self.generic_report = GenericReportData.objects.filter(
-                user=request.user, report_period=self.report_period
-            ).first()
+            self.generic_report = get_report_bundle(request, self.report_period)
 
         return super().dispatch(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
         data = super().get_context_data(**kwargs)
         extended_user = False
-        if (
-            self.request.user.is_authenticated
-            and self.request.user.profile.position is not None
-            and self.request.user.profile.position.cumulative_calculation is not None
-        ):
-            extended_user = True
+        if self.request.user.is_authenticated:
+            profile = get_hierarchy().get_profile(self.request.user.pk)
+            extended_user = profile is not None and profile.cumulative_calculation is not None
 
         if self.generic_report:
             is_editable = not self.generic_report.is_closed
@@ -104,6 +107,8 @@ class BaseReportFormView(BaseView, FormView):
     calc_model: type(BaseCalculation) = None
     template_name = "base_report.html"
     report_template_path: str = None
+    # Fields which affect the scores, None - all fields of the form
+    scoring_fields: tuple = None
 
     def get_object(self, report_period: ReportPeriod):
         return self.model.get_report(self.request.user, report_period)
@@ -113,28 +118,60 @@ class BaseReportFormView(BaseView, FormView):
         return self.form_class(instance=obj, **self.get_form_kwargs())
 
     def update_generic_report(self):
-        self.__update_generic_report(self.generic_report)
+        self.__update_generic_reports(self.generic_report)
 
     @staticmethod
-    def __update_generic_report(generic_report):
-        if generic_report:
-            calc_obj = GenericReportCalculation(generic_report)
-            generic_report.result = calc_obj.get_result()
-            generic_report.save()
+    def __update_generic_reports(*generic_reports):
+        generic_reports = [generic_report for generic_report in generic_reports if generic_report]
+        if not generic_reports:
+            return
+        results = GenericReportCalculation.get_results(generic_reports)
+        previous_results = {}
+        for generic_report in generic_reports:
+            previous_results[generic_report] = generic_report.result
+            generic_report.result = results[generic_report.pk]
+            generic_report.save(update_fields=["result"])
+        aggregates.apply_result_changes(previous_results)
+
+    def get_reports_of_heads(self) -> list:
+        profile = get_hierarchy().get_profile(self.request.user.pk)
+        if profile is None or profile.department_id is None:
+            return []
+        heads = HeadsGetter(profile.department_id, profile.faculty_id)
+        head_user_ids = [
+            head.user_id for head in (heads.head_of_department, heads.head_of_faculty) if head not in (None, profile)
+        ]
+        if not head_user_ids:
+            return []
+        return list(GenericReportData.objects.filter(user__in=head_user_ids, report_period=ReportPeriod.get_active()))
 
     def update_reports_of_heads(self):
-        profile = self.request.user.profile
-        heads = HeadsGetter(profile.department, profile.department.faculty)
-        if heads.head_of_department_profile is not None and profile != heads.head_of_department_profile:
-            generic_report = heads.head_of_department_profile.user.genericreportdata_set.filter(
-                report_period=ReportPeriod.get_active()
-            ).first()
-            self.__update_generic_report(generic_report)
-        if heads.head_of_faculty_profile is not None and profile != heads.head_of_faculty_profile:
-            generic_report = heads.head_of_faculty_profile.user.genericreportdata_set.filter(
-                report_period=ReportPeriod.get_active()
-            ).first()
-            self.__update_generic_report(generic_report)
+        self.__update_generic_reports(*self.get_reports_of_heads())
+
+    def has_scoring_changes(self, form) -> bool:
+        if not settings.INCREMENTAL_RECALCULATION:
+            return False
+        if not form.initial:
+            return True
+        scoring_fields = self.scoring_fields or form.fields
+        return any(field in scoring_fields for field in form.changed_data)
+
+    @classmethod
+    def recalculate_report(cls, report):
+        report.result = cls.calc_model(report).get_result()
+        report.adjusted_result = cls.model.raw_calculation(report.result, report.generic_report_data)
+        cls.model.objects.filter(pk=report.pk).update(result=report.result, adjusted_result=report.adjusted_result)
+
+    def recalculate(self, report):
+        """
+        Incremental recalculation of the saved report: the section score, total score of the teacher
+        and total scores of the heads
+        """
+        self.recalculate_report(report)
+        self.update_totals(report.generic_report_data)
+
+    def update_totals(self, generic_report):
+        self.__update_generic_reports(generic_report, *self.get_reports_of_heads())
 
     def get_context_data(self, **kwargs):
         data = super().get_context_data(**kwargs)
@@ -155,17 +192,12 @@ class BaseReportFormView(BaseView, FormView):
             f.generic_report_data = GenericReportData.objects.get(
                 user=self.request.user, report_period=active_report_period
             )
-        # calc_obj = self.calc_model(f)
         try:
-            # f.result = calc_obj.get_result()
-            # f.adjusted_result = self.model.raw_calculation(
-            #     f.result, self.generic_report
-            # )
-            f.save()
-
-            # self.update_generic_report()
-
-            # self.update_reports_of_heads()
+            has_scoring_changes = self.has_scoring_changes(form)
+            with transaction.atomic():
+                f.save()
+                if has_scoring_changes:
+                    self.recalculate(f)
         except:
             logger.exception(f"{self.request.user}\n{form.data}\n{traceback.format_exc()}")
             return self.form_invalid(form)
@@ -197,21 +229,29 @@ class GenericReportDataView(BaseReportFormView):
     report_template_path = "service_api/raw_report_forms/raw_generic_report_data_view.html"
     success_url = reverse_lazy("generic_report_data")
     calc_model = GenericReportCalculation
+    scoring_fields = ("assignment_duration", "students_rating")
 
     def get_object(self, report_period):
         return self.generic_report
 
+    def recalculate(self, report):
+        for report_view in REPORT_VIEWS:
+            section_report = getattr(report, report_view.model.__name__.lower(), None)
+            if section_report is not None:
+                report_view.recalculate_report(section_report)
+        self.update_totals(report)
+
     def form_valid(self, form):
         f = form.save(commit=False)
         active_report_period = ReportPeriod.get_active()
         if not self.get_object(active_report_period):
             f.user = self.request.user
             f.report_period = active_report_period
-        # calc_obj = self.calc_model(f)
-        # f.result = calc_obj.get_result()
-        f.save()
-
-        # self.update_reports_of_heads()
+        has_scoring_changes = self.has_scoring_changes(form)
+        with transaction.atomic():
+            f.save()
+            if has_scoring_changes:
+                self.recalculate(f)
 
         messages.success(self.request, "Загальні дані збережено")
         return HttpResponseRedirect(self.get_success_url())
@@ -253,6 +293,9 @@ class OrganizationalAndEducationalWorkView(BaseReportFormView):
     calc_model = OrganizationalAndEducationalWorkCalculation
 
 
+REPORT_VIEWS = (EducationalAndMethodicalWorkView, ScientificAndInnovativeWorkView, OrganizationalAndEducationalWorkView)
+
+
 class ReportsView(BaseView, TemplateView):
     template_name = "service_api/reports.html"
 
@@ -262,11 +305,10 @@ class ReportsView(BaseView, TemplateView):
             {
                 "is_pdf": False,
                 "is_report": True,
-                "user_reports": GenericReportData.objects.filter(user=self.request.user),
-                "teacher_result": TeacherResults.objects.filter(
-                    generic_report_data__user=self.request.user,
-                    generic_report_data__report_period=data["report_period"],
-                ).first(),
+                "user_reports": GenericReportData.objects.filter(user=self.request.user).select_related(
+                    "report_period"
+                ),
+                "teacher_result": getattr(self.generic_report, "teacherresults", None),
             }
         )
         return data
@@ -278,15 +320,17 @@ class ReportPdf(BaseView, TemplateView):
     def get_context_data(self, **kwargs):
         data = super().get_context_data(**kwargs)
         report_instances = {}
+        section_reports = get_section_reports(self.generic_report)
         for _model, _form in (
             (EducationalAndMethodicalWork, EducationalAndMethodicalWorkForm),
             (ScientificAndInnovativeWork, ScientificAndInnovativeWorkForm),
             (OrganizationalAndEducationalWork, OrganizationalAndEducationalWorkForm),
         ):
             report_instances[_model.slug()] = None
-            if hasattr(self.generic_report, _model.__name__.lower()):
-                report_instances[_model.slug()] = _form(instance=getattr(self.generic_report, _model.__name__.lower()))
+            if section_reports[_model] is not None:
+                report_instances[_model.slug()] = _form(instance=section_reports[_model])
 
+        profile = self.generic_report.user.profile if self.generic_report else self.request.user.profile
         data.update(
             {
                 **report_instances,
@@ -295,7 +339,7 @@ class ReportPdf(BaseView, TemplateView):
                 GenericReportData.slug(): GenericReportDataForm(instance=self.generic_report)
                 if self.generic_report
                 else None,
-                "report_name": f"Рейтингові бали {self.request.user.profile.last_name_and_initial} "
+                "report_name": f"Рейтингові бали {profile.last_name_and_initial} "
                 f"за {self.report_period} навчальний рік",
             }
         )
@@ -303,6 +347,8 @@ class ReportPdf(BaseView, TemplateView):
 
 
 class PivotReport:
+    FILE_NAME = "Звітний період"
+
     def __init__(self, request, report_period_id=None, level_type=None, pk=None):
         self.request = request
         self.report_period_id = report_period_id
@@ -312,63 +358,63 @@ class PivotReport:
         self.__response = None
 
     def get_qs(self):
-        return GenericReportData.objects.filter(report_period__pk=self.report_period_id).order_by("-result")
-
-    def is_valid(self, generic_report: GenericReportData):
+        qs = GenericReportData.objects.filter(report_period__pk=self.report_period_id)
         if self.level_type == Faculty.__name__.lower():
-            return generic_report.user.profile.department.faculty.pk == self.pk
+            qs = qs.filter(user__profile__department__faculty_id=self.pk)
         elif self.level_type == Department.__name__.lower():
-            return generic_report.user.profile.department.pk == self.pk
-        else:
-            return True
+            qs = qs.filter(user__profile__department_id=self.pk)
+        return qs.order_by("-result")
 
-    def prepare_response(self):
-        report_period = ReportPeriod.objects.get(pk=self.report_period_id)
-        response = HttpResponse(
-            content_type="text/csv",
-            headers={
-                "Content-Disposition": f"attachment; filename=Звітний період {report_period.report_period}.csv".encode(
-                    "utf-8"
+    def get_columns(self) -> list[Column]:
+        return [
+            NumberColumn("number", "#"),
+            *user_columns("user"),
+            Column("assignment_duration", "Відпрацьовано Місяців", "assignment_duration"),
+            Column("assignment", "Доля Ставки", "assignment"),
+            Column("result", "Підсумковий Бал", "result"),
+            *(
+                Column(
+                    f"{report_model.__name__.lower()}_adjusted_result",
+                    report_model.NAME,
+                    f"{report_model.__name__.lower()}__adjusted_result",
+                    # 0.0 for the reports not filled in
+                    value=lambda adjusted_result: adjusted_result or 0.0,
                 )
-            },
+                for report_model in REPORT_MODELS
+            ),
+        ]
+
+    def get_key(self, export: Export, export_format: ExportFormat) -> tuple:
+        """
+        Key of the export in the export cache
+        """
+        return ("pivot", self.report_period_id, self.level_type, self.pk, export_format.extension, *export.keys)
+
+    def get_content(self, export: Export, export_format: ExportFormat) -> Iterator[bytes]:
+        return export_format.render(export)
+
+    def get_file_type(self, export_format: ExportFormat) -> tuple[str, str]:
+        """
+        :return: content type and extension of the file
+        """
+        return export_format.content_type, export_format.extension
+
+    def prepare_response(self):
+        report_period = ReportPeriod.get_by_pk(self.report_period_id)
+        if report_period is None:
+            raise Http404
+        export, export_format = parse_request(self.request, Export(self.get_qs(), self.get_columns()))
+        content_type, extension = self.get_file_type(export_format)
+        response = cached_export(
+            self.request,
+            report_period.pk,
+            self.get_key(export, export_format),
+            lambda: self.get_content(export, export_format),
+            content_type,
         )
-        response.write(codecs.BOM_UTF8)
-
-        fake_report = type("fake_report", (), {"adjusted_result": 0.0})
-
-        writer = csv.writer(response)
-        writer.writerow(
-            [
-                "#",
-                "ПІБ",
-                "Кафедра",
-                "Факультет",
-                "Посада",
-                "Відпрацьовано Місяців",
-                "Доля Ставки",
-                "Підсумковий Бал",
-                EducationalAndMethodicalWork.NAME,
-                ScientificAndInnovativeWork.NAME,
-                OrganizationalAndEducationalWork.NAME,
-            ]
+        response["Content-Disposition"] = (
+            f"attachment; filename={self.FILE_NAME} {report_period.report_period}.{extension}".encode("utf-8")
         )
-        for i, one in enumerate(self.get_qs(), start=1):
-            if self.is_valid(one):
-                writer.writerow(
-                    [
-                        i,
-                        one.user.profile.last_name_and_initial,
-                        one.user.profile.department,
-                        one.user.profile.department.faculty,
-                        one.user.profile.position,
-                        one.assignment_duration,
-                        one.assignment,
-                        one.result,
-                        getattr(one, "educationalandmethodicalwork", fake_report).adjusted_result,
-                        getattr(one, "scientificandinnovativework", fake_report).adjusted_result,
-                        getattr(one, "organizationalandeducationalwork", fake_report).adjusted_result,
-                    ]
-                )
 
         self.__response = response
 
@@ -384,80 +430,229 @@ def pivot_report_by_type(request, report_period_id, level_type=None, pk=None):
     return report.response
 
 
+class PivotReportArchive(PivotReport):
+    """
+    ZIP of the pivot reports of every faculty and every department of the faculty, all faculties if pk is None
+    """
+
+    FACULTY_GROUP = ("user__profile__department__faculty_id", "user__profile__department__faculty__title")
+    DEPARTMENT_GROUP = ("user__profile__department_id", "user__profile__department__title")
+
+    def get_qs(self):
+        qs = GenericReportData.objects.filter(
+            report_period__pk=self.report_period_id, user__profile__department__faculty__isnull=False
+        )
+        if self.pk is not None:
+            qs = qs.filter(user__profile__department__faculty_id=self.pk)
+        return qs
+
+    @staticmethod
+    def get_entry_name(title: str, pk: int, used: set) -> str:
+        """
+        Title of the entry, followed by the pk if another entry of the directory has the same title
+        """
+        name = title.title().replace("/", "_")
+        if name in used:
+            name = f"{name} ({pk})"
+        used.add(name)
+        return name
+
+    def get_entries(self, export: Export, export_format: ExportFormat):
+        """
+        Two ordered queries, one for the faculties and one for the departments, split into the files on the fly
+        """
+        # {faculty_id: directory}, {directory: names of the entries}
+        directories, entry_names = {}, {}
+        faculties = export.for_queryset(
+            self.get_qs().order_by(
+                "user__profile__department__faculty__title", "user__profile__department__faculty_id", "-result"
+            )
+        ).get_groups(*self.FACULTY_GROUP)
+        for (faculty_id, faculty), rows in faculties:
+            directory = self.get_entry_name(faculty, faculty_id, entry_names.setdefault(None, set()))
+            directories[faculty_id] = directory
+            name = self.get_entry_name(faculty, faculty_id, entry_names.setdefault(directory, set()))
+            yield f"{directory}/{name}.{export_format.extension}", export_format.render(export, rows)
+
+        departments = export.for_queryset(
+            self.get_qs().order_by(
+                "user__profile__department__faculty__title",
+                "user__profile__department__faculty_id",
+                "user__profile__department__title",
+                "user__profile__department_id",
+                "-result",
+            )
+        ).get_groups(*self.FACULTY_GROUP, *self.DEPARTMENT_GROUP)
+        for (faculty_id, _, department_id, department), rows in departments:
+            directory = directories[faculty_id]
+            name = self.get_entry_name(department, department_id, entry_names[directory])
+            yield f"{directory}/{name}.{export_format.extension}", export_format.render(export, rows)
+
+    def get_key(self, export: Export, export_format: ExportFormat) -> tuple:
+        return ("pivot_archive", self.report_period_id, self.pk, export_format.extension, *export.keys)
+
+    def get_content(self, export: Export, export_format: ExportFormat) -> Iterator[bytes]:
+        return render_zip(self.get_entries(export, export_format))
+
+    def get_file_type(self, export_format: ExportFormat) -> tuple[str, str]:
+        return "application/zip", "zip"
+
+
+@login_required
+def pivot_report_archive(request, report_period_id, pk=None):
+    report = PivotReportArchive(request, report_period_id=report_period_id, pk=pk)
+    report.prepare_response()
+    return report.response
+
+
+class RawInputsReport(PivotReport):
+    """
+    Every input field of the generic report and of the three section reports, one row per teacher.
+    Heads of faculties and departments get the teachers of their departments only
+    """
+
+    FILE_NAME = "Вхідні дані"
+    # the parse of the semicolon separated fields stored for the calculations
+    EXCLUDED_FIELDS = ("parsed_values",)
+
+    def __init__(self, request, report_period_id=None, level_type=None, pk=None, user=None):
+        """
+        :param user: user whose scope is exported, the user of the request by default, e.g. of a background export
+        """
+        super().__init__(request, report_period_id, level_type, pk)
+        self.user = user if user is not None else request.user
+
+    def get_scope_department_ids(self) -> tuple:
+        """
+        Departments of the user's scope, None if the user sees all teachers
+        """
+        if self.user.is_superuser:
+            return None
+        return get_hierarchy().get_scope_department_ids(self.user.pk)
+
+    def get_qs(self):
+        qs = super().get_qs()
+        department_ids = self.get_scope_department_ids()
+        if department_ids is not None:
+            qs = qs.filter(user__profile__department__in=department_ids)
+        return qs
+
+    @staticmethod
+    def get_field_columns(model, path: str = None, header: str = None) -> list[Column]:
+        """
+        :param path: ORM path of the model from the generic report, its fields are prefixed with it
+        """
+        columns = []
+        for field in model._meta.concrete_fields:
+            if field.primary_key or field.is_relation or field.name in RawInputsReport.EXCLUDED_FIELDS:
+                continue
+            key = f"{path}_{field.name}" if path else field.name
+            field_header = f"{field.verbose_name} ({field.name})"
+            columns.append(
+                Column(
+                    key,
+                    f"{header}: {field_header}" if header else field_header,
+                    f"{path}__{field.name}" if path else field.name,
+                )
+            )
+        return columns
+
+    def get_columns(self) -> list[Column]:
+        columns = [
+            NumberColumn("number", "#"),
+            *user_columns("user"),
+            Column("email", "Email", "user__email"),
+            *self.get_field_columns(GenericReportData),
+        ]
+        for report_model in REPORT_MODELS:
+            columns += self.get_field_columns(report_model, report_model.__name__.lower(), report_model.NAME)
+        return columns
+
+    def get_key(self, export: Export, export_format: ExportFormat) -> tuple:
+        return ("raw_inputs", self.get_scope_department_ids(), *super().get_key(export, export_format)[1:])
+
+
+@login_required
+def raw_inputs_report(request, report_period_id, level_type=None, pk=None):
+    """
+    The inputs of the teachers are shown to the staff only, like the admin where the report is linked
+    """
+    if not request.user.is_staff:
+        raise Http404
+    report = RawInputsReport(request, report_period_id=report_period_id, level_type=level_type, pk=pk)
+    report.prepare_response()
+    return report.response
+
+
+@login_required
+def export_job_download(request, pk):
+    """
+    File of a finished background export, only for the user who queued it
+    """
+    job = get_object_or_404(ExportJob, pk=pk, status=ExportJob.DONE)
+    if job.user_id != request.user.pk and not request.user.is_superuser:
+        raise Http404
+    try:
+        file = open(export_jobs.get_path(job), "rb")
+    except FileNotFoundError:
+        raise Http404
+    return FileResponse(file, as_attachment=True, filename=job.file_name)
+
+
 class ReportView(View):
     REPORT_MODEL: None
 
-    def get_headers(self) -> list[str]:
-        raise NotImplementedError
-
-    def get_values(self, report: "REPORT_MODEL") -> list[str]:
+    def get_columns(self) -> list[Column]:
         raise NotImplementedError
 
     def get_qs(self, report_period: ReportPeriod, faculty_id: int = None, department_id: int = None):
         raise NotImplementedError
 
     def get(self, request, report_period_id: int, faculty_id: int = None, department_id: int = None):
-        report_period = ReportPeriod.objects.get(pk=report_period_id)
-        response = HttpResponse(
-            content_type="text/csv",
-            headers={
-                "Content-Disposition": f"attachment; filename={self.REPORT_MODEL.file_name}_{report_period.report_period}.csv"
-            },
+        report_period = ReportPeriod.get_by_pk(report_period_id)
+        if report_period is None:
+            raise Http404
+
+        export = Export(self.get_qs(report_period, faculty_id, department_id), self.get_columns())
+        export, export_format = parse_request(request, export)
+        key = (self.REPORT_MODEL.file_name, report_period.pk, faculty_id, department_id, export_format.extension)
+        response = cached_export(
+            request,
+            report_period.pk,
+            (*key, *export.keys),
+            lambda: export_format.render(export),
+            export_format.content_type,
+        )
+        response["Content-Disposition"] = (
+            f"attachment; filename={self.REPORT_MODEL.file_name}_{report_period.report_period}.{export_format.extension}"
         )
-        response.write(codecs.BOM_UTF8)
-
-        writer = csv.writer(response)
-        writer.writerow(self.get_headers())
-        for t_result in self.get_qs(report_period, faculty_id, department_id):
-            writer.writerow(self.get_values(t_result))
         return response
 
 
 class TeachersReportView(ReportView):
     REPORT_MODEL = TeacherResults
 
-    def get_headers(self):
-        return [
-            "Місце",
-            "ПІБ",
-            "Кафедра",
-            "Факультет",
-            "Посада",
-            "Розрахована сума місць робіт",
-            "Чистий Бал " + EducationalAndMethodicalWork.NAME,
-            "Бал " + EducationalAndMethodicalWork.NAME,
-            "Місце " + EducationalAndMethodicalWork.NAME,
-            "Чистий Бал " + ScientificAndInnovativeWork.NAME,
-            "Бал " + ScientificAndInnovativeWork.NAME,
-            "Місце " + ScientificAndInnovativeWork.NAME,
-            "Чистий Бал " + OrganizationalAndEducationalWork.NAME,
-            "Бал " + OrganizationalAndEducationalWork.NAME,
-            "Місце " + OrganizationalAndEducationalWork.NAME,
-            "Відпрацьовано місяців",
-            "Доля ставки",
-            "Cтудентський бал",
+    def get_columns(self):
+        columns = [
+            Column("place", "Місце", "place"),
+            *user_columns("generic_report_data__user"),
+            Column("scores_sum", "Розрахована сума місць робіт", "scores_sum"),
         ]
-
-    def get_values(self, report: REPORT_MODEL):
-        return [
-            report.place,
-            report.generic_report_data.user.profile.last_name_and_initial,
-            report.generic_report_data.user.profile.department,
-            report.generic_report_data.user.profile.department.faculty,
-            report.generic_report_data.user.profile.position,
-            report.scores_sum,
-            report.generic_report_data.educationalandmethodicalwork.result,
-            report.generic_report_data.educationalandmethodicalwork.adjusted_result,
-            report.educationalandmethodicalwork_place,
-            report.generic_report_data.scientificandinnovativework.result,
-            report.generic_report_data.scientificandinnovativework.adjusted_result,
-            report.scientificandinnovativework_place,
-            report.generic_report_data.organizationalandeducationalwork.result,
-            report.generic_report_data.organizationalandeducationalwork.adjusted_result,
-            report.organizationalandeducationalwork_place,
-            report.generic_report_data.assignment_duration,
-            report.generic_report_data.assignment,
-            report.generic_report_data.students_rating,
+        for report_model in REPORT_MODELS:
+            name = report_model.__name__.lower()
+            columns += [
+                Column(f"{name}_result", "Чистий Бал " + report_model.NAME, f"generic_report_data__{name}__result"),
+                Column(
+                    f"{name}_adjusted_result",
+                    "Бал " + report_model.NAME,
+                    f"generic_report_data__{name}__adjusted_result",
+                ),
+                Column(f"{name}_place", "Місце " + report_model.NAME, f"{name}_place"),
+            ]
+        return columns + [
+            Column("assignment_duration", "Відпрацьовано місяців", "generic_report_data__assignment_duration"),
+            Column("assignment", "Доля ставки", "generic_report_data__assignment"),
+            Column("students_rating", "Cтудентський бал", "generic_report_data__students_rating"),
         ]
 
     def get_qs(self, report_period: ReportPeriod, faculty=None, department=None):
@@ -467,30 +662,14 @@ class TeachersReportView(ReportView):
 class HeadsOfDepartmentsReportView(ReportView):
     REPORT_MODEL = HeadsOfDepartmentsResults
 
-    def get_headers(self):
-        return [
-            "Місце",
-            "ПІБ",
-            "Кафедра",
-            "Факультет",
-            "Посада",
-            "Сума балів кафедри",
-            "Кількість працівників кафедри",
-            "Особисті бали",
-            "Отримані бали",
-        ]
-
-    def get_values(self, report: REPORT_MODEL) -> list[str]:
+    def get_columns(self):
         return [
-            report.place,
-            report.teacher_result.generic_report_data.user.profile.last_name_and_initial,
-            report.teacher_result.generic_report_data.user.profile.department,
-            report.teacher_result.generic_report_data.user.profile.department.faculty,
-            report.teacher_result.generic_report_data.user.profile.position,
-            report.related_to_department_sum,
-            report.related_to_department_count,
-            report.teacher_result.scores_sum,
-            report.scores_sum,
+            Column("place", "Місце", "place"),
+            *user_columns("teacher_result__generic_report_data__user"),
+            Column("related_to_department_sum", "Сума балів кафедри", "related_to_department_sum"),
+            Column("related_to_department_count", "Кількість працівників кафедри", "related_to_department_count"),
+            Column("teacher_scores_sum", "Особисті бали", "teacher_result__scores_sum"),
+            Column("scores_sum", "Отримані бали", "scores_sum"),
         ]
 
     def get_qs(self, report_period: ReportPeriod, faculty=None, department=None):
@@ -502,22 +681,13 @@ class HeadsOfDepartmentsReportView(ReportView):
 class FacultiesReportView(ReportView):
     REPORT_MODEL = FacultyResults
 
-    def get_headers(self):
+    def get_columns(self):
         return [
-            "Місце",
-            "Факультет",
-            "Сума місць факультету",
-            "Кількість працівників факультету",
-            "Середній бал факультету",
-        ]
-
-    def get_values(self, report: REPORT_MODEL) -> list[str]:
-        return [
-            report.place,
-            report.faculty.title,
-            report.places_sum,
-            report.places_sum_count,
-            report.places_sum_average,
+            Column("place", "Місце", "place"),
+            Column("faculty", "Факультет", "faculty__title"),
+            Column("places_sum", "Сума місць факультету", "places_sum"),
+            Column("places_sum_count", "Кількість працівників факультету", "places_sum_count"),
+            Column("places_sum_average", "Середній бал факультету", "places_sum_average"),
         ]
 
     def get_qs(self, report_period: ReportPeriod, faculty=None, department=None):
@@ -527,24 +697,11 @@ class FacultiesReportView(ReportView):
 class DecansReportView(ReportView):
     REPORT_MODEL = DecansResults
 
-    def get_headers(self):
-        return [
-            "Місце",
-            "ПІБ",
-            "Кафедра",
-            "Факультет",
-            "Посада",
-            "Сума балів деканату",
-        ]
-
-    def get_values(self, report: REPORT_MODEL) -> list[str]:
+    def get_columns(self):
         return [
-            report.place,
-            report.teacher_result.generic_report_data.user.profile.last_name_and_initial,
-            report.teacher_result.generic_report_data.user.profile.department,
-            report.teacher_result.generic_report_data.user.profile.department.faculty,
-            report.teacher_result.generic_report_data.user.profile.position,
-            report.sum_place,
+            Column("place", "Місце", "place"),
+            *user_columns("teacher_result__generic_report_data__user"),
+            Column("sum_place", "Сума балів деканату", "sum_place"),
         ]
 
     def get_qs(self, report_period: ReportPeriod, faculty=None, department=None):
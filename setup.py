@@ -14,5 +14,6 @@ setup(
         "gunicorn==20.1.0",
         "django_tables2==2.4.0",
         "whitenoise==6.4.0",
+        "numpy==1.26.4",
     ],
 )
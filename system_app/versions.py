@@ -0,0 +1,63 @@
+"""
+Versions of the data kept in memory by the processes: the org hierarchy, the report periods and the exports.
+
+The versions are stored in the default cache, a table of the database shared by all processes. A process reads
+a version once per request and keeps it for TTL seconds outside of the requests, in the export worker and in the
+management commands, so repeated lookups don't query the database. A version changed by the process is seen
+at once, a version changed by another process on the next request or after TTL.
+
+Usage:
+    version = versions.get(VERSION_KEY)
+    versions.change(VERSION_KEY)
+"""
+import time
+import uuid
+
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.dispatch import receiver
+
+TTL = 2.0
+
+# {key: (version, time.monotonic() of the read)}
+_versions = {}
+
+
+def get_many(keys: list) -> dict:
+    """
+    :return: {key: version}, a missing version is created
+    """
+    now = time.monotonic()
+    versions = {}
+    for key in keys:
+        version, read_at = _versions.get(key, (None, None))
+        if version is not None and now - read_at < TTL:
+            versions[key] = version
+
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        versions.update(cache.get_many(missing))
+        for key in missing:
+            if key not in versions:
+                cache.add(key, uuid.uuid4().hex, timeout=None)
+                versions[key] = cache.get(key)
+            _versions[key] = (versions[key], now)
+    return versions
+
+
+def get(key: str) -> str:
+    return get_many([key])[key]
+
+
+def change(key: str):
+    version = uuid.uuid4().hex
+    cache.set(key, version, timeout=None)
+    _versions[key] = (version, time.monotonic())
+
+
+@receiver(request_started)
+def clear(**kwargs):
+    """
+    Forgets the versions read by the process, they are read again on the next lookup
+    """
+    _versions.clear()
@@ -3,6 +3,7 @@ import logging
 from django.contrib import admin
 from django.db.models import Q
 
+from user_profile.hierarchy import get_hierarchy
 from user_profile.models import Profile, Position, Department, Faculty
 
 logger = logging.getLogger(__name__)
@@ -38,25 +39,15 @@ class ProfileAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         if not request.user.is_superuser:
-            try:
-                if request.user.profile.position.cumulative_calculation == Position.BY_DEPARTMENT:
-                    qs = qs.filter(
-                        Q(
-                            Q(department=request.user.profile.department) |
-                            Q(position__isnull=True) |
-                            Q(department__isnull=True)
-                        ) & Q(user__is_superuser=False)
-                    )
-                elif request.user.profile.position.cumulative_calculation == Position.BY_FACULTY:
-                    qs = qs.filter(
-                        Q(
-                            Q(department__faculty=request.user.profile.department.faculty) |
-                            Q(position__isnull=True) |
-                            Q(department__isnull=True)
-                        ) & Q(user__is_superuser=False)
-                    )
-            except Exception as e:
-                logging.info(f"ProfileAdmin :: {e}")
+            department_ids = get_hierarchy().get_scope_department_ids(request.user.pk)
+            if department_ids is not None:
+                qs = qs.filter(
+                    Q(
+                        Q(department__in=department_ids) |
+                        Q(position__isnull=True) |
+                        Q(department__isnull=True)
+                    ) & Q(user__is_superuser=False)
+                )
 
         return qs
 
@@ -96,13 +87,11 @@ class DepartmentAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        try:
-            if request.user.profile.position.cumulative_calculation == Position.BY_DEPARTMENT:
-                qs = qs.filter(pk=request.user.profile.department.pk)
-            elif self.request.user.profile.position.cumulative_calculation == Position.BY_FACULTY:
-                qs = qs.filter(faculty=request.user.profile.department.faculty)
-        except Exception as e:
-            logging.error(f"ProfileAdmin :: {e}")
+        profile = get_hierarchy().get_profile(request.user.pk)
+        if profile is not None and profile.cumulative_calculation == Position.BY_DEPARTMENT:
+            qs = qs.filter(pk=profile.department_id)
+        elif profile is not None and profile.cumulative_calculation == Position.BY_FACULTY:
+            qs = qs.filter(faculty=profile.faculty_id)
 
         return qs
 
@@ -121,12 +110,8 @@ class FacultyAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        try:
-            if request.user.profile.position.cumulative_calculation == Position.BY_DEPARTMENT:
-                qs = qs.filter(department=request.user.profile.department)
-            elif self.request.user.profile.position.cumulative_calculation == Position.BY_FACULTY:
-                qs = qs.filter(pk=request.user.profile.department.faculty.pk)
-        except Exception as e:
-            logging.error(f"ProfileAdmin :: {e}")
+        profile = get_hierarchy().get_profile(request.user.pk)
+        if profile is not None and profile.cumulative_calculation is not None:
+            qs = qs.filter(pk=profile.faculty_id)
 
         return qs
@@ -5,3 +5,7 @@ class UserProfileConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user_profile'
     verbose_name = '2. Профілі'
+
+    def ready(self):
+        # connects the receivers invalidating the org hierarchy
+        from user_profile import hierarchy  # noqa: F401
@@ -0,0 +1,194 @@
+"""
+In-memory map of the org structure: faculties and departments with their heads and members.
+
+The map is built with one query and kept by the process until a Profile, Department, Faculty or Position
+is saved or deleted. The version of the map is stored in the default cache, a table of the database, and checked
+once per request, see system_app.versions, so the other workers and the management commands drop their copies
+as well: the scopes of the heads in the admin change with the saved positions and departments, without a restart.
+
+Usage:
+    hierarchy = get_hierarchy()
+    profile = hierarchy.get_profile(user_id)
+    hierarchy.departments[profile.department_id].head_ids
+"""
+from types import MappingProxyType
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from system_app import versions
+from user_profile.models import Department, Faculty, Position, Profile
+
+VERSION_KEY = "user_profile.hierarchy.version"
+
+
+class Node:
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return f"{type(self).__name__}({getattr(self, 'pk', '')})"
+
+
+class ProfileNode(Node):
+    __slots__ = ("pk", "user_id", "department_id", "faculty_id", "position_id", "cumulative_calculation")
+
+
+class DepartmentNode(Node):
+    """
+    :ivar head_ids: pks of the profiles of the heads, in the order of the profiles admin
+    :ivar member_ids: pks of the profiles of the whole staff
+    """
+
+    __slots__ = ("pk", "faculty_id", "head_ids", "member_ids")
+
+
+class FacultyNode(Node):
+    __slots__ = ("pk", "department_ids", "head_ids", "member_ids")
+
+
+class OrgHierarchy(Node):
+    __slots__ = ("profiles", "users", "departments", "faculties")
+
+    @classmethod
+    def load(cls) -> "OrgHierarchy":
+        rows = Profile.objects.order_by("department__title", "department__faculty__title", "pk").values_list(
+            "pk",
+            "user_id",
+            "department_id",
+            "department__faculty_id",
+            "position_id",
+            "position__cumulative_calculation",
+        )
+        profiles = {}
+        departments = {}
+        faculties = {}
+        for pk, user_id, department_id, faculty_id, position_id, cumulative_calculation in rows:
+            profiles[pk] = ProfileNode(
+                pk=pk,
+                user_id=user_id,
+                department_id=department_id,
+                faculty_id=faculty_id,
+                position_id=position_id,
+                cumulative_calculation=cumulative_calculation,
+            )
+            if department_id is None:
+                continue
+
+            department = departments.setdefault(department_id, (faculty_id, [], []))
+            if cumulative_calculation == Position.BY_DEPARTMENT:
+                department[1].append(pk)
+            department[2].append(pk)
+            if faculty_id is not None:
+                faculty = faculties.setdefault(faculty_id, ({}, [], []))
+                faculty[0][department_id] = None
+                if cumulative_calculation == Position.BY_FACULTY:
+                    faculty[1].append(pk)
+                faculty[2].append(pk)
+
+        return cls(
+            profiles=MappingProxyType(profiles),
+            users=MappingProxyType({profile.user_id: profile for profile in profiles.values()}),
+            departments=MappingProxyType(
+                {
+                    pk: DepartmentNode(pk=pk, faculty_id=faculty_id, head_ids=tuple(heads), member_ids=tuple(members))
+                    for pk, (faculty_id, heads, members) in departments.items()
+                }
+            ),
+            faculties=MappingProxyType(
+                {
+                    pk: FacultyNode(
+                        pk=pk, department_ids=tuple(department_ids), head_ids=tuple(heads), member_ids=tuple(members)
+                    )
+                    for pk, (department_ids, heads, members) in faculties.items()
+                }
+            ),
+        )
+
+    def get_profile(self, user_id) -> ProfileNode:
+        return self.users.get(user_id)
+
+    def get_head_of_department(self, department_id) -> ProfileNode:
+        department = self.departments.get(department_id)
+        if department is None or not department.head_ids:
+            return None
+        return self.profiles[department.head_ids[0]]
+
+    def get_head_of_faculty(self, faculty_id) -> ProfileNode:
+        faculty = self.faculties.get(faculty_id)
+        if faculty is None or not faculty.head_ids:
+            return None
+        return self.profiles[faculty.head_ids[0]]
+
+    def get_scope_department_ids(self, user_id) -> tuple:
+        """
+        Departments managed by the user, None if the user is not a head
+        """
+        profile = self.get_profile(user_id)
+        if profile is None:
+            return None
+        if profile.cumulative_calculation == Position.BY_DEPARTMENT:
+            return (profile.department_id,)
+        if profile.cumulative_calculation == Position.BY_FACULTY:
+            faculty = self.faculties.get(profile.faculty_id)
+            return faculty.department_ids if faculty is not None else ()
+        return None
+
+
+_hierarchy = None
+_version = None
+
+
+def get_version() -> str:
+    return versions.get(VERSION_KEY)
+
+
+def get_hierarchy() -> OrgHierarchy:
+    global _hierarchy, _version
+    version = get_version()
+    if _hierarchy is None or _version != version:
+        _hierarchy, _version = OrgHierarchy.load(), version
+    return _hierarchy
+
+
+def invalidate():
+    global _hierarchy
+    _hierarchy = None
+    versions.change(VERSION_KEY)
+
+
+def on_change():
+    invalidate()
+    # a map built inside the transaction may contain rolled back changes
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, created, **kwargs):
+    # profiles are saved on every save of the user, e.g. on login
+    profile = _hierarchy.profiles.get(instance.pk) if _hierarchy is not None and _version == get_version() else None
+    if (
+        profile is None
+        or profile.user_id != instance.user_id
+        or profile.department_id != instance.department_id
+        or profile.position_id != instance.position_id
+    ):
+        on_change()
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_save, sender=Faculty)
+@receiver(post_save, sender=Position)
+@receiver(post_delete, sender=Profile)
+@receiver(post_delete, sender=Department)
+@receiver(post_delete, sender=Faculty)
+@receiver(post_delete, sender=Position)
+def org_structure_changed(sender, **kwargs):
+    on_change()
@@ -1,31 +1,32 @@
-import csv
 from datetime import datetime
 
 from django.core.management.base import BaseCommand
 
+from service_api.exports import FORMATS, Column, CsvFormat, Export, title
 from user_profile.models import Profile
 
 
 class Command(BaseCommand):
     help = 'Export all users to csv file. Will be placed to /tmp/users_{timestamp}.csv'
 
-    def handle(self, *args, **options):
-        with open(f"/tmp/users_{datetime.now().strftime('%Y_%m_%d')}.csv", 'w', newline='') as csvfile:
-            fieldnames = ["last_name", "first_name", "faculty", "department", "position", "date_joined"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-            writer.writeheader()
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=FORMATS, default=CsvFormat.extension, help="csv by default")
 
-            for p in Profile.objects.all():
-                writer.writerow(
-                    {
-                        "first_name": p.user.first_name,
-                        "last_name": p.user.last_name,
-                        "faculty": getattr(p.department, "faculty", None),
-                        "department": p.department,
-                        "position": p.position,
-                        "date_joined": p.user.date_joined,
-                    }
-                )
+    def handle(self, *args, **options):
+        export_format = FORMATS[options["format"]]
+        export = Export(
+            Profile.objects.all(),
+            [
+                Column("last_name", "last_name", "user__last_name"),
+                Column("first_name", "first_name", "user__first_name"),
+                Column("faculty", "faculty", "department__faculty__title", value=title),
+                Column("department", "department", "department__title", value=title),
+                Column("position", "position", "position__title", value=title),
+                Column("date_joined", "date_joined", "user__date_joined"),
+            ],
+        )
+        with open(f"/tmp/users_{datetime.now().strftime('%Y_%m_%d')}.{export_format.extension}", 'wb') as f:
+            for chunk in export_format.render(export):
+                f.write(chunk)
 
         self.stdout.write("Success")
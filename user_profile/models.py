@@ -71,10 +71,14 @@ class Profile(models.Model):
 
     @property
     def last_name_and_initial(self):
+        return self.format_last_name_and_initial(self.user.last_name, self.user.first_name, self.user.email)
+
+    @staticmethod
+    def format_last_name_and_initial(last_name: str, first_name: str, email: str) -> str:
         try:
-            res = f"{self.user.last_name} {'. '.join([i[0] for i in self.user.first_name.split(' ')])}."
+            res = f"{last_name} {'. '.join([i[0] for i in first_name.split(' ')])}."
         except IndexError:
-            res = self.user.email
+            res = email
         return res
 
     def __str__(self):
@@ -1,3 +1,77 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from service_api.calculations.generic_report_calc import HeadsGetter
+from system_app import versions
+from user_profile import hierarchy
+from user_profile.models import Department, Faculty, Position, Profile
+
+
+class OrgHierarchyTestCase(TestCase):
+    def setUp(self):
+        self.faculty = Faculty.objects.create(title="faculty")
+        self.departments = [Department.objects.create(faculty=self.faculty, title=f"department {i}") for i in range(2)]
+        self.head = Position.objects.create(title="head", cumulative_calculation=Position.BY_DEPARTMENT)
+        self.dean = Position.objects.create(title="dean", cumulative_calculation=Position.BY_FACULTY)
+        self.users = []
+        for i, (department, position) in enumerate(
+            ((0, self.dean), (0, self.head), (0, None), (1, None), (1, self.head))
+        ):
+            user = User.objects.create(username=f"user{i}")
+            user.profile.department = self.departments[department]
+            user.profile.position = position
+            user.profile.save()
+            self.users.append(user)
+
+    def test_map(self):
+        # a new request: the version of the map and the map
+        versions.clear()
+        with self.assertNumQueries(2):
+            org = hierarchy.get_hierarchy()
+        # the version is read once per request
+        with self.assertNumQueries(0):
+            self.assertIs(hierarchy.get_hierarchy(), org)
+            heads = HeadsGetter(self.departments[1], self.faculty)
+
+        profiles = [user.profile.pk for user in self.users]
+        self.assertEqual(org.departments[self.departments[0].pk].member_ids, tuple(profiles[:3]))
+        self.assertEqual(org.departments[self.departments[0].pk].head_ids, (profiles[1],))
+        self.assertEqual(org.faculties[self.faculty.pk].head_ids, (profiles[0],))
+        self.assertEqual(heads.head_of_department.pk, profiles[4])
+        self.assertEqual(heads.head_of_faculty_profile, self.users[0].profile)
+        self.assertEqual(org.get_scope_department_ids(self.users[0].pk), tuple(d.pk for d in self.departments))
+        self.assertEqual(org.get_scope_department_ids(self.users[1].pk), (self.departments[0].pk,))
+        self.assertIsNone(org.get_scope_department_ids(self.users[2].pk))
+        with self.assertRaises(AttributeError):
+            org.get_profile(self.users[2].pk).department_id = None
+
+    def test_invalidation(self):
+        org = hierarchy.get_hierarchy()
+        # saved without changes, e.g. on login
+        self.users[2].save()
+        self.assertIs(hierarchy.get_hierarchy(), org)
+
+        profile = self.users[2].profile
+        profile.position = self.head
+        profile.save()
+        org = hierarchy.get_hierarchy()
+        self.assertEqual(org.departments[self.departments[0].pk].head_ids, (self.users[1].profile.pk, profile.pk))
+
+        self.departments[1].delete()
+        self.assertIsNone(hierarchy.get_hierarchy().get_profile(self.users[3].pk).department_id)
+
+    def test_version_in_database(self):
+        org = hierarchy.get_hierarchy()
+        # another process changed a position and the version in the database, the map of this process is dropped
+        Profile.objects.filter(pk=self.users[2].profile.pk).update(position=self.head)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {settings.CACHES['default']['LOCATION']}")
+        # the version read by this process is kept until the next request
+        self.assertIs(hierarchy.get_hierarchy(), org)
+        versions.clear()
+        self.assertIsNot(hierarchy.get_hierarchy(), org)
+        self.assertEqual(
+            hierarchy.get_hierarchy().get_scope_department_ids(self.users[2].pk), (self.departments[0].pk,)
+        )